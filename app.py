@@ -1,150 +1,713 @@
 import streamlit as st
+import math
 import random
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 import time
 import torch
+import inspect
+import threading
+import functools
+import concurrent.futures
+import numpy as np
+from streamlit.errors import StreamlitAPIException
+from backends import ModelLoader, load_backend, load_draft_model, describe_backend, resolve_model_name
+from embeddings import EmbeddingIndex, mmr_select, near_duplicate_mask
+from inference import CircuitBreaker, InferenceScheduler
+from model_client import RemoteScheduler, wait_for_model_server
+from interview import InterviewSession, ROLE_DISPLAY, AWAITING_ANSWER
+from prompts import (
+    build_question_prompt, build_answer_prompt, build_feedback_prompt, question_focus_areas,
+    FALLBACK_FEEDBACK, FALLBACK_QUESTIONS, DEFAULT_FALLBACK_QUESTION, strip_prompt_echo, is_usable_feedback
+)
+from scoring import score_answers, summarize_scores
+from result_cache import ResultCache
+from question_bank import QuestionBank, QuestionBankRefiller, bank_key, parse_bank_key
+from telemetry import InferenceTelemetry, TelemetryExporter
+from transcripts import TranscriptStore
+from voice import IncrementalTranscriber
 
 # --- Model Setup with Proper Caching ---
-MODEL_NAME = "google/flan-t5-large"  # Using a smaller model for better performance
 HF_TOKEN = st.secrets.get("hf_tokens", None)
 
-# Initialize session state for model loading
-if 'model_loaded' not in st.session_state:
-    st.session_state.model_loaded = False
-if 'model_loading' not in st.session_state:
-    st.session_state.model_loading = False
+# Backend selection: model size (small/base/large or a hub id), precision (fp32/bf16/int8),
+# runtime (torch/onnx) and whether to torch.compile the forward pass
+MODEL_SIZE = st.secrets.get("model_size", "large")
+MODEL_NAME = resolve_model_name(MODEL_SIZE)
+MODEL_PRECISION = st.secrets.get("model_precision", "fp32")
+MODEL_RUNTIME = st.secrets.get("model_runtime", "torch")
+MODEL_COMPILE = st.secrets.get("model_compile", False)
+
+# Speculative decoding: prompt kinds (question, expected_answer, feedback) that a small draft model
+# of the same family drafts for and the main model verifies; empty loads no draft model
+SPECULATIVE_KINDS = st.secrets.get("speculative_kinds", [])
+SPECULATIVE_DRAFT_SIZE = st.secrets.get("speculative_draft_size", "small")
+
+# Out-of-process model workers (python model_server.py --socket ...). When set, this
+# process loads no model and sends every generation to the worker pool instead.
+MODEL_SERVER_SOCKET = st.secrets.get("model_server_socket", None)
+MODEL_SERVER_CONNECTIONS = st.secrets.get("model_server_connections_per_worker", 2)
+MODEL_SERVER_STARTUP_TIMEOUT = st.secrets.get("model_server_startup_timeout", 600)
+
+# Cross-session micro-batching: how long to hold a batch open and how big it may get
+BATCH_MAX_WAIT_MS = st.secrets.get("batch_max_wait_ms", 15)
+BATCH_MAX_SIZE = st.secrets.get("batch_max_size", 8)
+# Streamed feedback runs outside the batches; at most this many streams share the model at once
+MAX_CONCURRENT_STREAMS = st.secrets.get("max_concurrent_streams", 4)
+
+# Persistent question bank: where it lives, how big it may grow, and how many fresh questions to keep per setup
+QUESTION_BANK_PATH = st.secrets.get("question_bank_path", "question_bank.json")
+QUESTION_BANK_MAX_ENTRIES = st.secrets.get("question_bank_max_entries", 2000)
+QUESTION_POOL_TARGET = st.secrets.get("question_pool_target", 10)
+
+# Question variety: embedding similarity above which a question counts as a repeat, how many
+# candidates to generate per question needed, and how strongly selection favours diversity
+QUESTION_DUPLICATE_THRESHOLD = st.secrets.get("question_duplicate_threshold", 0.92)
+QUESTION_CANDIDATE_FACTOR = st.secrets.get("question_candidate_factor", 1.5)
+QUESTION_MMR_DIVERSITY = st.secrets.get("question_mmr_diversity", 0.5)
+
+# Latency budgets (seconds) per prompt kind; past these the user gets fallback content.
+# Feedback is streamed, so its budget is time-to-first-token.
+LATENCY_BUDGETS = {
+    "question": st.secrets.get("latency_budget_question", 10.0),
+    "expected_answer": st.secrets.get("latency_budget_expected_answer", 15.0),
+    "feedback": st.secrets.get("latency_budget_feedback", 8.0)
+}
+
+# Cross-session result cache: prompt kinds decoded greedily and served from memory on repeats,
+# its size and entry lifetime (seconds), and how similar a candidate's answer must be (word/bigram
+# Jaccard) to reuse the feedback given on an earlier answer to the same question
+RESULT_CACHE_KINDS = st.secrets.get("result_cache_kinds", ["expected_answer", "feedback"])
+RESULT_CACHE_MAX_ENTRIES = st.secrets.get("result_cache_max_entries", 4096)
+RESULT_CACHE_TTL = st.secrets.get("result_cache_ttl", 6 * 3600)
+RESULT_CACHE_ANSWER_SIMILARITY = st.secrets.get("result_cache_answer_similarity", 0.85)
+
+# Circuit breaker: new sessions get fallback content while the queue is this deep or this slow
+BREAKER_MAX_QUEUE_DEPTH = st.secrets.get("breaker_max_queue_depth", 16)
+BREAKER_MAX_LATENCY_MS = st.secrets.get("breaker_max_latency_ms", 20000)
+BREAKER_RECOVERY_LATENCY_MS = st.secrets.get("breaker_recovery_latency_ms", 8000)
+BREAKER_COOLDOWN = st.secrets.get("breaker_cooldown", 30)
+
+# Inference telemetry: rolling window size and where/how often to export it (.json or Prometheus text)
+TELEMETRY_WINDOW = st.secrets.get("telemetry_window", 500)
+TELEMETRY_EXPORT_PATH = st.secrets.get("telemetry_export_path", "inference_metrics.prom")
+TELEMETRY_EXPORT_INTERVAL = st.secrets.get("telemetry_export_interval", 15)
+
+# Durable transcripts: SQLite file (empty keeps everything in memory), retention, and how many
+# recent messages a session holds in memory; older ones are paged in from the store on request
+TRANSCRIPT_DB_PATH = st.secrets.get("transcript_db_path", "transcripts.sqlite3")
+TRANSCRIPT_RETENTION_DAYS = st.secrets.get("transcript_retention_days", 30)
+CHAT_WINDOW = st.secrets.get("chat_window", 12)
+
+# Spoken answers from this machine's microphone, transcribed offline while the candidate talks:
+# engine (sphinx/vosk/whisper), language, the pause / length at which audio is cut into segments,
+# and how often the live transcript refreshes
+VOICE_ANSWERS = st.secrets.get("voice_answers", False)
+VOICE_ENGINE = st.secrets.get("voice_engine", "sphinx")
+VOICE_LANGUAGE = st.secrets.get("voice_language", "en-US")
+VOICE_PAUSE_SECONDS = st.secrets.get("voice_pause_seconds", 0.6)
+VOICE_MAX_SEGMENT_SECONDS = st.secrets.get("voice_max_segment_seconds", 5.0)
+VOICE_POLL_SECONDS = st.secrets.get("voice_poll_seconds", 0.5)
+
+# Initialize session state
 if 'show_interview' not in st.session_state:
     st.session_state.show_interview = False
 if 'settings_confirmed' not in st.session_state:
     st.session_state.settings_confirmed = False
 
 # Define generate_text function with better parameters
-def generate_text(prompt, max_len=150, temperature=0.7):
-    """Generate text with the loaded model"""
-    if 'tokenizer' not in st.session_state or 'model' not in st.session_state:
-        return "Model not loaded yet. Please wait..."
-    
+def generate_text(prompt, max_len=150, temperature=0.7, kind=None):
+    """Generate text with the loaded model
+
+    `kind` (question, expected_answer, feedback) labels the call in telemetry.
+    """
+    # Until the background load finishes, sessions are served fallback content
+    scheduler = get_inference_scheduler()
+    if scheduler is None:
+        return get_fallback_response(prompt, kind=kind, reason="model not ready")
+    if st.session_state.get('fallback_mode', False):
+        return get_fallback_response(prompt, kind=kind, reason="circuit open")
+
     try:
-        inputs = st.session_state.tokenizer(
-            prompt, 
-            return_tensors="pt", 
-            max_length=512,
-            truncation=True
-        )
-        
-        # Move inputs to the same device as model
-        device = next(st.session_state.model.parameters()).device
-        inputs = {k: v.to(device) for k, v in inputs.items()}
-        
-        outputs = st.session_state.model.generate(
-            **inputs, 
-            max_length=max_len,
-            min_length=20,
-            temperature=temperature,
-            do_sample=True,
-            top_p=0.9,
-            no_repeat_ngram_size=2,
-            pad_token_id=st.session_state.tokenizer.eos_token_id
-        )
-        
-        generated_text = st.session_state.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        
-        # Remove the input prompt from the generated text
-        if generated_text.startswith(prompt):
-            generated_text = generated_text[len(prompt):].strip()
-        
-        # Ensure we have meaningful content
-        if len(generated_text.strip()) < 10:
-            return get_fallback_response(prompt)
-        
-        return generated_text.strip()
+        # Queued with prompts from other sessions and run as one padded batch
+        future = scheduler.submit(prompt, max_len=max_len, temperature=temperature, kind=kind)
+        try:
+            generated_text = future.result(timeout=LATENCY_BUDGETS.get(kind))
+        except concurrent.futures.TimeoutError:
+            # Over budget: answer now. A still-queued request is dropped; one already in a
+            # batch finishes with it and its result is discarded.
+            future.cancel()
+            return get_fallback_response(prompt, kind=kind, reason="deadline exceeded")
+        return clean_generated_text(prompt, generated_text, kind=kind)
     
     except Exception as e:
         st.error(f"Model error: {e}")
-        return get_fallback_response(prompt)
+        return get_fallback_response(prompt, kind=kind, reason="model error")
 
-def get_fallback_response(prompt):
+def results_within_budget(futures, budget):
+    """Texts of a batch of futures, None for each one not done within `budget` seconds
+
+    The budget covers the whole batch; None waits for every result. Late requests
+    are cancelled like in generate_text.
+    """
+    deadline = None if budget is None else time.monotonic() + budget
+    results = []
+    for future in futures:
+        try:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            results.append(future.result(timeout=timeout))
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            results.append(None)
+    return results
+
+def generate_text_stream(prompt, max_len=150, temperature=0.7, kind=None):
+    """Like generate_text, but yields text chunks as the model produces them"""
+    scheduler = get_inference_scheduler()
+    if scheduler is None:
+        yield get_fallback_response(prompt, kind=kind, reason="model not ready")
+        return
+    if st.session_state.get('fallback_mode', False):
+        yield get_fallback_response(prompt, kind=kind, reason="circuit open")
+        return
+    
+    produced = False
+    try:
+        for chunk in scheduler.stream(
+            prompt, max_len=max_len, temperature=temperature, kind=kind,
+            first_token_timeout=LATENCY_BUDGETS.get(kind)
+        ):
+            produced = True
+            yield chunk
+    except TimeoutError:
+        # Nothing arrived within budget; the generation has been stopped
+        if not produced:
+            yield get_fallback_response(prompt, kind=kind, reason="deadline exceeded")
+    except Exception as e:
+        st.error(f"Model error: {e}")
+        if not produced:
+            yield get_fallback_response(prompt, kind=kind, reason="model error")
+
+def clean_generated_text(prompt, generated_text, track=None, difficulty=None, kind=None):
+    """Strip the echoed prompt and fall back when the output is too short"""
+    # Remove the input prompt from the generated text
+    generated_text = strip_prompt_echo(prompt, generated_text)
+    
+    # Ensure we have meaningful content
+    if len(generated_text.strip()) < 10:
+        return get_fallback_response(prompt, track, difficulty, kind=kind, reason="output too short")
+    
+    return generated_text.strip()
+
+def get_fallback_response(prompt, track=None, difficulty=None, kind=None, reason="fallback"):
     """Provide fallback responses when model fails"""
-    if "feedback" in prompt.lower():
-        feedbacks = [
-            "Good start! Try to be more specific and provide concrete examples in your answer.",
-            "Your answer shows understanding. Consider elaborating with real-world applications.",
-            "Well thought out response. Adding technical details would strengthen your answer.",
-            "Nice explanation! Try to structure your answer with clear points next time."
-        ]
-        return random.choice(feedbacks)
+    if kind is None:
+        # Only callers that do not know what they asked for are guessed from the prompt
+        kind = "feedback" if "feedback" in prompt.lower() else "question"
+    get_telemetry().record_fallback(kind, reason)
+    
+    if kind == "expected_answer":
+        # No built-in reference answer; scoring skips questions without one
+        return ""
+    if kind == "feedback":
+        return random.choice(FALLBACK_FEEDBACK)
     else:
         # Return a relevant question based on the track
-        track = st.session_state.get('selected_track', 'Artificial Intelligence')
-        difficulty = st.session_state.get('selected_difficulty', 'Easy')
-        
-        questions = {
-            "Artificial Intelligence": {
-                "Easy": [
-                    "What is the difference between supervised and unsupervised learning?",
-                    "Can you explain what a neural network is in simple terms?",
-                    "What are some common applications of machine learning you encounter daily?"
-                ],
-                "Medium": [
-                    "How would you handle overfitting in a machine learning model?",
-                    "Explain the bias-variance tradeoff in machine learning.",
-                    "What evaluation metrics would you use for a classification problem?"
-                ],
-                "Hard": [
-                    "How would you implement a transformer model for natural language processing?",
-                    "Explain how gradient descent optimization algorithms work.",
-                    "Discuss the ethical considerations in AI development and deployment."
-                ]
-            },
-            "Software Development": {
-                "Easy": [
-                    "What is version control and why is it important?",
-                    "Explain the concept of object-oriented programming.",
-                    "What are some key principles of writing clean code?"
-                ],
-                "Medium": [
-                    "How would you optimize a slow database query?",
-                    "Explain the Model-View-Controller architecture pattern.",
-                    "What testing methodologies do you follow in your development process?"
-                ],
-                "Hard": [
-                    "How would you design a scalable microservices architecture?",
-                    "Explain the CAP theorem and its implications for distributed systems.",
-                    "Describe your approach to securing a web application against common vulnerabilities."
-                ]
-            }
-        }
+        # Background threads have no session state, so they pass track/difficulty in
+        if track is None:
+            track = st.session_state.get('selected_track', 'Artificial Intelligence')
+        if difficulty is None:
+            difficulty = st.session_state.get('selected_difficulty', 'Easy')
         
-        if track in questions and difficulty in questions[track]:
-            return random.choice(questions[track][difficulty])
-        return "Can you explain your approach to problem-solving in technical projects?"
+        if track in FALLBACK_QUESTIONS and difficulty in FALLBACK_QUESTIONS[track]:
+            return random.choice(FALLBACK_QUESTIONS[track][difficulty])
+        return DEFAULT_FALLBACK_QUESTION
+
+def prepare_question(track, difficulty, previous_questions, generate, previous_topics=None, accept=None):
+    """Generate the next question and its expected answer with the given generate function
+
+    `accept(question)` may reject a repeat of an earlier question; it gets one
+    retry at a higher temperature before a built-in question is used.
+    """
+    prompt = build_question_prompt(track, difficulty, previous_questions, previous_topics=previous_topics)
+    question = generate(prompt, 100, 0.8, "question")
+    
+    # If question is too short or generic, use fallback
+    if len(question.split()) < 5:
+        question = get_fallback_response("", track, difficulty, kind="question", reason="question too short")
+    
+    if accept is not None and not accept(question):
+        question = generate(prompt, 100, 0.95, "question")
+        if len(question.split()) < 5 or not accept(question):
+            question = get_fallback_response("", track, difficulty, kind="question", reason="question repeated")
+    
+    expected_answer = generate(build_answer_prompt(track, question), 150, 0.7, "expected_answer")
+    return question, expected_answer
+
+def select_questions(scheduler, track, difficulty, candidates, count, seen=None):
+    """Pick up to `count` varied candidates that do not repeat anything in `seen`
+
+    All candidates are embedded in one encoder pass. Near-duplicates (of each other
+    or of `seen`) are dropped, and the rest are ranked by maximal marginal relevance
+    with similarity to the track as relevance. The chosen questions are added to `seen`.
+    """
+    if not candidates:
+        return []
+    vectors = scheduler.embed(candidates + [f"{difficulty} {track} interview question"])
+    vectors, track_vector = vectors[:-1], vectors[-1]
+    existing = seen.vectors() if seen is not None else None
+    kept = np.flatnonzero(~near_duplicate_mask(vectors, QUESTION_DUPLICATE_THRESHOLD, existing))
+    picks = mmr_select(
+        vectors[kept], count,
+        relevance=vectors[kept] @ track_vector,
+        existing=existing,
+        diversity=QUESTION_MMR_DIVERSITY
+    )
+    chosen = kept[picks]
+    if seen is not None:
+        seen.add([candidates[i] for i in chosen], vectors[chosen])
+    return [candidates[i] for i in chosen]
+
+def score_interview(session):
+    """Score every answer against its expected answer in one encoder pass"""
+    scheduler = get_inference_scheduler()
+    if scheduler is None:
+        return
+    try:
+        session.record_scores(score_answers(scheduler.embed, session.answers, session.expected_answers))
+    except Exception as e:
+        st.error(f"Scoring error: {e}")
+
+def question_filter(scheduler, seen):
+    """accept() for prepare_question: rejects near-duplicates of `seen` and remembers the rest"""
+    def accept(question):
+        try:
+            vector = scheduler.embed([question])
+        except Exception:
+            return True
+        if seen.contains_near(vector, QUESTION_DUPLICATE_THRESHOLD)[0]:
+            return False
+        seen.add([question], vector)
+        return True
+    
+    return accept
+
+def plan_interview(scheduler, track, difficulty, num_questions, style=None, fill_with_fallback=True, seen=None,
+                   interactive=True):
+    """Generate candidate questions in one batch, keep a varied set, then generate every expected answer in a second batch
+
+    More candidates than needed are generated and narrowed down by select_questions,
+    so the set neither repeats itself nor anything in `seen`. With
+    fill_with_fallback=False unusable questions are dropped instead of replaced,
+    which is what the question bank wants. Interactive plans are held to
+    LATENCY_BUDGETS; background ones (interactive=False) run in the scheduler's
+    background lane, wait for every result, and their unusable outputs come back
+    empty without counting as fallbacks.
+
+    Returns (questions, expected_answers, generated): the first `generated`
+    questions came from the model, any after them are built-in fallbacks.
+    """
+    def clean(prompt, raw, kind):
+        text = strip_prompt_echo(prompt, raw).strip()
+        if len(text) >= 10:
+            return text
+        if interactive:
+            # Unusable questions are replaced by built-in ones below, after the model's
+            get_telemetry().record_fallback(kind, "output too short")
+        return ""
+
+    num_candidates = max(num_questions, math.ceil(num_questions * QUESTION_CANDIDATE_FACTOR))
+    focus_areas = question_focus_areas(track, difficulty, num_candidates)
+    random.shuffle(focus_areas)
+    question_prompts = [build_question_prompt(track, difficulty, [], focus, style) for focus in focus_areas]
+    raw_questions = results_within_budget(
+        scheduler.submit_many(
+            question_prompts, max_len=100, temperature=0.8, kind="question", background=not interactive
+        ),
+        LATENCY_BUDGETS.get("question") if interactive else None
+    )
+    
+    candidates = []
+    for prompt, raw_question in zip(question_prompts, raw_questions):
+        if raw_question is None:
+            # Late candidates are dropped; the gap is filled below like any rejected one
+            get_telemetry().record_fallback("question", "deadline exceeded")
+            continue
+        question = clean(prompt, raw_question, "question")
+        # Too short, generic or repeated questions are not candidates
+        if len(question.split()) >= 5 and question.lower() not in (c.lower() for c in candidates):
+            candidates.append(question)
+    
+    try:
+        questions = select_questions(scheduler, track, difficulty, candidates, num_questions, seen)
+    except Exception:
+        # Without embeddings, fall back to the exact-match de-duplication above
+        questions = candidates[:num_questions]
+    
+    generated = len(questions)
+    # Fill any gap with unused fallbacks
+    while fill_with_fallback and len(questions) < num_questions:
+        for _ in range(5):
+            question = get_fallback_response("", track, difficulty, kind="question", reason="question rejected")
+            if question.lower() not in (q.lower() for q in questions):
+                break
+        questions.append(question)
+    
+    answer_prompts = [build_answer_prompt(track, question) for question in questions]
+    raw_answers = results_within_budget(
+        scheduler.submit_many(
+            answer_prompts, max_len=150, temperature=0.7, kind="expected_answer", background=not interactive
+        ),
+        LATENCY_BUDGETS.get("expected_answer") if interactive else None
+    )
+    expected_answers = [
+        get_fallback_response(prompt, track, difficulty, kind="expected_answer", reason="deadline exceeded")
+        if raw_answer is None
+        else clean(prompt, raw_answer, "expected_answer")
+        for prompt, raw_answer in zip(answer_prompts, raw_answers)
+    ]
+    return questions, expected_answers, generated
+
+@st.cache_resource(show_spinner=False)
+def get_telemetry():
+    """Process-wide per-call inference telemetry"""
+    return InferenceTelemetry(window=TELEMETRY_WINDOW)
+
+@st.cache_resource(show_spinner=False)
+def get_telemetry_exporter():
+    """Periodically writes telemetry to TELEMETRY_EXPORT_PATH"""
+    if not TELEMETRY_EXPORT_PATH:
+        return None
+    return TelemetryExporter(get_telemetry(), TELEMETRY_EXPORT_PATH, interval=TELEMETRY_EXPORT_INTERVAL)
 
 @st.cache_resource(show_spinner=False)
+def get_circuit_breaker():
+    """Process-wide breaker shared by the scheduler and every session"""
+    return CircuitBreaker(
+        max_queue_depth=BREAKER_MAX_QUEUE_DEPTH,
+        max_latency_ms=BREAKER_MAX_LATENCY_MS,
+        recovery_latency_ms=BREAKER_RECOVERY_LATENCY_MS,
+        cooldown=BREAKER_COOLDOWN
+    )
+
+def load_models(progress):
+    """Main model, plus the draft model when some prompt kind decodes speculatively"""
+    tokenizer, model, info = load_backend(
+        size=MODEL_NAME,
+        precision=MODEL_PRECISION,
+        runtime=MODEL_RUNTIME,
+        compile=MODEL_COMPILE,
+        token=HF_TOKEN,
+        progress=progress
+    )
+    draft_model = None
+    if SPECULATIVE_KINDS and MODEL_RUNTIME == "torch":
+        progress(0.95, "Loading draft model")
+        draft_model, info["draft"] = load_draft_model(
+            SPECULATIVE_DRAFT_SIZE, MODEL_PRECISION, info["device"], HF_TOKEN
+        )
+    return tokenizer, model, draft_model, info
+
+def wait_for_models(progress):
+    """The worker pool holds the models; only its description is needed here"""
+    _, _, info = wait_for_model_server(MODEL_SERVER_SOCKET, progress, timeout=MODEL_SERVER_STARTUP_TIMEOUT)
+    return None, None, None, info
+
+@st.cache_resource(show_spinner=False)
+def get_model_loader():
+    """Start loading and warming the model in the background on the server's first script run"""
+    return ModelLoader(wait_for_models if MODEL_SERVER_SOCKET else load_models)
+
 def load_model_components():
-    """Load the model and tokenizer with proper caching"""
+    """Return (tokenizer, model, draft_model, backend_info) once loaded, or Nones while loading or after a failure"""
+    loader = get_model_loader()
+    if not loader.ready:
+        return None, None, None, None
+    return loader.result
+
+@st.cache_resource(show_spinner=False)
+def get_result_cache():
+    """Process-wide cache of deterministic generations"""
+    return ResultCache(
+        kinds=RESULT_CACHE_KINDS,
+        max_entries=RESULT_CACHE_MAX_ENTRIES,
+        ttl=RESULT_CACHE_TTL,
+        answer_similarity=RESULT_CACHE_ANSWER_SIMILARITY
+    )
+
+@st.cache_resource(show_spinner=False)
+def create_inference_scheduler(_tokenizer, _model, _draft_model=None):
+    """Shared batching scheduler used by every session"""
+    return InferenceScheduler(
+        _tokenizer,
+        _model,
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+        max_concurrent_streams=MAX_CONCURRENT_STREAMS,
+        telemetry=get_telemetry(),
+        breaker=get_circuit_breaker(),
+        draft_model=_draft_model,
+        speculative_kinds=SPECULATIVE_KINDS,
+        result_cache=get_result_cache()
+    )
+
+@st.cache_resource(show_spinner=False)
+def create_remote_scheduler():
+    """Shared client for the model worker pool"""
+    return RemoteScheduler(
+        MODEL_SERVER_SOCKET,
+        connections_per_worker=MODEL_SERVER_CONNECTIONS,
+        telemetry=get_telemetry(),
+        breaker=get_circuit_breaker(),
+        result_cache=get_result_cache()
+    )
+
+def get_inference_scheduler():
+    """The shared scheduler, or None until the model is ready"""
+    tokenizer, model, draft_model, backend_info = load_model_components()
+    if backend_info is None:
+        return None
+    if MODEL_SERVER_SOCKET:
+        return create_remote_scheduler()
+    return create_inference_scheduler(tokenizer, model, draft_model)
+
+# --- Question bank ---
+@st.cache_resource(show_spinner=False)
+def get_question_bank():
+    """Process-wide on-disk question bank"""
+    return QuestionBank(
+        QUESTION_BANK_PATH,
+        max_entries=QUESTION_BANK_MAX_ENTRIES,
+        pool_target=QUESTION_POOL_TARGET
+    )
+
+@st.cache_resource(show_spinner=False)
+def create_question_bank_refiller(_scheduler):
+    """Background refiller that tops up the bank through the batching scheduler"""
+    def fill(key, count):
+        # Background top-ups wait while the breaker is shedding load
+        if not get_circuit_breaker().is_closed():
+            return [], []
+        track, difficulty, style = parse_bank_key(key)
+        questions, expected_answers, _ = plan_interview(
+            _scheduler, track, difficulty, count, style,
+            fill_with_fallback=False, seen=bank_question_index(_scheduler, key), interactive=False
+        )
+        return questions, expected_answers
+    
+    return QuestionBankRefiller(get_question_bank(), fill)
+
+@st.cache_resource(show_spinner=False)
+def get_bank_question_indexes():
+    """Embedding index per bank key, so top-ups do not bank near-duplicates"""
+    return {}, threading.Lock()
+
+def bank_question_index(scheduler, key):
+    """The index for `key`, seeded with its banked questions on first use"""
+    indexes, lock = get_bank_question_indexes()
+    with lock:
+        if key not in indexes:
+            index = EmbeddingIndex()
+            questions = get_question_bank().questions(key)
+            if questions:
+                index.add(questions, scheduler.embed(questions))
+            indexes[key] = index
+        return indexes[key]
+
+def get_seen_questions():
+    """Embedding index of every question this browser session was asked, across interviews"""
+    if 'seen_questions' not in st.session_state:
+        st.session_state.seen_questions = EmbeddingIndex()
+    return st.session_state.seen_questions
+
+def drop_seen_questions(scheduler, pairs):
+    """Filter banked (question, expected_answer) pairs down to ones this session has not seen"""
+    if not pairs:
+        return pairs
+    seen = get_seen_questions()
+    questions = [question for question, _ in pairs]
     try:
-        # Use a smaller model for better performance
-        model_name = "google/flan-t5-large"
-        
-        if HF_TOKEN:
-            tokenizer = AutoTokenizer.from_pretrained(model_name, token=HF_TOKEN)
-            model = AutoModelForSeq2SeqLM.from_pretrained(model_name, token=HF_TOKEN)
+        vectors = scheduler.embed(questions)
+    except Exception:
+        return pairs
+    repeated = near_duplicate_mask(vectors, QUESTION_DUPLICATE_THRESHOLD, seen.vectors())
+    kept = np.flatnonzero(~repeated)
+    seen.add([questions[i] for i in kept], vectors[kept])
+    return [pairs[i] for i in kept]
+
+def get_question_bank_refiller():
+    """The shared refiller, or None until the model is ready"""
+    scheduler = get_inference_scheduler()
+    if scheduler is None:
+        return None
+    return create_question_bank_refiller(scheduler)
+
+# --- Transcripts ---
+@st.cache_resource(show_spinner=False)
+def get_transcript_store():
+    """Process-wide transcript store, or None when TRANSCRIPT_DB_PATH is empty"""
+    if not TRANSCRIPT_DB_PATH:
+        return None
+    store = TranscriptStore(TRANSCRIPT_DB_PATH)
+    if TRANSCRIPT_RETENTION_DAYS:
+        store.delete_older_than(TRANSCRIPT_RETENTION_DAYS * 86400)
+    return store
+
+def get_interview_param():
+    """Interview id from the page URL, which survives a server restart"""
+    if hasattr(st, "query_params"):
+        return st.query_params.get("interview")
+    return st.experimental_get_query_params().get("interview", [None])[0]
+
+def set_interview_param(interview_id):
+    if hasattr(st, "query_params"):
+        if interview_id is None:
+            st.query_params.pop("interview", None)
         else:
-            tokenizer = AutoTokenizer.from_pretrained(model_name)
-            model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-        
-        # Handle tokenizer padding token
-        if tokenizer.pad_token is None:
-            tokenizer.pad_token = tokenizer.eos_token
-        
-        return tokenizer, model
-        
-    except Exception as e:
-        st.error(f"Error loading model: {e}")
-        return None, None
+            st.query_params["interview"] = interview_id
+    else:
+        st.experimental_set_query_params(**({"interview": interview_id} if interview_id else {}))
+
+def resume_interview():
+    """Pick up the interview named in the URL after a restart or a new browser session"""
+    if 'interview' in st.session_state or get_transcript_store() is None:
+        return
+    interview_id = get_interview_param()
+    if not interview_id:
+        return
+    session = InterviewSession.restore(get_transcript_store(), interview_id, window=CHAT_WINDOW)
+    if session is None:
+        set_interview_param(None)
+        return
+    st.session_state.interview = session
+    st.session_state.settings_confirmed = True
+    st.session_state.selected_track = session.track
+    st.session_state.selected_difficulty = session.difficulty
+    st.session_state.interviewer_style = session.interviewer_style
+    st.session_state.coach_style = session.coach_style
+
+# --- Next-question prefetching ---
+@st.cache_resource(show_spinner=False)
+def get_prefetch_executor():
+    """Thread pool shared by all sessions for background question generation"""
+    return concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="question-prefetch")
+
+def generate_in_background(scheduler, cancelled, track, difficulty, prompt, max_len, temperature, kind=None):
+    """Thread-safe generate_text: no session state, aborts when the interview is reset"""
+    if cancelled.is_set():
+        raise concurrent.futures.CancelledError()
+    future = scheduler.submit(prompt, max_len=max_len, temperature=temperature, kind=kind)
+    while True:
+        try:
+            generated_text = future.result(timeout=0.1)
+            break
+        except concurrent.futures.TimeoutError:
+            if cancelled.is_set():
+                future.cancel()
+                raise concurrent.futures.CancelledError()
+    return clean_generated_text(prompt, generated_text, track, difficulty, kind=kind)
+
+def start_question_prefetch(index):
+    """Start generating question `index` and its expected answer in the background"""
+    session = st.session_state.interview
+    if index >= session.num_questions or len(session.questions) > index:
+        return
+    prefetch = st.session_state.get('prefetch')
+    if prefetch is not None and prefetch["index"] == index:
+        return
+    cancel_question_prefetch()
+    
+    scheduler = get_inference_scheduler()
+    if scheduler is None or st.session_state.get('fallback_mode', False):
+        return
+    
+    cancelled = threading.Event()
+    generate = functools.partial(generate_in_background, scheduler, cancelled, session.track, session.difficulty)
+    future = get_prefetch_executor().submit(
+        prepare_question, session.track, session.difficulty, list(session.questions), generate,
+        session.previous_topics, question_filter(scheduler, get_seen_questions())
+    )
+    st.session_state.prefetch = {"index": index, "future": future, "cancelled": cancelled}
+
+def bank_when_done(future, key):
+    """Keep a prefetched question that missed its deadline for later interviews"""
+    bank = get_question_bank()
+    
+    def done(finished):
+        if finished.cancelled() or finished.exception() is not None:
+            return
+        question, expected_answer = finished.result()
+        bank.add_many(key, [question], [expected_answer])
+    
+    future.add_done_callback(done)
+
+def take_prefetched_question(index):
+    """Return the prefetched (question, expected_answer) for `index`, or None"""
+    prefetch = st.session_state.pop('prefetch', None)
+    if prefetch is None:
+        return None
+    if prefetch["index"] != index:
+        prefetch["cancelled"].set()
+        prefetch["future"].cancel()
+        return None
+    try:
+        return prefetch["future"].result(timeout=LATENCY_BUDGETS["question"])
+    except concurrent.futures.TimeoutError:
+        # Serve a fallback now; the prefetch keeps running and refills the bank
+        session = st.session_state.interview
+        bank_when_done(prefetch["future"], bank_key(session.track, session.difficulty, session.interviewer_style))
+        question = get_fallback_response(
+            "", session.track, session.difficulty, kind="question", reason="deadline exceeded"
+        )
+        return question, ""
+    except Exception:
+        return None
+
+def stop_voice_answer():
+    """Discard a recording in progress, e.g. on a new interview or when switching to typing"""
+    st.session_state.pop('voice_error', None)
+    transcriber = st.session_state.pop('voice_transcriber', None)
+    if transcriber is not None:
+        transcriber.finish(timeout=0)
+
+def cancel_question_prefetch():
+    """Stop any in-flight prefetch for this session"""
+    prefetch = st.session_state.pop('prefetch', None)
+    if prefetch is not None:
+        prefetch["cancelled"].set()
+        prefetch["future"].cancel()
 
 # --- Streamlit UI ---
 st.set_page_config(page_title="AI Interview Simulator", page_icon="🤖", layout="wide")
+
+# Kick off the background model load before anything else renders
+model_loader = get_model_loader()
+get_telemetry_exporter()
+resume_interview()
+
+def render_model_status():
+    """System Status: real load progress, then the backend report"""
+    if model_loader.ready:
+        st.success("✅ Model loaded successfully")
+        backend_info = model_loader.result[-1]
+        st.caption(f"🧠 {describe_backend(backend_info)}")
+        memory_text = f"{backend_info['rss_delta_mb']:.0f} MB RSS"
+        if backend_info['parameter_mb'] is not None:
+            memory_text += f" ({backend_info['parameter_mb']:.0f} MB weights)"
+        st.caption(f"Memory: {memory_text}")
+        st.caption(f"Load: {backend_info['load_seconds']:.1f}s | Warm-up: {backend_info['warmup_seconds']:.2f}s")
+        if backend_info.get('draft'):
+            st.caption(f"Draft model: {backend_info['draft']['model_name'].split('/')[-1]} "
+                       f"(+{backend_info['draft']['parameter_mb']:.0f} MB weights)")
+    elif model_loader.error is not None:
+        st.error(f"Error loading model: {model_loader.error}")
+        st.caption("Using fallback mode.")
+    else:
+        elapsed = time.time() - model_loader.started_at
+        st.progress(model_loader.progress, text=f"⏳ {model_loader.stage}... ({elapsed:.0f}s)")
+        st.caption("Interviews use built-in questions until the model is ready.")
+
+# Refresh the status on its own while loading, where Streamlit supports fragments
+if hasattr(st, "fragment") and not model_loader.finished:
+    render_model_status = st.fragment(run_every=2)(render_model_status)
 st.title("AI-Powered Interview Simulation")
 st.markdown("Experience a realistic interview with AI-generated questions and feedback!")
 
@@ -154,10 +717,71 @@ with st.sidebar:
 
     # Display model status
     st.subheader("System Status")
-    if st.session_state.model_loaded:
-        st.success("✅ Model loaded successfully")
-    else:
-        st.warning("⏳ Model not loaded yet")
+    render_model_status()
+
+    bank_stats = get_question_bank().stats()
+    st.caption(f"📚 Question bank: {bank_stats['entries']} questions, {sum(bank_stats['fresh'].values())} unused")
+
+    if get_inference_scheduler() is not None:
+        with st.expander("Inference Queue"):
+            queue_metrics = get_inference_scheduler().metrics()
+            st.caption(f"Queue depth: {queue_metrics['queue_depth']} (peak {queue_metrics['max_queue_depth']})")
+            st.caption(f"Batches: {queue_metrics['batches']} | Avg batch size: {queue_metrics['avg_batch_size']:.2f}")
+            st.caption(f"Avg queue wait: {queue_metrics['avg_wait_ms']:.1f} ms | Avg batch time: {queue_metrics['avg_batch_ms']:.0f} ms")
+            if queue_metrics['batch_sizes']:
+                sizes = ", ".join(f"{size}×{count}" for size, count in sorted(queue_metrics['batch_sizes'].items()))
+                st.caption(f"Batch sizes: {sizes}")
+            if queue_metrics.get('prompt_cache'):
+                prompt_cache = queue_metrics['prompt_cache']
+                st.caption(
+                    f"Prompt encodings: {prompt_cache['hit_rate']:.0%} cached | "
+                    f"{prompt_cache['trimmed']} trimmed to fit"
+                )
+            cache_stats = get_result_cache().stats()
+            if cache_stats['hits'] or cache_stats['near_hits'] or cache_stats['misses']:
+                st.caption(
+                    f"Result cache: {cache_stats['hit_rate']:.0%} hits ({cache_stats['near_hits']} near-duplicate "
+                    f"answers) | {cache_stats['entries']} entries"
+                )
+            if queue_metrics.get('speculative'):
+                speculative = queue_metrics['speculative']
+                st.caption(
+                    f"Speculative ({', '.join(speculative['kinds']) or 'off'}): "
+                    f"{speculative['acceptance_rate']:.0%} of draft tokens accepted | "
+                    f"{speculative['tokens_per_target_forward']:.2f} tokens per large-model pass"
+                )
+            breaker = get_circuit_breaker()
+            st.caption(
+                f"Circuit breaker: {breaker.state.replace('_', '-')} | "
+                f"recent latency {breaker.recent_latency_ms():.0f} ms | trips {breaker.trips}"
+            )
+
+    telemetry_snapshot = get_telemetry().snapshot()
+    if telemetry_snapshot:
+        with st.expander("Inference Telemetry"):
+            for kind, kind_stats in telemetry_snapshot.items():
+                st.markdown(
+                    f"**{kind.replace('_', ' ').title()}** · {kind_stats['calls']} calls "
+                    f"+ {kind_stats['cached']} cache hits, {kind_stats['fallbacks']} fallbacks"
+                )
+                for field, label in (("total_ms", "Total"), ("first_token_ms", "First token"), ("queue_ms", "Queue"),
+                                     ("tokenize_ms", "Tokenize"), ("generate_ms", "Generate"), ("decode_ms", "Decode")):
+                    if field in kind_stats:
+                        st.caption(f"{label}: p50 {kind_stats[field]['p50']:.0f} ms | p95 {kind_stats[field]['p95']:.0f} ms")
+                if "prompt_tokens" in kind_stats:
+                    st.caption(
+                        f"Tokens: {kind_stats['prompt_tokens']['mean']:.0f} in / "
+                        f"{kind_stats['generated_tokens']['mean']:.0f} out (mean)"
+                    )
+                if "acceptance_rate" in kind_stats:
+                    st.caption(f"Draft acceptance: p50 {kind_stats['acceptance_rate']['p50']:.0%} (speculative decoding)")
+                if "rtf" in kind_stats:
+                    st.caption(
+                        f"Real-time factor: p50 {kind_stats['rtf']['p50']:.2f} | p95 {kind_stats['rtf']['p95']:.2f} "
+                        f"over {kind_stats['audio_ms']['mean'] / 1000:.1f} s segments (mean)"
+                    )
+                if kind_stats["rejected"]:
+                    st.caption(f"Stopped early as unusable: {kind_stats['rejected']} | resampled: {kind_stats['resampled']}")
 
     # Input options
     tracks = [
@@ -208,251 +832,247 @@ with st.sidebar:
         # Store configuration
         st.session_state.selected_track = selected_track
         st.session_state.selected_difficulty = selected_difficulty
-        st.session_state.selected_num_questions = num_questions
         st.session_state.interviewer_style = interviewer_style
         st.session_state.coach_style = coach_style
         
         # Reset interview state
-        st.session_state.current_q = 0
-        st.session_state.user_answers = []
-        st.session_state.conversation = []
-        st.session_state.interview_finished = False
-        st.session_state.questions = []
-        st.session_state.expected_answers = []
+        cancel_question_prefetch()
+        stop_voice_answer()
+        session = InterviewSession(
+            selected_track, selected_difficulty, num_questions, interviewer_style, coach_style,
+            store=get_transcript_store(), window=CHAT_WINDOW
+        )
+        st.session_state.interview = session
+        st.session_state.pop('history_pages', None)
+        set_interview_param(session.interview_id)
         st.session_state.settings_confirmed = True
         
-        # Load model if not already loaded
-        if not st.session_state.model_loaded:
-            st.session_state.model_loading = True
-            with st.spinner("Loading AI model..."):
-                tokenizer, model = load_model_components()
-                if tokenizer and model:
-                    st.session_state.tokenizer = tokenizer
-                    st.session_state.model = model
-                    st.session_state.model_loaded = True
-                else:
-                    st.error("Failed to load model. Using fallback mode.")
-                    st.session_state.model_loaded = True  # Continue with fallback
-                st.session_state.model_loading = False
+        # Serve from the warm question bank first; plan whatever is missing in one batched pass
+        key = bank_key(selected_track, selected_difficulty, interviewer_style)
+        scheduler = get_inference_scheduler()
+        # Skip banked questions this candidate already had in an earlier interview; they stay fresh in the bank
+        accept = functools.partial(drop_seen_questions, scheduler) if scheduler is not None else None
+        banked = get_question_bank().take(key, num_questions, accept)
+        session.add_questions([question for question, _ in banked], [expected_answer for _, expected_answer in banked])
+        
+        # While the inference queue is saturated, new interviews run on fallback content
+        st.session_state.fallback_mode = (
+            scheduler is not None and not get_circuit_breaker().allow(scheduler.queue_depth())
+        )
+        
+        missing = num_questions - len(banked)
+        if missing and scheduler is not None and not st.session_state.fallback_mode:
+            with st.spinner("💭 Preparing your interview questions..."):
+                try:
+                    questions, expected_answers, generated = plan_interview(
+                        scheduler, selected_track, selected_difficulty, missing, interviewer_style,
+                        seen=get_seen_questions()
+                    )
+                    session.add_questions(questions, expected_answers)
+                    # Built-in fallbacks at the end are not model output; only bank what the model wrote
+                    get_question_bank().add_many(
+                        key, questions[:generated], expected_answers[:generated], used=True
+                    )
+                except Exception as e:
+                    st.error(f"Model error: {e}")
+        
+        # Let the model top up the pool for this setup in the background
+        refiller = get_question_bank_refiller()
+        if refiller is not None:
+            refiller.request(key)
         st.rerun()
 
 # Show loading message until model is ready
-if not st.session_state.model_loaded and st.session_state.get('model_loading', False):
-    st.info("⏳ The AI model is loading. You can configure your interview while you wait.")
-    st.spinner("Downloading model components...")
+if not model_loader.finished:
+    st.info("⏳ The AI model is warming up in the background. You can start right away; questions and feedback come from the built-in set until it is ready.")
 
-# Only show interview section when ready
-if st.session_state.model_loaded and st.session_state.get('settings_confirmed', False):
+def render_message(msg):
+    chat_role, avatar, prefix = ROLE_DISPLAY[msg["role"]]
+    with st.chat_message(chat_role, avatar=avatar):
+        if msg["role"] == "System":
+            st.info(f"{prefix}{msg['message']}")
+        else:
+            st.write(f"{prefix}{msg['message']}")
+
+RERUN_FRAGMENT_SCOPE = hasattr(st, "fragment") and "scope" in inspect.signature(st.rerun).parameters
+
+def in_fragment_rerun():
+    """Whether this script run only reruns fragments; a full run may execute a fragment too
+
+    Only full runs reach the top-level call of render_interview, which marks the
+    interview as drawn by the whole script while it runs.
+    """
+    return not st.session_state.get('interview_full_run', False)
+
+def rerun_interview():
+    """Rerun just the interview fragment when answering from a fragment rerun, else the whole app"""
+    if RERUN_FRAGMENT_SCOPE and in_fragment_rerun():
+        try:
+            st.rerun(scope="fragment")
+        except StreamlitAPIException:
+            # Streamlit disagrees that this is a fragment rerun; a full rerun always works
+            pass
+    st.rerun()
+
+def coach_answer(session, conversation_container, answer):
+    """Stream coach feedback on `answer` into the chat, then move the interview on"""
+    feedback_prompt = build_feedback_prompt(session.current_question, answer)
+    
+    with conversation_container:
+        render_message({"role": "Candidate", "message": answer})
+        with st.chat_message("assistant", avatar="📊"):
+            feedback_placeholder = st.empty()
+            feedback_placeholder.write("**Coach**: 📝 _analyzing your response..._")
+            feedback = ""
+            for chunk in generate_text_stream(feedback_prompt, max_len=150, temperature=0.7, kind="feedback"):
+                feedback += chunk
+                feedback_placeholder.write(f"**Coach**: {feedback}▌")
+            feedback = feedback.strip()
+            
+            # Ensure feedback is constructive and not repetitive
+            if not is_usable_feedback(feedback):
+                feedback = get_fallback_response("feedback", kind="feedback", reason="feedback rejected")
+            feedback_placeholder.write(f"**Coach**: {feedback}")
     
-    # Initialize session state variables
-    if 'current_q' not in st.session_state:
-        st.session_state.current_q = 0
-        st.session_state.user_answers = []
-        st.session_state.conversation = []
-        st.session_state.interview_finished = False
-        st.session_state.questions = []
-        st.session_state.expected_answers = []
-
-    def add_to_conversation(role, message, agent_type=None):
-        """Add message to conversation history"""
-        if 'conversation' not in st.session_state:
-            st.session_state.conversation = []
-        st.session_state.conversation.append({
-            "role": role,
-            "message": message,
-            "agent": agent_type,
-            "timestamp": time.time()
-        })
-
-    # Initialize conversation
-    if len(st.session_state.get('conversation', [])) == 0:
-        welcome_msg = f"Welcome! Starting your {st.session_state.selected_difficulty.lower()} level interview for {st.session_state.selected_track}. We'll go through {st.session_state.selected_num_questions} questions together."
-        add_to_conversation("System", welcome_msg)
+    session.submit_answer(answer, feedback)
+    if session.finished:
+        with st.spinner("📊 Scoring your answers..."):
+            score_interview(session)
+    rerun_interview()
+
+def render_live_transcript():
+    """The transcript as it grows; polled on its own so the script never blocks while recording"""
+    transcriber = st.session_state.get('voice_transcriber')
+    if transcriber is None:
+        return
+    if transcriber.recording or transcriber.error is None:
+        st.info(f"🎙️ Listening... {transcriber.partial_text() or '_start speaking_'}")
+        return
+    # The microphone failed mid-answer; the whole interview goes back to the Start button
+    del st.session_state['voice_transcriber']
+    st.session_state.voice_error = str(transcriber.error)
+    st.rerun()
+
+# Poll while recording, where Streamlit supports fragments; otherwise it updates on the next rerun
+if hasattr(st, "fragment"):
+    render_live_transcript = st.fragment(run_every=VOICE_POLL_SECONDS)(render_live_transcript)
 
+def render_voice_answer(session, conversation_container):
+    """Record a spoken answer; feedback starts as soon as the candidate stops"""
+    transcriber = st.session_state.get('voice_transcriber')
+    if transcriber is None:
+        error = st.session_state.pop('voice_error', None)
+        if error is not None:
+            st.error(f"Recording failed: {error}")
+        if st.button("🎙️ Start answering", key=f"voice_start_{session.current_q}", type="primary"):
+            try:
+                transcriber = IncrementalTranscriber(
+                    VOICE_ENGINE, VOICE_LANGUAGE, VOICE_PAUSE_SECONDS, VOICE_MAX_SEGMENT_SECONDS,
+                    telemetry=get_telemetry()
+                ).start()
+            except Exception as e:
+                st.error(f"Voice answers are unavailable: {e}")
+                return
+            st.session_state.voice_transcriber = transcriber
+            rerun_interview()
+        st.caption("💡 Speak naturally; your answer is transcribed on this machine while you talk")
+        return
+    
+    if st.button("⏹️ Stop and get feedback", key=f"voice_stop_{session.current_q}", type="primary"):
+        del st.session_state['voice_transcriber']
+        # Earlier segments are already transcribed; only the last few seconds are left
+        answer = transcriber.finish()
+        if transcriber.error is not None:
+            st.error(f"Recording failed: {transcriber.error}")
+        if not answer:
+            st.warning("No speech was recognized. Try again, or switch to typing.")
+            return
+        coach_answer(session, conversation_container, answer)
+        return
+    
+    render_live_transcript()
+
+def render_interview():
+    """The interview itself; answering a question reruns only this part of the page"""
+    session = st.session_state.interview
+    
+    # Get the current question ready before rendering, so asking it needs no extra rerun
+    if session.needs_question:
+        with st.spinner("💭 Preparing next question..."):
+            # Use the question prefetched while the previous answer was being written
+            prepared = take_prefetched_question(session.current_q)
+            if prepared is None:
+                scheduler = get_inference_scheduler()
+                accept = None
+                if scheduler is not None and not st.session_state.get('fallback_mode', False):
+                    accept = question_filter(scheduler, get_seen_questions())
+                prepared = prepare_question(
+                    session.track, session.difficulty, session.questions, generate_text,
+                    session.previous_topics, accept
+                )
+            session.add_question(*prepared)
+    if not session.finished and session.phase != AWAITING_ANSWER:
+        session.ask_next()
+    
     # Display conversation
     st.subheader("Interview in Progress")
+    if st.session_state.get('fallback_mode', False):
+        st.warning("⚠️ The AI model is busy right now, so this interview uses built-in questions and feedback.")
     
-    # Show progress - Fixed the off-by-one error
-    if st.session_state.current_q < st.session_state.selected_num_questions:
-        progress = (st.session_state.current_q) / st.session_state.selected_num_questions
-        st.progress(progress, text=f"Question {st.session_state.current_q + 1} of {st.session_state.selected_num_questions}")
-    else:
-        st.progress(1.0, text=f"Completed {st.session_state.selected_num_questions} of {st.session_state.selected_num_questions} questions")
+    progress, progress_text = session.progress()
+    st.progress(progress, text=progress_text)
 
     # Conversation display
     conversation_container = st.container()
     with conversation_container:
-        for msg in st.session_state.get('conversation', []):
-            if msg["role"] == "System":
-                with st.chat_message("system"):
-                    st.info(f"📢 {msg['message']}")
-            elif msg["role"] == "Interviewer":
-                with st.chat_message("assistant", avatar="👔"):
-                    st.write(f"**Interviewer**: {msg['message']}")
-            elif msg["role"] == "Coach":
-                with st.chat_message("assistant", avatar="📊"):
-                    st.write(f"**Coach**: {msg['message']}")
-            elif msg["role"] == "Candidate":
-                with st.chat_message("user", avatar="🧑‍💼"):
-                    st.write(f"**You**: {msg['message']}")
+        # Only the recent window lives in memory; older pages come from the store on request
+        earliest = session.earliest_loaded_seq
+        pages = st.session_state.get('history_pages', 0)
+        if earliest - pages * CHAT_WINDOW > 0 and st.button(
+            f"⬆️ Load earlier messages ({earliest - pages * CHAT_WINDOW} more)", key="load_earlier_messages"
+        ):
+            pages += 1
+            st.session_state.history_pages = pages
+        if pages:
+            for msg in session.history(earliest, limit=pages * CHAT_WINDOW):
+                render_message(msg)
+        for msg in session.conversation:
+            render_message(msg)
 
     # Interview logic
-    if not st.session_state.get('interview_finished', False):
-        if st.session_state.current_q < st.session_state.selected_num_questions:
-            current_q_index = st.session_state.current_q
-            
-            # Generate question if needed
-            if len(st.session_state.questions) <= current_q_index:
-                with st.spinner("💭 Preparing next question..."):
-                    # Create specific examples based on track and difficulty
-                    track_examples = {
-                        "Artificial Intelligence": {
-                            "Easy": "real-world ML project, data preprocessing challenge, basic algorithm selection",
-                            "Medium": "production ML system, model optimization, handling bias or drift",
-                            "Hard": "distributed AI architecture, advanced deep learning, ethical AI implementation"
-                        },
-                        "Software Development": {
-                            "Easy": "debugging issue, code refactoring, API design",
-                            "Medium": "system architecture, performance optimization, integration challenges", 
-                            "Hard": "scalable distributed system, complex algorithm implementation, advanced design patterns"
-                        },
-                        "Web Development": {
-                            "Easy": "responsive design problem, basic functionality implementation, user experience issue",
-                            "Medium": "full-stack application design, performance optimization, security implementation",
-                            "Hard": "large-scale web architecture, advanced frontend/backend integration, complex state management"
-                        }
-                    }
-                    
-                    # Get previous questions to avoid repetition
-                    previous_topics = []
-                    if st.session_state.questions:
-                        for prev_q in st.session_state.questions:
-                            if "system" in prev_q.lower():
-                                previous_topics.append("system design")
-                            elif "data" in prev_q.lower():
-                                previous_topics.append("data handling")
-                            elif "performance" in prev_q.lower():
-                                previous_topics.append("optimization")
-                    
-                    previous_topics_text = ", ".join(previous_topics) if previous_topics else "none"
-                    
-                    difficulty_level = st.session_state.selected_difficulty.lower()
-                    track = st.session_state.selected_track
-                    examples = track_examples.get(track, {}).get(st.session_state.selected_difficulty, "practical project challenge")
-                    
-                    question_prompt = f"""Create a {difficulty_level} level interview question for {track} position. 
-                    Make it practical and scenario-based. Examples: {examples}
-                    Avoid topics: {previous_topics_text}
-                    Question:"""
-                    
-                    question = generate_text(question_prompt, max_len=100, temperature=0.8)
-                    
-                    # If question is too short or generic, use fallback
-                    if len(question.split()) < 5:
-                        question = get_fallback_response("")
-                    
-                    # Generate expected answer for scoring
-                    answer_prompt = f"""As a {track} expert, provide key points for answering: "{question}"
-                    List the main technical concepts and approaches:"""
-                    
-                    expected_answer = generate_text(answer_prompt, max_len=150)
-                    
-                    st.session_state.questions.append(question)
-                    st.session_state.expected_answers.append(expected_answer)
-
-            # Ask question if not already asked
-            current_question = st.session_state.questions[current_q_index]
-            question_asked = any(
-                msg.get("question_id") == current_q_index and msg["role"] == "Interviewer"
-                for msg in st.session_state.get('conversation', [])
-            )
-            
-            if not question_asked:
-                add_to_conversation("Interviewer", current_question, "Interviewer")
-                st.session_state.conversation[-1]["question_id"] = current_q_index
-                st.rerun()
-            
-            # Answer form
-            with st.form(key=f"answer_form_{current_q_index}"):
-                user_answer = st.text_area(
-                    "Your answer:", 
-                    key=f"answer_{current_q_index}", 
-                    height=120,
-                    placeholder="Take your time to provide a detailed answer..."
-                )
-                
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.caption("💡 Tip: Use specific examples and explain your reasoning")
-                with col2:
-                    submit_answer = st.form_submit_button("Submit Answer", type="primary")
-                
-                if submit_answer and user_answer.strip():
-                    # Add user answer to conversation
-                    add_to_conversation("Candidate", user_answer, "Candidate")
-                    st.session_state.user_answers.append(user_answer)
-                    
-                    # Generate coach feedback
-                    with st.spinner("📝 Coach analyzing your response..."):
-                        feedback_prompt = f"""You are an interview coach providing feedback after this exchange:
-
-QUESTION: {current_question}
-CANDIDATE'S ANSWER: {user_answer}
-
-Provide specific, actionable feedback focusing on:
-- What they did well in their answer
-- 1-2 specific areas for improvement  
-- One concrete suggestion for how to strengthen their response
-
-Keep it supportive but honest. Feedback:"""
-                        
-                        feedback = generate_text(feedback_prompt, max_len=150, temperature=0.7)
-                        
-                        # Ensure feedback is constructive and not repetitive
-                        if len(feedback.strip()) < 20 or "feedback" in feedback.lower():
-                            feedback = get_fallback_response("feedback")
-                    
-                    add_to_conversation("Coach", feedback, "Coach")
-                    st.session_state.current_q += 1
-                    
-                    # Check if interview is finished
-                    if st.session_state.current_q >= st.session_state.selected_num_questions:
-                        st.session_state.interview_finished = True
-                    st.rerun()
-
+    if not session.finished:
+        current_q_index = session.current_q
+        
+        # Start on the next question while the candidate is answering this one
+        start_question_prefetch(current_q_index + 1)
+        
+        if VOICE_ANSWERS:
+            answer_mode = st.radio("Answer by", ["Typing", "Voice"], horizontal=True, key="answer_mode")
         else:
-            # Interview completed
-            st.session_state.interview_finished = True
+            answer_mode = "Typing"
+        if answer_mode == "Voice":
+            render_voice_answer(session, conversation_container)
+            return
+        # Leaving voice mode must not keep the microphone open
+        stop_voice_answer()
+        
+        # Answer form
+        with st.form(key=f"answer_form_{current_q_index}"):
+            user_answer = st.text_area(
+                "Your answer:", 
+                key=f"answer_{current_q_index}", 
+                height=120,
+                placeholder="Take your time to provide a detailed answer..."
+            )
             
-            # Generate final feedback
-            if 'final_feedback_generated' not in st.session_state:
-                # Create a summary of their performance
-                answer_lengths = [len(ans.split()) for ans in st.session_state.user_answers]
-                avg_length = sum(answer_lengths) / len(answer_lengths) if answer_lengths else 0
-                detailed_answers = sum(1 for length in answer_lengths if length > 25)
-                
-                # Quick assessment based on performance metrics
-                performance_level = "good" if avg_length > 20 else "basic"
-                engagement_level = "high" if detailed_answers > st.session_state.selected_num_questions // 2 else "moderate"
-                
-                # Fast, template-based feedback with personalization
-                overall_feedback = f"""**Overall Performance**: You completed this {st.session_state.selected_difficulty.lower()} level {st.session_state.selected_track} interview with {performance_level} engagement.
-
-**Key Strengths**: 
-• Active participation in all {st.session_state.selected_num_questions} questions
-• {"Detailed responses showing good technical thinking" if engagement_level == "high" else "Willingness to tackle technical challenges"}
-
-**Areas for Improvement**:
-• Structure answers using STAR method (Situation, Task, Action, Result)  
-• Include more specific examples from your experience
-• {"Focus on explaining implementation details" if st.session_state.selected_track in ["Software Development", "Web Development"] else "Discuss real-world applications and case studies"}
-
-**Next Steps**: Practice mock interviews, prepare concrete examples, and focus on explaining your problem-solving process step-by-step."""
-
-                st.session_state.final_feedback_generated = overall_feedback
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.caption("💡 Tip: Use specific examples and explain your reasoning")
+            with col2:
+                submit_answer = st.form_submit_button("Submit Answer", type="primary")
             
-            add_to_conversation("Coach", f"🎯 **Final Assessment**: {st.session_state.final_feedback_generated}", "Coach")
-            st.rerun()
+            if submit_answer and user_answer.strip():
+                coach_answer(session, conversation_container, user_answer)
 
     else:
         # Show completion
@@ -465,21 +1085,34 @@ Keep it supportive but honest. Feedback:"""
         with col1:
             st.metric(
                 "Questions Completed", 
-                f"{st.session_state.selected_num_questions}/{st.session_state.selected_num_questions}",
+                f"{session.num_questions}/{session.num_questions}",
                 "100%"
             )
         
+        score_summary = summarize_scores(session.scores) if session.scores else None
+        
         with col2:
-            # Calculate engagement score based on answer length
-            if st.session_state.user_answers:
-                avg_length = sum(len(ans.split()) for ans in st.session_state.user_answers) / len(st.session_state.user_answers)
-                engagement_score = min(95, max(65, int(avg_length * 2)))
+            if score_summary is not None:
+                # Match between the answers and the expected answers' key points
+                engagement_score = int(round(score_summary["overall"]))
+                st.metric(
+                    "Engagement Score", f"{engagement_score}%",
+                    help=f"Key-point coverage {score_summary['coverage']:.0%} | "
+                         f"similarity {score_summary['similarity']:.2f} to the expected answers"
+                )
             else:
-                engagement_score = 70
-            st.metric("Engagement Score", f"{engagement_score}%")
+                # No expected answers to compare with: estimate from answer length
+                if session.answers:
+                    engagement_score = min(95, max(65, int(session.average_answer_words() * 2)))
+                else:
+                    engagement_score = 70
+                st.metric("Engagement Score", f"{engagement_score}%")
         
         with col3:
-            improvement_areas = random.randint(2, 4)
+            if score_summary is not None:
+                improvement_areas = score_summary["growth_areas"]
+            else:
+                improvement_areas = len(session.answers) - session.detailed_answers()
             st.metric("Growth Areas Identified", improvement_areas)
         
         # Detailed feedback section
@@ -487,29 +1120,57 @@ Keep it supportive but honest. Feedback:"""
             st.markdown("### Strengths Observed:")
             st.write("✅ Active participation in the interview process")
             st.write("✅ Willingness to engage with technical questions")
-            if any(len(ans.split()) > 30 for ans in st.session_state.user_answers):
+            if session.detailed_answers(30):
                 st.write("✅ Provided detailed responses to questions")
             
+            if score_summary is not None:
+                st.markdown("### Question Breakdown:")
+                for index, result in enumerate(session.scores):
+                    if result is None:
+                        st.write(f"Q{index + 1}: not scored (no expected answer)")
+                        continue
+                    st.write(
+                        f"Q{index + 1}: {result['score']:.0f}% · covered {result['covered_points']} of "
+                        f"{result['key_points']} key points · similarity {result['similarity']:.2f}"
+                    )
+            
             st.markdown("### Recommendations for Improvement:")
+            if score_summary is not None:
+                for index in score_summary["weak_questions"]:
+                    missed = ", ".join(session.scores[index]["missed_points"][:3])
+                    st.write(f"📈 Q{index + 1}: also cover {missed}")
             st.write("📈 Practice the STAR method (Situation, Task, Action, Result)")
             st.write("📈 Include more specific examples from your experience")
             st.write("📈 Focus on explaining your thought process clearly")
             
             st.markdown("### Next Steps:")
-            st.write(f"🎯 Continue practicing {st.session_state.selected_track} concepts")
+            st.write(f"🎯 Continue practicing {session.track} concepts")
             st.write("🎯 Work on structuring your responses more effectively")
             st.write("🎯 Practice explaining complex topics in simple terms")
         
         # Reset button
         if st.button("🔄 Start New Interview", type="primary", use_container_width=True):
             # Clear interview-related session state
-            for key in ['current_q', 'user_answers', 'conversation', 'interview_finished', 
-                       'questions', 'expected_answers', 'settings_confirmed', 
-                       'final_feedback_generated']:
+            cancel_question_prefetch()
+            stop_voice_answer()
+            for key in ['interview', 'settings_confirmed', 'fallback_mode', 'history_pages']:
                 if key in st.session_state:
                     del st.session_state[key]
+            set_interview_param(None)
+            # The whole page changes, so this one reruns the app
             st.rerun()
 
+if hasattr(st, "fragment"):
+    render_interview = st.fragment(render_interview)
+
+# Only show interview section when ready
+if st.session_state.get('settings_confirmed', False) and 'interview' in st.session_state:
+    st.session_state.interview_full_run = True
+    try:
+        render_interview()
+    finally:
+        st.session_state.interview_full_run = False
+
 # Interview tips (always visible)
 with st.expander("💡 Interview Success Tips"):
     st.markdown("""
@@ -0,0 +1,229 @@
+"""Configurable model backends for the interview simulator.
+
+A backend is a (tokenizer, model) pair plus a small report describing how it was
+loaded. The model size (small/base/large flan-t5), numeric precision
+(fp32, bf16 or dynamic int8), torch.compile and the ONNX Runtime export are all
+chosen at load time, so CPU-only nodes can trade quality for memory and latency.
+"""
+import os
+import resource
+import threading
+import time
+
+import torch
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+MODEL_SIZES = {
+    "small": "google/flan-t5-small",
+    "base": "google/flan-t5-base",
+    "large": "google/flan-t5-large",
+}
+PRECISIONS = ("fp32", "bf16", "int8")
+RUNTIMES = ("torch", "onnx")
+
+WARMUP_PROMPT = "Ask one interview question about teamwork."
+
+
+def resolve_model_name(size_or_name):
+    """Map a size alias to its hub id; anything else is used as a model id as-is"""
+    return MODEL_SIZES.get(size_or_name, size_or_name)
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # Not Linux: fall back to the peak, which is the best the stdlib offers
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def choose_device(device="auto"):
+    if device == "auto":
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    return device
+
+
+def parameter_mb(model):
+    """Size of the weights as reported by transformers, if it can tell"""
+    try:
+        return model.get_memory_footprint() / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def _load_torch_model(model_name, precision, device, token, progress):
+    """(model, device it actually ended up on)"""
+    # safetensors checkpoints are memory-mapped, and low_cpu_mem_usage fills the
+    # weights in place instead of building a random-init copy first
+    model = AutoModelForSeq2SeqLM.from_pretrained(
+        model_name,
+        token=token,
+        torch_dtype=torch.bfloat16 if precision == "bf16" else None,
+        low_cpu_mem_usage=True,
+    )
+
+    if precision == "int8":
+        progress(0.7, "Quantizing weights to int8")
+        # Dynamic quantization only has CPU kernels
+        device = "cpu"
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    model.to(device)
+    model.eval()
+    return model, device
+
+
+def _load_onnx_model(model_name, token):
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError as e:
+        raise ImportError(
+            "The ONNX runtime backend needs `optimum[onnxruntime]`; install it or use runtime='torch'"
+        ) from e
+    return ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, token=token)
+
+
+def warm_up(tokenizer, model):
+    """Run one short generate so first-call kernel setup is not paid by a user"""
+    inputs = tokenizer(WARMUP_PROMPT, return_tensors="pt")
+    inputs = {k: v.to(model.device) for k, v in inputs.items()}
+    started = time.perf_counter()
+    with torch.inference_mode():
+        model.generate(**inputs, max_length=8)
+    return time.perf_counter() - started
+
+
+def _ignore_progress(fraction, stage):
+    pass
+
+
+def load_backend(size="large", precision="fp32", runtime="torch", compile=False, device="auto",
+                 token=None, progress=None, warm=True):
+    """Load tokenizer and model for the requested backend
+
+    Returns (tokenizer, model, info) where info reports the backend choice,
+    memory footprint and load/warm-up times. `progress(fraction, stage)` is
+    called as loading moves through its stages. Pass warm=False to skip the
+    warm-up generate, e.g. before forking worker processes that warm up themselves.
+    """
+    progress = progress or _ignore_progress
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision!r}; expected one of {PRECISIONS}")
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Unknown runtime {runtime!r}; expected one of {RUNTIMES}")
+
+    model_name = resolve_model_name(size)
+    device = choose_device(device)
+    rss_before = current_rss_mb()
+    started = time.perf_counter()
+
+    progress(0.05, "Loading tokenizer")
+    tokenizer = AutoTokenizer.from_pretrained(model_name, token=token)
+    # Handle tokenizer padding token
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    progress(0.15, f"Loading {model_name.split('/')[-1]} weights")
+    if runtime == "onnx":
+        model = _load_onnx_model(model_name, token)
+        precision = "fp32"
+        device = "cpu"
+    else:
+        model, device = _load_torch_model(model_name, precision, device, token, progress)
+        if compile:
+            # generate() calls forward once per step, so that is what gets compiled
+            model.forward = torch.compile(model.forward, dynamic=True)
+
+    load_seconds = time.perf_counter() - started
+    warmup_seconds = 0.0
+    if warm:
+        progress(0.85, "Warming up")
+        warmup_seconds = warm_up(tokenizer, model)
+
+    info = {
+        "model_name": model_name,
+        "precision": precision,
+        "runtime": runtime,
+        "compiled": bool(compile) and runtime == "torch",
+        "device": device,
+        "load_seconds": load_seconds,
+        "warmup_seconds": warmup_seconds,
+        "rss_delta_mb": current_rss_mb() - rss_before,
+        "parameter_mb": parameter_mb(model) if runtime == "torch" else None,
+    }
+    return tokenizer, model, info
+
+
+def load_draft_model(size="small", precision="fp32", device="cpu", token=None):
+    """Load a small model of the same family as the draft for speculative decoding
+
+    The draft has to share the main model's tokenizer, which every flan-t5 size
+    does. Load it onto the main model's device. Returns (model, info).
+    """
+    model_name = resolve_model_name(size)
+    rss_before = current_rss_mb()
+    started = time.perf_counter()
+    model, device = _load_torch_model(model_name, precision, device, token, _ignore_progress)
+    info = {
+        "model_name": model_name,
+        "device": device,
+        "load_seconds": time.perf_counter() - started,
+        "rss_delta_mb": current_rss_mb() - rss_before,
+        "parameter_mb": parameter_mb(model),
+    }
+    return model, info
+
+
+def describe_backend(info):
+    """One-line summary for the sidebar"""
+    name = info["model_name"].split("/")[-1]
+    parts = [name, info["precision"], info["runtime"]]
+    if info["compiled"]:
+        parts.append("compiled")
+    return " · ".join(parts) + f" on {info['device']}"
+
+
+class ModelLoader:
+    """Runs a backend load in a background thread and exposes its progress"""
+
+    def __init__(self, load):
+        # load(progress) -> result, exposed as .result once loading succeeds
+        self._load = load
+        self.progress = 0.0
+        self.stage = "Starting"
+        self.result = None
+        self.error = None
+        self.started_at = time.time()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="model-loader", daemon=True)
+        self._thread.start()
+
+    @property
+    def ready(self):
+        return self.result is not None
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until loading has finished or failed; returns False on timeout"""
+        return self._done.wait(timeout)
+
+    def _report(self, fraction, stage):
+        self.progress = fraction
+        self.stage = stage
+
+    def _run(self):
+        try:
+            result = self._load(self._report)
+            self._report(1.0, "Ready")
+            self.result = result
+        except Exception as e:
+            self.error = e
+            self.stage = "Failed"
+        finally:
+            self._done.set()
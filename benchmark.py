@@ -0,0 +1,360 @@
+"""Headless benchmarks for text generation and full interviews.
+
+Sweep the question, expected-answer and feedback prompts from the app across
+backends and generation settings:
+
+    python benchmark.py sweep --backend large:fp32 --backend base:int8 \
+        --max-len 100 150 --temperature 0.7 --batch-size 1 4 8
+
+With --draft small every setting also runs with speculative decoding, and the
+row reports the draft acceptance rate next to the plain run's numbers.
+
+Simulate N candidates running full interviews against the real app through
+Streamlit's AppTest (all sessions share one model, as in production):
+
+    python benchmark.py sessions --sessions 8 --questions 3
+
+Sessions run with a question bank in a scratch directory, no transcript store,
+telemetry export or result cache, and a different answer per candidate, so
+they time the model rather than earlier runs' banked or cached output.
+
+Both modes print p50/p95/p99 latency and memory: sweeps report each backend's
+RSS growth over the process before it was loaded (sampled after every batch),
+sessions the peak RSS of the process. --output writes the results
+as JSON and --baseline compares against an earlier run, exiting non-zero when
+throughput or tail latency regressed by more than --tolerance.
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from prompts import build_answer_prompt, build_feedback_prompt, build_question_prompt, question_focus_areas
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+PROMPT_KINDS = ("question", "expected_answer", "feedback")
+
+SAMPLE_TRACK = "Software Development"
+SAMPLE_DIFFICULTY = "Medium"
+SAMPLE_QUESTION = "How would you optimize a slow database query?"
+SAMPLE_ANSWER = (
+    "I would start by looking at the query plan to find full table scans, then add an index "
+    "on the columns used in the WHERE clause and joins. In a previous project this cut a report "
+    "query from twelve seconds to under one second. I would also check for N+1 queries in the ORM."
+)
+# Simulated candidates answer with a different mix of these, so no two answers are near-duplicates
+SAMPLE_ANSWER_SENTENCES = (
+    "I would start by reading the query plan to find full table scans.",
+    "An index on the columns in the WHERE clause and the joins usually helps most.",
+    "In a previous project this cut a report query from twelve seconds to under one second.",
+    "I would check the ORM for N+1 queries and batch them into one round trip.",
+    "Caching the result in Redis with a short TTL takes repeated reads off the database.",
+    "Sometimes the fix is denormalizing one column so a hot query avoids a join entirely.",
+    "I would confirm the gain on production-sized data before and after the change.",
+    "Partitioning a very large table by date keeps each scan small.",
+)
+
+
+# --- Measurement helpers ---
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def summarize(latencies):
+    """p50/p95/p99/mean in milliseconds"""
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None}
+    return {
+        "p50_ms": 1000.0 * percentile(latencies, 50),
+        "p95_ms": 1000.0 * percentile(latencies, 95),
+        "p99_ms": 1000.0 * percentile(latencies, 99),
+        "mean_ms": 1000.0 * sum(latencies) / len(latencies),
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def parse_backend(spec):
+    """'size[:precision[:runtime[:compile]]]', e.g. 'large:int8' or 'base:fp32:onnx'"""
+    parts = spec.split(":")
+    return {
+        "size": parts[0],
+        "precision": parts[1] if len(parts) > 1 else "fp32",
+        "runtime": parts[2] if len(parts) > 2 else "torch",
+        "compile": len(parts) > 3 and parts[3] == "compile",
+    }
+
+
+def build_prompts(kind, count):
+    """`count` prompts of one kind, built with the app's own templates"""
+    if kind == "question":
+        focus_areas = question_focus_areas(SAMPLE_TRACK, SAMPLE_DIFFICULTY, count)
+        return [build_question_prompt(SAMPLE_TRACK, SAMPLE_DIFFICULTY, [], focus) for focus in focus_areas]
+    if kind == "expected_answer":
+        return [build_answer_prompt(SAMPLE_TRACK, SAMPLE_QUESTION)] * count
+    return [build_feedback_prompt(SAMPLE_QUESTION, SAMPLE_ANSWER)] * count
+
+
+# --- Generation sweep ---
+def run_sweep(args):
+    from backends import current_rss_mb, describe_backend, load_backend, load_draft_model
+    from inference import InferenceScheduler
+
+    results = []
+    for spec in args.backend:
+        # The process peak would carry over from earlier backends; measure this one's growth instead
+        gc.collect()
+        rss_before = current_rss_mb()
+        tokenizer, model, info = load_backend(**parse_backend(spec))
+        rss_peak = current_rss_mb()
+        print(f"# {describe_backend(info)}: load {info['load_seconds']:.1f}s, "
+              f"warm-up {info['warmup_seconds']:.2f}s, +{info['rss_delta_mb']:.0f} MB RSS")
+        draft_model = None
+        if args.draft:
+            draft_model, draft_info = load_draft_model(args.draft, info["precision"], info["device"])
+            print(f"# draft {draft_info['model_name']}: load {draft_info['load_seconds']:.1f}s")
+        # No batching window: every batch below is submitted in one go
+        scheduler = InferenceScheduler(
+            tokenizer, model, max_batch_size=max(args.batch_size), max_wait_ms=0, draft_model=draft_model
+        )
+
+        for kind in args.kinds:
+            for speculative in ((False, True) if draft_model is not None else (False,)):
+                scheduler.set_speculative_kinds([kind] if speculative else [])
+                for max_len in args.max_len:
+                    for temperature in args.temperature:
+                        for batch_size in args.batch_size:
+                            before = scheduler.metrics()["speculative"]
+                            latencies = []
+                            generated_tokens = 0
+                            for iteration in range(args.warmup + args.iterations):
+                                prompts = build_prompts(kind, batch_size)
+                                started = time.perf_counter()
+                                texts = scheduler.generate_many(
+                                    prompts, max_len=max_len, temperature=temperature, kind=kind
+                                )
+                                elapsed = time.perf_counter() - started
+                                rss_peak = max(rss_peak, current_rss_mb())
+                                if iteration < args.warmup:
+                                    continue
+                                latencies.append(elapsed)
+                                generated_tokens += sum(len(ids) for ids in tokenizer(texts)["input_ids"])
+
+                            row = {
+                                "mode": "sweep",
+                                "backend": spec,
+                                "kind": kind,
+                                "max_len": max_len,
+                                "temperature": temperature,
+                                "batch_size": batch_size,
+                                "tokens_per_sec": generated_tokens / sum(latencies) if latencies else 0.0,
+                                "backend_rss_mb": rss_peak - rss_before,
+                            }
+                            if draft_model is not None:
+                                after = scheduler.metrics()["speculative"]
+                                draft_tokens = after["draft_tokens"] - before["draft_tokens"]
+                                row["speculative"] = speculative
+                                row["acceptance_rate"] = (
+                                    (after["accepted_tokens"] - before["accepted_tokens"]) / draft_tokens
+                                    if draft_tokens else None
+                                )
+                            row.update(summarize(latencies))
+                            results.append(row)
+                            print_row(row)
+        del scheduler, model, tokenizer, draft_model
+        gc.collect()
+    return results
+
+
+# --- Concurrent interview sessions ---
+def new_app(args):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    backend = parse_backend(args.session_backend)
+    at.secrets["model_size"] = backend["size"]
+    at.secrets["model_precision"] = backend["precision"]
+    at.secrets["model_runtime"] = backend["runtime"]
+    at.secrets["model_compile"] = backend["compile"]
+    # Measure inference, not the bank or cache of an earlier run, and leave the app's own files alone
+    at.secrets["question_bank_path"] = os.path.join(args.scratch_dir, "question_bank.json")
+    at.secrets["transcript_db_path"] = ""
+    at.secrets["telemetry_export_path"] = ""
+    at.secrets["result_cache_kinds"] = []
+    return at
+
+
+def sample_answer(session, index):
+    """A different answer for every session and question"""
+    rng = random.Random(session * 1000 + index)
+    return " ".join(rng.sample(SAMPLE_ANSWER_SENTENCES, 4))
+
+
+def wait_for_model(args):
+    """Poll the app until the background model load has finished"""
+    at = new_app(args)
+    deadline = time.monotonic() + args.load_timeout
+    while time.monotonic() < deadline:
+        at.run()
+        if any("Model loaded" in element.value for element in at.sidebar.success):
+            return True
+        if at.sidebar.error:
+            raise RuntimeError(at.sidebar.error[0].value)
+        time.sleep(2)
+    raise TimeoutError(f"Model did not finish loading within {args.load_timeout}s")
+
+
+def run_interview(args, session):
+    """One simulated candidate: start an interview and answer every question"""
+    at = new_app(args)
+    at.run()
+    at.sidebar.selectbox[0].set_value(args.track)
+    at.sidebar.number_input[0].set_value(args.questions)
+
+    started = time.perf_counter()
+    next(b for b in at.sidebar.button if b.label == "Start Interview").click().run()
+    start_latency = time.perf_counter() - started
+
+    answer_latencies = []
+    for index in range(args.questions):
+        at.text_area(key=f"answer_{index}").input(sample_answer(session, index))
+        submit = next(b for b in at.button if b.label == "Submit Answer")
+        started = time.perf_counter()
+        submit.click().run()
+        answer_latencies.append(time.perf_counter() - started)
+        if at.exception:
+            break
+
+    return {
+        "start_latency": start_latency,
+        "answer_latencies": answer_latencies,
+        "failed": bool(at.exception),
+    }
+
+
+def run_sessions(args):
+    with tempfile.TemporaryDirectory(prefix="interview-benchmark-") as scratch_dir:
+        args.scratch_dir = scratch_dir
+        wait_for_model(args)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            sessions = list(pool.map(lambda session: run_interview(args, session), range(args.sessions)))
+        elapsed = time.perf_counter() - started
+
+    start_latencies = [s["start_latency"] for s in sessions]
+    answer_latencies = [latency for s in sessions for latency in s["answer_latencies"]]
+    results = []
+    for kind, latencies in (("start_interview", start_latencies), ("submit_answer", answer_latencies)):
+        row = {
+            "mode": "sessions",
+            "backend": args.session_backend,
+            "kind": kind,
+            "sessions": args.sessions,
+            "questions": args.questions,
+            "interviews_per_min": 60.0 * args.sessions / elapsed,
+            "failed_sessions": sum(1 for s in sessions if s["failed"]),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+        row.update(summarize(latencies))
+        results.append(row)
+        print_row(row)
+    return results
+
+
+# --- Reporting ---
+METRIC_KEYS = (
+    "p50_ms", "p95_ms", "p99_ms", "mean_ms", "tokens_per_sec",
+    "interviews_per_min", "failed_sessions", "peak_rss_mb", "backend_rss_mb", "acceptance_rate",
+)
+
+
+def print_row(row):
+    config = {k: v for k, v in row.items() if k not in METRIC_KEYS}
+    metrics = " ".join(
+        f"{k}={row[k]:.1f}" for k in METRIC_KEYS if isinstance(row.get(k), (int, float))
+    )
+    print(" ".join(f"{k}={v}" for k, v in config.items()) + " | " + metrics, flush=True)
+
+
+def row_key(row):
+    return tuple(sorted((k, v) for k, v in row.items() if k not in METRIC_KEYS))
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Return a description of every metric that regressed beyond `tolerance`"""
+    previous = {row_key(row): row for row in baseline}
+    regressions = []
+    for row in results:
+        old = previous.get(row_key(row))
+        if old is None:
+            continue
+        for metric in ("tokens_per_sec", "interviews_per_min"):
+            if old.get(metric) and row.get(metric, 0) < old[metric] * (1 - tolerance):
+                regressions.append(f"{row['kind']}: {metric} {old[metric]:.1f} -> {row[metric]:.1f}")
+        if old.get("p95_ms") and row.get("p95_ms") and row["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{row['kind']}: p95_ms {old['p95_ms']:.0f} -> {row['p95_ms']:.0f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    modes = parser.add_subparsers(dest="mode", required=True)
+
+    sweep = modes.add_parser("sweep", help="sweep generation settings per backend")
+    sweep.add_argument("--backend", action="append", help="size[:precision[:runtime[:compile]]]")
+    sweep.add_argument("--kinds", nargs="+", choices=PROMPT_KINDS, default=list(PROMPT_KINDS))
+    sweep.add_argument("--max-len", nargs="+", type=int, default=[100, 150])
+    sweep.add_argument("--temperature", nargs="+", type=float, default=[0.7])
+    sweep.add_argument("--batch-size", nargs="+", type=int, default=[1, 4])
+    sweep.add_argument("--iterations", type=int, default=5)
+    sweep.add_argument("--warmup", type=int, default=1)
+    sweep.add_argument("--draft", help="also run each setting with speculative decoding from this draft size")
+
+    sessions = modes.add_parser("sessions", help="simulate concurrent candidates through AppTest")
+    sessions.add_argument("--sessions", type=int, default=4)
+    sessions.add_argument("--questions", type=int, default=3)
+    sessions.add_argument("--track", default=SAMPLE_TRACK)
+    sessions.add_argument("--session-backend", default="large:fp32")
+    sessions.add_argument("--timeout", type=float, default=600, help="seconds allowed per app rerun")
+    sessions.add_argument("--load-timeout", type=float, default=1800)
+
+    args = parser.parse_args(argv)
+    if args.mode == "sweep":
+        args.backend = args.backend or ["large:fp32"]
+        results = run_sweep(args)
+    else:
+        results = run_sessions(args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
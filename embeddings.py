@@ -0,0 +1,139 @@
+"""Sentence embeddings from the seq2seq encoder and a NumPy similarity index.
+
+Questions are embedded as the attention-masked mean of the T5 encoder's last
+hidden states, L2-normalized so a dot product is the cosine similarity. This
+reuses the model that is already loaded, and encoder passes are much cheaper
+than generation.
+
+``EmbeddingIndex`` keeps those vectors in one growable matrix for batched
+lookups. ``near_duplicate_mask`` and ``mmr_select`` turn a batch of candidate
+questions into a varied set that repeats nothing already asked.
+"""
+import threading
+
+import numpy as np
+import torch
+
+# Cosine similarity at or above which two questions count as the same question
+DEFAULT_DUPLICATE_THRESHOLD = 0.92
+
+
+def normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def encode_mean_pooled(tokenizer, model, texts, batch_size=32, max_length=512):
+    """Unit-length mean-pooled encoder states, one float32 row per text"""
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    encoder = model.get_encoder() if hasattr(model, "get_encoder") else model.encoder
+    device = model.device
+
+    # Sort by length so each batch pads as little as possible
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    pooled_batches = []
+    for start in range(0, len(order), batch_size):
+        batch = [texts[i] for i in order[start:start + batch_size]]
+        inputs = tokenizer(batch, return_tensors="pt", padding=True, truncation=True, max_length=max_length)
+        inputs = {k: v.to(device) for k, v in inputs.items()}
+        with torch.inference_mode():
+            hidden = encoder(input_ids=inputs["input_ids"], attention_mask=inputs["attention_mask"]).last_hidden_state
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+        pooled_batches.append(pooled.float().cpu().numpy())
+
+    vectors = np.empty((len(texts), pooled_batches[0].shape[1]), dtype=np.float32)
+    vectors[order] = np.concatenate(pooled_batches)
+    return normalize_rows(vectors)
+
+
+def near_duplicate_mask(vectors, threshold=DEFAULT_DUPLICATE_THRESHOLD, existing=None):
+    """True for rows too similar to a row of `existing` or to an earlier row of `vectors`"""
+    count = len(vectors)
+    if count == 0:
+        return np.zeros(0, dtype=bool)
+    similarity = vectors @ vectors.T
+    # Only compare each row with the rows before it, so the first of a pair survives
+    similarity[np.triu_indices(count)] = -1.0
+    duplicate = similarity.max(axis=1) >= threshold
+    if existing is not None and len(existing):
+        duplicate |= (vectors @ existing.T).max(axis=1) >= threshold
+    return duplicate
+
+
+def mmr_select(vectors, k, relevance=None, existing=None, diversity=0.5):
+    """Maximal marginal relevance: indices of `k` rows balancing relevance against redundancy
+
+    Each step picks the row maximising
+    (1 - diversity) * relevance - diversity * (max similarity to anything chosen or in `existing`).
+    """
+    count = len(vectors)
+    if count == 0 or k <= 0:
+        return []
+    relevance = np.ones(count, dtype=np.float32) if relevance is None else np.asarray(relevance, dtype=np.float32)
+    if existing is not None and len(existing):
+        redundancy = (vectors @ existing.T).max(axis=1)
+    else:
+        redundancy = np.zeros(count, dtype=np.float32)
+
+    chosen = []
+    available = np.ones(count, dtype=bool)
+    for _ in range(min(k, count)):
+        scores = (1.0 - diversity) * relevance - diversity * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        chosen.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+    return chosen
+
+
+class EmbeddingIndex:
+    """Thread-safe, growable matrix of unit vectors with batched cosine lookups"""
+
+    def __init__(self, capacity=64):
+        self._lock = threading.Lock()
+        self._capacity = max(1, int(capacity))
+        self._matrix = None
+        self._size = 0
+        self.keys = []
+
+    def __len__(self):
+        return self._size
+
+    def add(self, keys, vectors):
+        """Append one row per key; the matrix doubles in place as it fills"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(vectors):
+            return
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.empty((max(self._capacity, len(vectors)), vectors.shape[1]), dtype=np.float32)
+            needed = self._size + len(vectors)
+            if needed > len(self._matrix):
+                grown = np.empty((max(needed, 2 * len(self._matrix)), self._matrix.shape[1]), dtype=np.float32)
+                grown[:self._size] = self._matrix[:self._size]
+                self._matrix = grown
+            self._matrix[self._size:needed] = vectors
+            self._size = needed
+            self.keys.extend(keys)
+
+    def vectors(self):
+        """Copy of the stored rows, safe to use while other threads add"""
+        with self._lock:
+            if self._matrix is None:
+                return np.zeros((0, 0), dtype=np.float32)
+            return self._matrix[:self._size].copy()
+
+    def max_similarity(self, queries):
+        """Highest cosine similarity of each query to the index; -1 when the index is empty"""
+        queries = np.asarray(queries, dtype=np.float32)
+        with self._lock:
+            if not self._size:
+                return np.full(len(queries), -1.0, dtype=np.float32)
+            return (queries @ self._matrix[:self._size].T).max(axis=1)
+
+    def contains_near(self, queries, threshold=DEFAULT_DUPLICATE_THRESHOLD):
+        """Boolean mask of queries that have a near-duplicate in the index"""
+        return self.max_similarity(queries) >= threshold
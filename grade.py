@@ -0,0 +1,212 @@
+"""Offline bulk grading of archived question/answer pairs.
+
+Streams a JSONL file of records through the interview's coach feedback prompt
+and answer scoring, and writes one JSONL result per record:
+
+    python grade.py transcripts.jsonl graded.jsonl --backend large:fp32 --batch-size 8
+
+Input records need "question" and "answer"; "id", "track" and "expected_answer"
+are optional. When the expected answer is missing it is generated with the
+app's expected-answer prompt, so every record can be scored.
+
+Records are read in windows of --window. Each window is sorted by prompt
+length, so the scheduler's length buckets fill up, and is written out before
+the next one is read. Memory stays bounded and an interrupted run can be
+resumed: records already in the output (by "id", or by input line number) are
+skipped. Use --socket to grade through a running model_server.py instead of
+loading a model here.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+from benchmark import parse_backend, peak_rss_mb
+from prompts import build_answer_prompt, build_feedback_prompt, is_usable_feedback, strip_prompt_echo
+from scoring import score_answers
+
+DEFAULT_TRACK = "Software Development"
+
+
+def record_key(record, line):
+    return str(record["id"]) if "id" in record else f"line:{line}"
+
+
+def read_done(output_path):
+    """Keys of records already graded by an earlier, possibly interrupted, run"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    complete = 0
+    with open(output_path, "rb") as f:
+        for text in f:
+            try:
+                if not text.endswith(b"\n"):
+                    raise ValueError("unterminated line")
+                result = json.loads(text)
+            except ValueError:
+                # A partial last line from a killed run; that record is graded again
+                break
+            # Lines this tool did not write (no string "key") mark nothing as done
+            key = result.get("key") if isinstance(result, dict) else None
+            if isinstance(key, str):
+                done.add(key)
+            complete += len(text)
+    # Cut the partial line off so appended results start on a fresh line
+    if complete < os.path.getsize(output_path):
+        with open(output_path, "r+b") as f:
+            f.truncate(complete)
+    return done
+
+
+def read_records(input_path, done, errors):
+    """Yield (line, record) for every ungraded, well-formed input record"""
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line, text in enumerate(f, start=1):
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError as e:
+                errors.append({"line": line, "error": f"invalid JSON: {e}"})
+                continue
+            if not isinstance(record, dict):
+                errors.append({"line": line, "error": "not a JSON object"})
+                continue
+            # null or a number would reach the prompts as "None" or "42", or break the text handling
+            bad = [field for field in ("question", "answer")
+                   if not isinstance(record.get(field), str) or not record[field].strip()]
+            if bad:
+                errors.append({"line": line, "error": f"needs non-empty string {' and '.join(map(repr, bad))}"})
+                continue
+            # Optional, but scoring and the answer prompt need text when they are given
+            bad = [field for field in ("expected_answer", "track")
+                   if record.get(field) is not None and not isinstance(record[field], str)]
+            if bad:
+                errors.append({"line": line, "error": f"{' and '.join(map(repr, bad))} must be a string"})
+                continue
+            if record_key(record, line) not in done:
+                yield line, record
+
+
+def grade_window(scheduler, window, args):
+    """Feedback, expected answers and scores for one window of records"""
+    # Similar lengths next to each other, so batches carry little padding
+    window = sorted(window, key=lambda item: len(item[1]["question"]) + len(item[1]["answer"]))
+    records = [record for _, record in window]
+
+    feedback_prompts = [build_feedback_prompt(r["question"], r["answer"]) for r in records]
+    feedback_futures = scheduler.submit_many(
+        feedback_prompts, max_len=args.max_len, temperature=args.temperature, kind="feedback"
+    )
+
+    missing = [i for i, r in enumerate(records) if not r.get("expected_answer")]
+    answer_prompts = [build_answer_prompt(records[i].get("track", args.track), records[i]["question"])
+                      for i in missing]
+    answer_futures = scheduler.submit_many(
+        answer_prompts, max_len=args.max_len, temperature=args.temperature, kind="expected_answer"
+    )
+
+    expected_answers = [r.get("expected_answer", "") for r in records]
+    for i, prompt, future in zip(missing, answer_prompts, answer_futures):
+        expected_answers[i] = strip_prompt_echo(prompt, future.result())
+
+    scores = score_answers(scheduler.embed, [r["answer"] for r in records], expected_answers)
+
+    results = []
+    for (line, record), prompt, future, expected_answer, score in zip(
+        window, feedback_prompts, feedback_futures, expected_answers, scores
+    ):
+        feedback = strip_prompt_echo(prompt, future.result())
+        result = dict(record)
+        result.update({
+            "key": record_key(record, line),
+            "line": line,
+            "feedback": feedback,
+            "feedback_usable": is_usable_feedback(feedback),
+            "expected_answer": expected_answer,
+            "expected_answer_generated": not record.get("expected_answer"),
+            "score": score,
+        })
+        results.append(result)
+    return results
+
+
+def create_scheduler(args):
+    if args.socket:
+        from model_client import RemoteScheduler, wait_for_model_server
+
+        _, _, info = wait_for_model_server(args.socket)
+        print(f"# model server: {info['model_name']} ({info['runtime']})", file=sys.stderr)
+        return RemoteScheduler(args.socket)
+
+    from backends import describe_backend, load_backend
+    from inference import InferenceScheduler
+
+    tokenizer, model, info = load_backend(**parse_backend(args.backend))
+    print(f"# {describe_backend(info)}: load {info['load_seconds']:.1f}s", file=sys.stderr)
+    # Everything in a window is submitted at once, so no batching window is needed
+    return InferenceScheduler(tokenizer, model, max_batch_size=args.batch_size, max_wait_ms=0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file of question/answer records")
+    parser.add_argument("output", help="JSONL results; appended to, so a rerun resumes")
+    parser.add_argument("--backend", default="large:fp32", help="size[:precision[:runtime[:compile]]]")
+    parser.add_argument("--socket", help="grade through model_server.py at this socket instead")
+    parser.add_argument("--batch-size", type=int, default=8, help="largest generate batch")
+    parser.add_argument("--window", type=int, default=256, help="records held in memory at once")
+    parser.add_argument("--max-len", type=int, default=150)
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--track", default=DEFAULT_TRACK, help="track for records that do not name one")
+    parser.add_argument("--limit", type=int, help="stop after this many records")
+    args = parser.parse_args(argv)
+
+    done = read_done(args.output)
+    if done:
+        print(f"# resuming: {len(done)} records already graded", file=sys.stderr)
+    errors = []
+    records = read_records(args.input, done, errors)
+    if args.limit is not None:
+        records = itertools.islice(records, args.limit)
+
+    scheduler = create_scheduler(args)
+    graded = 0
+    started = time.perf_counter()
+    with open(args.output, "a", encoding="utf-8") as out:
+        while True:
+            window = list(itertools.islice(records, args.window))
+            if not window:
+                break
+            for result in grade_window(scheduler, window, args):
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            # A window only counts as done once it is on disk
+            out.flush()
+            os.fsync(out.fileno())
+            graded += len(window)
+            elapsed = time.perf_counter() - started
+            print(f"graded={graded} records_per_sec={graded / elapsed:.2f} "
+                  f"peak_rss_mb={peak_rss_mb():.0f}", file=sys.stderr, flush=True)
+
+    elapsed = time.perf_counter() - started
+    metrics = scheduler.metrics()
+    print(json.dumps({
+        "graded": graded,
+        "skipped_already_graded": len(done),
+        "invalid_records": len(errors),
+        "seconds": elapsed,
+        "records_per_sec": graded / elapsed if elapsed else 0.0,
+        "batches": metrics["batches"],
+        "avg_batch_size": metrics["avg_batch_size"],
+        "peak_rss_mb": peak_rss_mb(),
+    }, indent=2))
+    for error in errors[:10]:
+        print(f"invalid record at line {error['line']}: {error['error']}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,795 @@
+"""Shared, cross-session inference scheduling for the interview simulator.
+
+Streamlit runs every session in its own script thread, but all of them share
+the single model returned by ``load_model_components``. Instead of letting each
+session call ``model.generate`` on its own (which serializes at batch size 1),
+sessions submit prompts to one ``InferenceScheduler``. The scheduler waits a
+few milliseconds for other sessions to join, groups the pending prompts by
+generation parameters and input length, and runs each group as one padded batch.
+
+Each prompt kind also has an early-stopping profile (``KIND_PROFILES``). A
+question stops at the token that ends its question sentence, and feedback
+stops at the first sentence boundary after a token budget. Partial output is
+checked every few tokens, and rows the app would reject anyway are stopped
+there and resampled once, so a bad decode is not run to ``max_length``.
+
+With a draft model, the prompt kinds in `speculative_kinds` use assisted
+generation: the small flan-t5 proposes a few tokens and the large model
+verifies them in one forward pass. Sampling keeps the large model's output
+distribution, since transformers' speculative sampling accepts draft tokens by
+the ratio of the two models' probabilities. Assisted generation runs one
+sequence at a time, so those kinds trade batching for fewer large-model
+passes. ``metrics()["speculative"]`` reports the acceptance rate, to see
+whether that pays off on a given machine.
+
+Background work (question bank top-ups) is submitted with ``background=True``.
+It waits in its own lane that only runs while no interactive request is
+pending, a batch at a time, and it is left out of ``queue_depth()`` and the
+circuit breaker's latencies, so it cannot push live sessions into fallbacks.
+
+Kinds covered by an optional ``result_cache.ResultCache`` decode greedily and
+are answered from the cache when the same (or, for feedback, a near-duplicate)
+prompt was generated before. A greedy row rejected by validation is resampled
+like any other, and rejected texts are never cached.
+"""
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import torch
+import transformers
+from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+from embeddings import encode_mean_pooled
+from prompt_encoding import PromptEncoder
+from result_cache import cache_params, lookup, submit_through_cache
+from prompts import is_rejected_partial
+
+# Sampling parameters shared by every generation in the app
+DEFAULT_GENERATE_KWARGS = {
+    "min_length": 20,
+    "do_sample": True,
+    "top_p": 0.9,
+    "no_repeat_ngram_size": 2,
+}
+
+# Per prompt kind:
+#   generate        overrides of DEFAULT_GENERATE_KWARGS
+#   stop_chars      a row stops at the first token ending in one of these...
+#   stop_after      ...once it has generated at least this many tokens
+#   validate_every  partial output is checked with prompts.is_rejected_partial this often (tokens)
+#   trim_at         text after the first occurrence is dropped
+KIND_PROFILES = {
+    "question": {"generate": {"min_length": 8}, "stop_chars": "?", "stop_after": 5,
+                 "validate_every": 6, "trim_at": "?"},
+    "expected_answer": {"stop_chars": ".!?", "stop_after": 80},
+    "feedback": {"stop_chars": ".!?", "stop_after": 60, "validate_every": 8},
+}
+
+# Rows stopped by validation are decoded again this much hotter, once
+RESAMPLE_TEMPERATURE_STEP = 0.2
+# Greedy rows (the result-cached kinds) are resampled at this temperature instead
+GREEDY_RESAMPLE_TEMPERATURE = 0.9
+
+# Older generate() can only stop the whole batch; rows that finish early then keep going
+TRANSFORMERS_VERSION = tuple(int(part) for part in transformers.__version__.split(".")[:2])
+PER_ROW_STOPPING = TRANSFORMERS_VERSION >= (4, 39)
+# Assisted generation with sampling (speculative sampling) arrived in transformers 4.39
+SPECULATIVE_SUPPORTED = TRANSFORMERS_VERSION >= (4, 39)
+
+MAX_INPUT_TOKENS = 512
+
+# Seconds a streaming consumer waits for the next token before giving up
+STREAM_TIMEOUT = 60.0
+
+
+class CircuitBreaker:
+    """Sheds load to fallback content while the inference queue is saturated
+
+    closed    -> normal operation
+    open      -> queue too deep or recent latency too high; callers should use fallbacks
+    half_open -> after `cooldown` seconds a single probe is let through; the breaker closes
+                 if the next latency is below `recovery_latency_ms` and opens again otherwise
+    """
+
+    def __init__(self, max_queue_depth=16, max_latency_ms=20000, recovery_latency_ms=8000,
+                 cooldown=30.0, window=20):
+        self.max_queue_depth = max_queue_depth
+        self.max_latency_ms = max_latency_ms
+        self.recovery_latency_ms = recovery_latency_ms
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.opened_at = None
+        # When the half-open probe was let through, None while none is out
+        self.probe_at = None
+        self.trips = 0
+        self._latencies = deque(maxlen=max(1, int(window)))
+        self._lock = threading.Lock()
+
+    def recent_latency_ms(self):
+        """Median of the most recent request latencies"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        return latencies[len(latencies) // 2] if latencies else 0.0
+
+    def record_latency(self, latency_ms):
+        with self._lock:
+            self._latencies.append(latency_ms)
+        recent = self.recent_latency_ms()
+        with self._lock:
+            if self.state == "half_open":
+                # The first fresh sample decides; lingering in half-open would admit nobody
+                if recent <= self.recovery_latency_ms:
+                    self.state = "closed"
+                    self.probe_at = None
+                else:
+                    self._trip()
+
+    def allow(self, queue_depth):
+        """Whether a new session may use the model right now"""
+        recent = self.recent_latency_ms()
+        with self._lock:
+            if self.state == "closed":
+                if queue_depth >= self.max_queue_depth or recent > self.max_latency_ms:
+                    self._trip()
+                    return False
+                return True
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    return False
+                self.state = "half_open"
+                self.probe_at = None
+                # Judge recovery on fresh samples only
+                self._latencies.clear()
+            if queue_depth >= self.max_queue_depth:
+                return False
+            # One probe at a time; another only if the last never reported a latency
+            if self.probe_at is not None and time.monotonic() - self.probe_at < self.cooldown:
+                return False
+            self.probe_at = time.monotonic()
+            return True
+
+    def is_closed(self):
+        return self.state == "closed"
+
+    def _trip(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.probe_at = None
+        self.trips += 1
+
+
+class _CancelCriteria(StoppingCriteria):
+    """Stops a streaming generate once its consumer has given up"""
+
+    def __init__(self, cancelled):
+        self.cancelled = cancelled
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.cancelled.is_set()
+
+
+class _ForwardCounter:
+    """Counts a module's forward calls made by the current thread while armed"""
+
+    def __init__(self, module):
+        self._local = threading.local()
+        module.register_forward_hook(self._hook)
+
+    def _hook(self, module, args, output):
+        if getattr(self._local, "count", None) is not None:
+            self._local.count += 1
+
+    def start(self):
+        self._local.count = 0
+
+    def stop(self):
+        count, self._local.count = self._local.count, None
+        return count
+
+
+class _AdaptiveStopCriteria(StoppingCriteria):
+    """Per-row early stopping for one generate call, following a KIND_PROFILES entry
+
+    Rows stop at a sentence-ending token once past the profile's budget, and
+    are stopped and flagged in `rejected` when their partial text fails
+    validation.
+    """
+
+    def __init__(self, tokenizer, kind, profile, terminal_ids, batch_size, device):
+        self.tokenizer = tokenizer
+        self.kind = kind
+        self.terminal_ids = terminal_ids
+        self.stop_after = profile.get("stop_after", 0)
+        self.validate_every = profile.get("validate_every")
+        self.done = torch.zeros(batch_size, dtype=torch.bool, device=device)
+        self.rejected = torch.zeros(batch_size, dtype=torch.bool, device=device)
+        # Sequence length at the previous call; the decoder sequence starts with the decoder start token
+        self.seen = 1
+
+    def __call__(self, input_ids, scores, **kwargs):
+        # Assisted generation can accept several tokens per call, so look at all of them
+        length = input_ids.shape[-1]
+        previous, generated = self.seen - 1, length - 1
+        self.seen = length
+        # The token at position p is the p-th generated one
+        first = max(previous + 1, self.stop_after)
+        if self.terminal_ids is not None and first < length:
+            self.done |= torch.isin(input_ids[:, first:], self.terminal_ids).any(dim=-1)
+        if self.validate_every and generated // self.validate_every > previous // self.validate_every:
+            live = (~self.done).nonzero().flatten().tolist()
+            texts = self.tokenizer.batch_decode(input_ids[live], skip_special_tokens=True) if live else []
+            for row, text in zip(live, texts):
+                if is_rejected_partial(self.kind, text):
+                    self.rejected[row] = True
+            self.done |= self.rejected
+        return self.done.clone() if PER_ROW_STOPPING else bool(self.done.all())
+
+
+class GenerationRequest:
+    """A single prompt waiting for a batch slot"""
+
+    __slots__ = ("prompt", "params", "kind", "background", "future", "enqueued_at", "tokenize_ms")
+
+    def __init__(self, prompt, params, kind=None, background=False):
+        self.prompt = prompt
+        self.params = params
+        self.kind = kind
+        self.background = background
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+        self.tokenize_ms = 0.0
+
+    @property
+    def key(self):
+        """Requests can only share a batch if their generation parameters and stopping profile match"""
+        return tuple(sorted(self.params.items())), self.kind, self.background
+
+
+class InferenceScheduler:
+    """Micro-batching scheduler in front of a single seq2seq model"""
+
+    def __init__(self, tokenizer, model, max_batch_size=8, max_wait_ms=15, length_bucket=64,
+                 telemetry=None, breaker=None, draft_model=None, speculative_kinds=(), result_cache=None,
+                 max_concurrent_streams=4):
+        self.tokenizer = tokenizer
+        self.model = model
+        # Streams run outside the batches, each with its own generate thread; cap how many share the model
+        self._stream_slots = threading.BoundedSemaphore(max(1, int(max_concurrent_streams)))
+        # Optional ResultCache shared across sessions; its kinds decode deterministically
+        self.result_cache = result_cache
+        # Optional small model of the same family that drafts tokens for `speculative_kinds`
+        self.draft_model = draft_model if SPECULATIVE_SUPPORTED else None
+        self.speculative_kinds = frozenset(speculative_kinds) if self.draft_model is not None else frozenset()
+        if self.draft_model is not None:
+            # Each target forward verifies a draft run; each draft forward proposes one token
+            self._target_forwards = _ForwardCounter(model)
+            self._draft_forwards = _ForwardCounter(draft_model)
+        # Optional InferenceTelemetry that receives one record per request
+        self.telemetry = telemetry
+        # Optional CircuitBreaker fed with every request's end-to-end latency
+        self.breaker = breaker
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.length_bucket = max(1, int(length_bucket))
+        # Reuses pre-tokenized template instructions and recent encodings
+        self.encoder = PromptEncoder(tokenizer, MAX_INPUT_TOKENS)
+        # stop_chars -> ids of vocabulary tokens ending in one of them
+        self._terminal_ids = {}
+
+        self._pending = deque()
+        # Background requests; taken only while nothing interactive is pending
+        self._background = deque()
+        self._cond = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "max_queue_depth": 0,
+            "total_wait": 0.0,
+            "total_batch_time": 0.0,
+            "batch_sizes": Counter(),
+            "speculative_sequences": 0,
+            "draft_tokens": 0,
+            "accepted_tokens": 0,
+            "target_forwards": 0,
+        }
+
+        self._worker = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._worker.start()
+
+    # --- Public API ---
+    def submit(self, prompt, max_len=150, temperature=0.7, kind=None, background=False, **generate_kwargs):
+        """Queue a prompt and return a Future resolving to the decoded text
+
+        `kind` labels the prompt (question, expected_answer, feedback) for telemetry.
+        `background` requests wait until no interactive request is pending.
+        """
+        return self.submit_many([prompt], max_len, temperature, kind, background, **generate_kwargs)[0]
+
+    def submit_many(self, prompts, max_len=150, temperature=0.7, kind=None, background=False, **generate_kwargs):
+        """Queue several prompts at once so they land in the same batch
+
+        Once batched, each future's `prompt_tokens` holds the encoded prompt length.
+        """
+        if self.result_cache is not None and self.result_cache.caches(kind):
+            # Greedy, so a prompt always yields the text cached for it
+            generate_kwargs = dict(generate_kwargs, do_sample=False)
+            return submit_through_cache(
+                self.result_cache, kind, prompts, cache_params(max_len, generate_kwargs),
+                lambda misses: self._enqueue(misses, max_len, temperature, kind, generate_kwargs, background),
+                self.telemetry,
+            )
+        return self._enqueue(prompts, max_len, temperature, kind, generate_kwargs, background)
+
+    def _enqueue(self, prompts, max_len, temperature, kind, generate_kwargs, background=False):
+        params = self._generate_params(max_len, temperature, kind, generate_kwargs)
+        requests = [GenerationRequest(prompt, params, kind, background) for prompt in prompts]
+
+        with self._cond:
+            (self._background if background else self._pending).extend(requests)
+            depth = len(self._pending)
+            self._cond.notify()
+        if not background:
+            with self._stats_lock:
+                self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], depth)
+        return [request.future for request in requests]
+
+    def generate(self, prompt, max_len=150, temperature=0.7, timeout=None, kind=None, **generate_kwargs):
+        """Blocking helper: submit a prompt and wait for its text"""
+        return self.submit(prompt, max_len, temperature, kind, **generate_kwargs).result(timeout)
+
+    def generate_many(self, prompts, max_len=150, temperature=0.7, timeout=None, kind=None, **generate_kwargs):
+        """Blocking helper: run several prompts as one batch and return their texts in order"""
+        futures = self.submit_many(prompts, max_len, temperature, kind, **generate_kwargs)
+        return [future.result(timeout) for future in futures]
+
+    def stream(self, prompt, max_len=150, temperature=0.7, kind=None, first_token_timeout=None, **generate_kwargs):
+        """Yield decoded text chunks as they are produced
+
+        Streaming needs its own generate call at batch size 1, so it bypasses the
+        batching queue and runs next to it on the same model, at most
+        `max_concurrent_streams` at a time. If no text arrives within
+        `first_token_timeout` seconds, counting the wait for a stream slot, the
+        generation is stopped and TimeoutError is raised. The kind's early
+        stopping applies, but a row that fails validation is only cut short; it
+        is not resampled. The generator returns whether validation rejected the
+        text, so callers that cache streamed texts can skip it.
+        """
+        cached = self.result_cache is not None and self.result_cache.caches(kind)
+        if cached:
+            generate_kwargs = dict(generate_kwargs, do_sample=False)
+            key_params = cache_params(max_len, generate_kwargs)
+            text = lookup(self.result_cache, kind, prompt, key_params, self.telemetry)
+            if text is not None:
+                yield text
+                return False
+        params = self._generate_params(max_len, temperature, kind, generate_kwargs)
+        speculative = kind in self.speculative_kinds
+        if speculative:
+            params["assistant_model"] = self.draft_model
+
+        started = time.monotonic()
+        first_token_timeout = first_token_timeout or STREAM_TIMEOUT
+        if not self._stream_slots.acquire(timeout=first_token_timeout):
+            if self.breaker is not None:
+                self.breaker.record_latency(1000.0 * (time.monotonic() - started))
+            raise TimeoutError("No stream slot free within the streaming deadline")
+        admitted = time.monotonic()
+        try:
+            input_ids = torch.tensor([self.encoder.encode(prompt)])
+        except Exception:
+            self._stream_slots.release()
+            raise
+        device = self.model.device
+        inputs = {"input_ids": input_ids.to(device), "attention_mask": torch.ones_like(input_ids).to(device)}
+        tokenized = time.monotonic()
+        streamer = TextIteratorStreamer(
+            self.tokenizer, skip_prompt=True, skip_special_tokens=True,
+            timeout=max(0.001, first_token_timeout - (tokenized - started))
+        )
+        cancelled = threading.Event()
+        criteria = [_CancelCriteria(cancelled)]
+        adaptive = self._adaptive_criteria(kind, 1, device)
+        if adaptive is not None:
+            criteria.append(adaptive)
+        errors = []
+        acceptance = []
+
+        def run():
+            try:
+                if speculative:
+                    self._target_forwards.start()
+                    self._draft_forwards.start()
+                with torch.inference_mode():
+                    outputs = self.model.generate(
+                        **inputs,
+                        **params,
+                        streamer=streamer,
+                        stopping_criteria=StoppingCriteriaList(criteria),
+                        pad_token_id=self.tokenizer.eos_token_id,
+                    )
+                if speculative:
+                    acceptance.append(self._record_speculation(outputs[0].tolist()))
+            except Exception as e:
+                errors.append(e)
+                # generate() only ends the stream on success; unblock the consumer
+                streamer.end()
+            finally:
+                # Released here, not by the consumer, which may stop iterating at any point
+                self._stream_slots.release()
+
+        thread = threading.Thread(target=run, name="inference-stream", daemon=True)
+        thread.start()
+        chunks = []
+        first_token_ms = None
+        try:
+            for chunk in streamer:
+                if chunk:
+                    if first_token_ms is None:
+                        first_token_ms = 1000.0 * (time.monotonic() - started)
+                        streamer.timeout = STREAM_TIMEOUT
+                    chunks.append(chunk)
+                    yield chunk
+        except queue.Empty:
+            cancelled.set()
+            if self.breaker is not None:
+                # A stalled stream is a latency sample too, or a hung model would never trip the breaker
+                self.breaker.record_latency(1000.0 * (time.monotonic() - started))
+            raise TimeoutError("No tokens within the streaming deadline")
+        finally:
+            # Also covers a consumer that stops iterating early
+            cancelled.set()
+        thread.join()
+        if errors:
+            raise errors[0]
+        rejected = bool(adaptive is not None and adaptive.rejected.any())
+        if cached and not rejected:
+            self.result_cache.put(kind, prompt, key_params, "".join(chunks))
+
+        finished = time.monotonic()
+        if self.breaker is not None:
+            self.breaker.record_latency(1000.0 * (finished - started))
+        if self.telemetry is not None:
+            # Decoding happens inside the streamer, so it is part of generate time here
+            self.telemetry.record(
+                kind,
+                prompt_tokens=int(inputs["input_ids"].shape[-1]),
+                generated_tokens=len(self.tokenizer("".join(chunks))["input_ids"]),
+                queue_ms=1000.0 * (admitted - started),
+                tokenize_ms=1000.0 * (tokenized - admitted),
+                generate_ms=1000.0 * (finished - tokenized),
+                decode_ms=0.0,
+                total_ms=1000.0 * (finished - started),
+                first_token_ms=first_token_ms,
+                batch_size=1,
+                streamed=True,
+                rejected=rejected,
+                speculative=speculative,
+                acceptance_rate=acceptance[0] if acceptance else None,
+            )
+        return rejected
+
+    def embed(self, texts, batch_size=32):
+        """Mean-pooled encoder embeddings for `texts`, one unit-length row each
+
+        Encoder-only passes are short, so they run in the caller's thread next
+        to the batching worker instead of queueing behind generations.
+        """
+        return encode_mean_pooled(self.tokenizer, self.model, list(texts), batch_size, MAX_INPUT_TOKENS)
+
+    def queue_depth(self):
+        """Interactive requests waiting for a batch; background ones are not counted"""
+        with self._cond:
+            return len(self._pending)
+
+    def set_speculative_kinds(self, kinds):
+        """Choose at runtime which prompt kinds use the draft model"""
+        if self.draft_model is not None:
+            self.speculative_kinds = frozenset(kinds)
+
+    def metrics(self):
+        """Snapshot of queue and batching metrics"""
+        with self._cond:
+            depth = len(self._pending)
+            background_depth = len(self._background)
+        with self._stats_lock:
+            stats = dict(self._stats)
+            batch_sizes = dict(stats.pop("batch_sizes"))
+        requests = stats["requests"]
+        batches = stats["batches"]
+        return {
+            "queue_depth": depth,
+            "background_queue_depth": background_depth,
+            "max_queue_depth": stats["max_queue_depth"],
+            "requests": requests,
+            "batches": batches,
+            "avg_batch_size": requests / batches if batches else 0.0,
+            "avg_wait_ms": 1000.0 * stats["total_wait"] / requests if requests else 0.0,
+            "avg_batch_ms": 1000.0 * stats["total_batch_time"] / batches if batches else 0.0,
+            "batch_sizes": batch_sizes,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "prompt_cache": self.encoder.stats(),
+            "speculative": self._speculative_metrics(stats),
+        }
+
+    def _speculative_metrics(self, stats):
+        if self.draft_model is None:
+            return None
+        return {
+            "kinds": sorted(self.speculative_kinds),
+            "sequences": stats["speculative_sequences"],
+            "draft_tokens": stats["draft_tokens"],
+            "accepted_tokens": stats["accepted_tokens"],
+            "acceptance_rate": stats["accepted_tokens"] / stats["draft_tokens"] if stats["draft_tokens"] else 0.0,
+            # Above 1.0 the large model produced more than one token per pass
+            "tokens_per_target_forward": (
+                (stats["accepted_tokens"] + stats["target_forwards"]) / stats["target_forwards"]
+                if stats["target_forwards"] else 0.0
+            ),
+        }
+
+    def _record_speculation(self, output_ids):
+        """Account one assisted sequence; returns its draft acceptance rate
+
+        Each verification pass keeps the accepted draft tokens plus one token of
+        the large model's own, so accepted = generated - passes.
+        """
+        target_forwards = self._target_forwards.stop()
+        draft_tokens = self._draft_forwards.stop()
+        special_ids = {self.tokenizer.pad_token_id, self.tokenizer.eos_token_id}
+        generated = sum(1 for token in output_ids if token not in special_ids)
+        accepted = min(draft_tokens, max(0, generated - target_forwards))
+        with self._stats_lock:
+            self._stats["speculative_sequences"] += 1
+            self._stats["draft_tokens"] += draft_tokens
+            self._stats["accepted_tokens"] += accepted
+            self._stats["target_forwards"] += target_forwards
+        return accepted / draft_tokens if draft_tokens else None
+
+    # --- Early stopping ---
+    def _generate_params(self, max_len, temperature, kind, generate_kwargs):
+        params = dict(DEFAULT_GENERATE_KWARGS)
+        params.update(KIND_PROFILES.get(kind, {}).get("generate", {}))
+        params.update(generate_kwargs)
+        params["max_length"] = max_len
+        if params.get("do_sample"):
+            params["temperature"] = temperature
+        else:
+            # Greedy decoding; sampling settings would only trigger warnings
+            params.pop("top_p", None)
+        return params
+
+    def _terminal_token_ids(self, stop_chars, device):
+        ids = self._terminal_ids.get(stop_chars)
+        if ids is None:
+            tokens = self.tokenizer.convert_ids_to_tokens(list(range(len(self.tokenizer))))
+            ids = torch.tensor(
+                # A whitespace-only token strips to "", and "" is `in` every string
+                [
+                    i for i, token in enumerate(tokens)
+                    if token and (stripped := token.rstrip()) and stripped[-1] in stop_chars
+                ],
+                dtype=torch.long,
+            )
+            self._terminal_ids[stop_chars] = ids
+        return ids.to(device)
+
+    def _adaptive_criteria(self, kind, batch_size, device):
+        """A fresh _AdaptiveStopCriteria for `kind`, or None when it has no profile"""
+        profile = KIND_PROFILES.get(kind)
+        if profile is None:
+            return None
+        stop_chars = profile.get("stop_chars")
+        terminal_ids = self._terminal_token_ids(stop_chars, device) if stop_chars else None
+        return _AdaptiveStopCriteria(self.tokenizer, kind, profile, terminal_ids, batch_size, device)
+
+    def _generate(self, inputs, params, kind):
+        """generate() with the kind's early stopping; rows rejected mid-decode are resampled once
+
+        Returns (output ids per row, rejected flags, resampled flags, draft
+        acceptance rate per row or None). Rows still rejected after the
+        resample decode to "" so callers fall back.
+        """
+        size = inputs["input_ids"].shape[0]
+        output_ids = [None] * size
+        rejected = [False] * size
+        resampled = [False] * size
+        acceptance_rates = [None] * size
+        rows = list(range(size))
+        attempt_params = params
+        attempts = 2 if kind in KIND_PROFILES else 1
+        for attempt in range(attempts):
+            batch = {k: v[rows] for k, v in inputs.items()} if attempt else inputs
+            if kind in self.speculative_kinds:
+                outputs, flags, acceptance = self._generate_assisted(batch, attempt_params, kind)
+            else:
+                outputs, flags = self._generate_batch(batch, attempt_params, kind)
+                acceptance = [None] * len(rows)
+            for row, ids, flag, rate in zip(rows, outputs, flags, acceptance):
+                output_ids[row] = ids
+                rejected[row] = flag
+                resampled[row] = bool(attempt)
+                acceptance_rates[row] = rate
+            rows = [row for row, flag in zip(rows, flags) if flag]
+            if not rows:
+                break
+            attempt_params = self._resample_params(params)
+        return output_ids, rejected, resampled, acceptance_rates
+
+    def _resample_params(self, params):
+        """Parameters for the second attempt at rows rejected by validation"""
+        if params.get("do_sample"):
+            return dict(params, temperature=params["temperature"] + RESAMPLE_TEMPERATURE_STEP)
+        # Decoding greedily again would only repeat the rejected text
+        return dict(
+            params, do_sample=True, top_p=DEFAULT_GENERATE_KWARGS["top_p"], temperature=GREEDY_RESAMPLE_TEMPERATURE
+        )
+
+    def _generate_batch(self, batch, params, kind, **extra):
+        """One generate() over `batch`; returns (output ids per row, rejected flags)"""
+        size = batch["input_ids"].shape[0]
+        criteria = self._adaptive_criteria(kind, size, self.model.device)
+        with torch.inference_mode():
+            outputs = self.model.generate(
+                **batch,
+                **params,
+                **extra,
+                stopping_criteria=StoppingCriteriaList([criteria] if criteria is not None else []),
+                pad_token_id=self.tokenizer.eos_token_id,
+            )
+        flags = criteria.rejected.tolist() if criteria is not None else [False] * size
+        return outputs.tolist(), flags
+
+    def _generate_assisted(self, batch, params, kind):
+        """Assisted generation with the draft model, one sequence at a time
+
+        Returns (output ids per row, rejected flags, acceptance rate per row).
+        """
+        outputs, flags, acceptance = [], [], []
+        for row in range(batch["input_ids"].shape[0]):
+            single = {k: v[row:row + 1] for k, v in batch.items()}
+            # Only the real tokens; assisted generation takes no padding
+            length = int(single["attention_mask"].sum())
+            single = {k: v[:, :length] for k, v in single.items()}
+            self._target_forwards.start()
+            self._draft_forwards.start()
+            ids, flag = self._generate_batch(single, params, kind, assistant_model=self.draft_model)
+            outputs.extend(ids)
+            flags.extend(flag)
+            acceptance.append(self._record_speculation(ids[0]))
+        return outputs, flags, acceptance
+
+    def _finish_text(self, text, kind, rejected):
+        if rejected:
+            return ""
+        trim_at = KIND_PROFILES.get(kind, {}).get("trim_at")
+        if trim_at and trim_at in text:
+            # Rows of an older generate() may run past their stop; keep the first sentence
+            text = text[:text.index(trim_at) + len(trim_at)]
+        return text
+
+    # --- Worker ---
+    def _collect(self):
+        """Block until work arrives, then hold the window open for other sessions
+
+        Background requests are only taken, one batch at a time, while no
+        interactive request is pending, so a live request waits for at most
+        one background batch.
+        """
+        with self._cond:
+            while not self._pending and not self._background:
+                self._cond.wait()
+            if not self._pending:
+                pending = [self._background.popleft() for _ in range(min(self.max_batch_size, len(self._background)))]
+                return [r for r in pending if r.future.set_running_or_notify_cancel()]
+            deadline = self._pending[0].enqueued_at + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            pending = list(self._pending)
+            self._pending.clear()
+        # Drop requests whose caller already gave up
+        return [r for r in pending if r.future.set_running_or_notify_cancel()]
+
+    def _group(self, requests):
+        """Split requests into batches of similar length and identical parameters"""
+        started = time.monotonic()
+        encoded = self.encoder.encode_many([r.prompt for r in requests])
+        # One encoder call covers every pending prompt; charge each its share
+        tokenize_ms = 1000.0 * (time.monotonic() - started) / len(requests)
+        for request, input_ids in zip(requests, encoded):
+            request.tokenize_ms = tokenize_ms
+            # Lets callers holding only the future (the model worker) report prompt sizes without re-encoding
+            request.future.prompt_tokens = len(input_ids)
+
+        groups = {}
+        for request, input_ids in zip(requests, encoded):
+            key = (request.key, len(input_ids) // self.length_bucket)
+            groups.setdefault(key, []).append((request, input_ids))
+
+        for members in groups.values():
+            for start in range(0, len(members), self.max_batch_size):
+                yield members[start:start + self.max_batch_size]
+
+    def _run(self):
+        while True:
+            requests = self._collect()
+            if not requests:
+                continue
+            try:
+                batches = list(self._group(requests))
+            except Exception as e:
+                for request in requests:
+                    request.future.set_exception(e)
+                continue
+            for batch in batches:
+                self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        started = time.monotonic()
+        requests = [request for request, _ in batch]
+        texts = None
+        try:
+            inputs = self.tokenizer.pad(
+                {"input_ids": [input_ids for _, input_ids in batch]},
+                return_tensors="pt",
+            )
+            device = self.model.device
+            inputs = {k: v.to(device) for k, v in inputs.items()}
+            padded = time.monotonic()
+
+            kind = requests[0].kind
+            outputs, rejected, resampled, acceptance = self._generate(inputs, requests[0].params, kind)
+            generated = time.monotonic()
+            texts = [
+                self._finish_text(text, kind, flag)
+                for text, flag in zip(self.tokenizer.batch_decode(outputs, skip_special_tokens=True), rejected)
+            ]
+            decoded = time.monotonic()
+        except Exception as e:
+            for request in requests:
+                request.future.set_exception(e)
+
+        finished = time.monotonic()
+        with self._stats_lock:
+            self._stats["requests"] += len(requests)
+            self._stats["batches"] += 1
+            self._stats["batch_sizes"][len(requests)] += 1
+            self._stats["total_wait"] += sum(started - r.enqueued_at for r in requests)
+            self._stats["total_batch_time"] += finished - started
+
+        if texts is None:
+            return
+        for request, text in zip(requests, texts):
+            request.future.set_result(text)
+        if self.breaker is not None:
+            for request in requests:
+                # Background requests wait behind every live one; their latency says nothing about load
+                if not request.background:
+                    self.breaker.record_latency(1000.0 * (finished - request.enqueued_at))
+
+        if self.telemetry is not None:
+            special_ids = {self.tokenizer.pad_token_id, self.tokenizer.eos_token_id}
+            for (request, input_ids), output_ids, flag, again, rate in zip(
+                batch, outputs, rejected, resampled, acceptance
+            ):
+                self.telemetry.record(
+                    request.kind,
+                    prompt_tokens=len(input_ids),
+                    generated_tokens=sum(1 for token in output_ids if token not in special_ids),
+                    queue_ms=1000.0 * (started - request.enqueued_at),
+                    tokenize_ms=request.tokenize_ms + 1000.0 * (padded - started),
+                    generate_ms=1000.0 * (generated - padded),
+                    decode_ms=1000.0 * (decoded - generated),
+                    total_ms=1000.0 * (finished - request.enqueued_at),
+                    batch_size=len(requests),
+                    rejected=flag,
+                    resampled=again,
+                    speculative=kind in self.speculative_kinds,
+                    acceptance_rate=rate,
+                )
@@ -0,0 +1,232 @@
+"""Streamlit-independent interview state machine.
+
+``InterviewSession`` holds one candidate's configuration, questions, answers
+and transcript, and moves between three phases through explicit transitions:
+
+    NEEDS_QUESTION --ask_next()--> AWAITING_ANSWER --submit_answer()--> NEEDS_QUESTION
+                                                                   \\-> FINISHED
+
+The UI calls a transition and then renders. It no longer rescans the transcript
+to work out where the interview is, so the work done per interaction stays
+constant as the conversation grows.
+
+With a ``transcripts.TranscriptStore`` attached, every message is appended to
+the store and state is saved after each transition. Only the last `window`
+messages stay in memory, older ones are paged back with ``history()``, and
+``InterviewSession.restore`` picks an interview up again after a restart.
+"""
+import time
+import uuid
+from collections import deque
+
+from prompts import question_topic
+
+NEEDS_QUESTION = "needs_question"
+AWAITING_ANSWER = "awaiting_answer"
+FINISHED = "finished"
+
+# Transcript role -> (chat_message name, avatar, label prefix)
+ROLE_DISPLAY = {
+    "System": ("system", None, "📢 "),
+    "Interviewer": ("assistant", "👔", "**Interviewer**: "),
+    "Coach": ("assistant", "📊", "**Coach**: "),
+    "Candidate": ("user", "🧑‍💼", "**You**: ")
+}
+
+# Answers longer than this many words count as detailed
+DETAILED_ANSWER_WORDS = 25
+
+IMPLEMENTATION_TRACKS = frozenset({"Software Development", "Web Development"})
+
+
+class InterviewSession:
+    """One candidate's interview"""
+
+    __slots__ = (
+        "track", "difficulty", "num_questions", "interviewer_style", "coach_style",
+        "questions", "expected_answers", "topics", "answers", "answer_words",
+        "conversation", "message_count", "current_q", "phase", "final_feedback", "scores", "started_at",
+        "interview_id", "store"
+    )
+
+    # Saved to the store after every transition; the transcript itself is stored per message
+    STATE_FIELDS = (
+        "track", "difficulty", "num_questions", "interviewer_style", "coach_style",
+        "questions", "expected_answers", "topics", "answers", "answer_words",
+        "message_count", "current_q", "phase", "final_feedback", "scores", "started_at"
+    )
+
+    def __init__(self, track, difficulty, num_questions, interviewer_style="Professional",
+                 coach_style="Encouraging", store=None, window=12, interview_id=None, welcome=True):
+        self.interview_id = interview_id or uuid.uuid4().hex
+        self.store = store
+        # Without a store the whole transcript has to stay in memory
+        self.conversation = deque(maxlen=window if store is not None else None)
+        self.message_count = 0
+        self.track = track
+        self.difficulty = difficulty
+        self.num_questions = int(num_questions)
+        self.interviewer_style = interviewer_style
+        self.coach_style = coach_style
+        self.questions = []
+        self.expected_answers = []
+        # Topic of each question, kept in step with `questions` for prompt building
+        self.topics = []
+        self.answers = []
+        self.answer_words = []
+        self.current_q = 0
+        self.phase = NEEDS_QUESTION
+        self.final_feedback = None
+        # Per-question results of scoring.score_answers, once the interview has been scored
+        self.scores = None
+        self.started_at = time.time()
+        if welcome:
+            self.add_message(
+                "System",
+                f"Welcome! Starting your {difficulty.lower()} level interview for {track}. "
+                f"We'll go through {self.num_questions} questions together."
+            )
+            self._persist()
+
+    @classmethod
+    def restore(cls, store, interview_id, window=12):
+        """Rebuild a stored interview with its most recent messages; None if unknown"""
+        state = store.load_state(interview_id)
+        if state is None:
+            return None
+        session = cls(
+            state["track"], state["difficulty"], state["num_questions"],
+            store=store, window=window, interview_id=interview_id, welcome=False
+        )
+        for field in cls.STATE_FIELDS:
+            setattr(session, field, state[field])
+        session.conversation.extend(store.page(interview_id, before=session.message_count, limit=window))
+        return session
+
+    def to_state(self):
+        return {field: getattr(self, field) for field in self.STATE_FIELDS}
+
+    def _persist(self):
+        if self.store is not None:
+            self.store.save_state(self.interview_id, self.to_state())
+
+    # --- Transcript ---
+    def add_message(self, role, message, agent=None, **extra):
+        """Append a message to the transcript (and the store) and return it"""
+        entry = {"seq": self.message_count, "role": role, "message": message, "agent": agent,
+                 "timestamp": time.time()}
+        entry.update(extra)
+        self.conversation.append(entry)
+        self.message_count += 1
+        if self.store is not None:
+            self.store.append_message(self.interview_id, entry)
+        return entry
+
+    @property
+    def earliest_loaded_seq(self):
+        """seq of the oldest message held in memory"""
+        return self.conversation[0]["seq"] if self.conversation else self.message_count
+
+    def history(self, before, limit=20):
+        """Older messages (seq < `before`), oldest first, paged from the store"""
+        if self.store is None:
+            return [entry for entry in self.conversation if entry["seq"] < before][-limit:]
+        return self.store.page(self.interview_id, before=before, limit=limit)
+
+    # --- Questions ---
+    def add_question(self, question, expected_answer):
+        self.questions.append(question)
+        self.expected_answers.append(expected_answer)
+        self.topics.append(question_topic(question))
+
+    def add_questions(self, questions, expected_answers):
+        for question, expected_answer in zip(questions, expected_answers):
+            self.add_question(question, expected_answer)
+        self._persist()
+
+    @property
+    def previous_topics(self):
+        return [topic for topic in self.topics if topic]
+
+    @property
+    def needs_question(self):
+        """Whether the current question still has to be generated"""
+        return self.phase == NEEDS_QUESTION and len(self.questions) <= self.current_q
+
+    @property
+    def current_question(self):
+        return self.questions[self.current_q] if self.current_q < len(self.questions) else None
+
+    # --- Transitions ---
+    def ask_next(self):
+        """NEEDS_QUESTION -> AWAITING_ANSWER: put the current question to the candidate"""
+        if self.phase != NEEDS_QUESTION:
+            raise RuntimeError(f"Cannot ask a question while {self.phase}")
+        if self.needs_question:
+            raise RuntimeError(f"Question {self.current_q + 1} has not been prepared")
+        question = self.questions[self.current_q]
+        self.add_message("Interviewer", question, "Interviewer", question_id=self.current_q)
+        self.phase = AWAITING_ANSWER
+        self._persist()
+        return question
+
+    def submit_answer(self, answer, feedback):
+        """AWAITING_ANSWER -> NEEDS_QUESTION, or FINISHED after the last question"""
+        if self.phase != AWAITING_ANSWER:
+            raise RuntimeError(f"Cannot take an answer while {self.phase}")
+        self.add_message("Candidate", answer, "Candidate", question_id=self.current_q)
+        self.add_message("Coach", feedback, "Coach", question_id=self.current_q)
+        self.answers.append(answer)
+        self.answer_words.append(len(answer.split()))
+        self.current_q += 1
+        if self.current_q >= self.num_questions:
+            self._finish()
+        else:
+            self.phase = NEEDS_QUESTION
+        self._persist()
+
+    def _finish(self):
+        self.final_feedback = self.final_assessment()
+        self.add_message("Coach", f"🎯 **Final Assessment**: {self.final_feedback}", "Coach")
+        self.phase = FINISHED
+
+    # --- Reporting ---
+    @property
+    def finished(self):
+        return self.phase == FINISHED
+
+    def progress(self):
+        """(fraction, label) for the progress bar"""
+        if self.current_q < self.num_questions:
+            return self.current_q / self.num_questions, f"Question {self.current_q + 1} of {self.num_questions}"
+        return 1.0, f"Completed {self.num_questions} of {self.num_questions} questions"
+
+    def record_scores(self, scores):
+        """Attach per-question answer scores (see scoring.score_answers)"""
+        if len(scores) != len(self.answers):
+            raise ValueError(f"Expected {len(self.answers)} scores, got {len(scores)}")
+        self.scores = list(scores)
+        self._persist()
+
+    def average_answer_words(self):
+        return sum(self.answer_words) / len(self.answer_words) if self.answer_words else 0
+
+    def detailed_answers(self, min_words=DETAILED_ANSWER_WORDS):
+        return sum(1 for words in self.answer_words if words > min_words)
+
+    def final_assessment(self):
+        """Fast, template-based overall feedback personalized from the answers"""
+        performance_level = "good" if self.average_answer_words() > 20 else "basic"
+        engagement_level = "high" if self.detailed_answers() > self.num_questions // 2 else "moderate"
+        return f"""**Overall Performance**: You completed this {self.difficulty.lower()} level {self.track} interview with {performance_level} engagement.
+
+**Key Strengths**:
+• Active participation in all {self.num_questions} questions
+• {"Detailed responses showing good technical thinking" if engagement_level == "high" else "Willingness to tackle technical challenges"}
+
+**Areas for Improvement**:
+• Structure answers using STAR method (Situation, Task, Action, Result)
+• Include more specific examples from your experience
+• {"Focus on explaining implementation details" if self.track in IMPLEMENTATION_TRACKS else "Discuss real-world applications and case studies"}
+
+**Next Steps**: Practice mock interviews, prepare concrete examples, and focus on explaining your problem-solving process step-by-step."""
@@ -0,0 +1,406 @@
+"""Client side of the out-of-process model service (see model_server.py).
+
+``RemoteScheduler`` offers the same interface as ``inference.InferenceScheduler``
+(submit, submit_many, generate, generate_many, stream, embed, queue_depth, metrics), but
+every call goes over a pooled Unix-socket connection to one of the model
+worker processes. The Streamlit process then never runs ``generate`` itself, so
+a long generation cannot stall UI reruns for other users.
+
+Frames are a 4-byte big-endian length followed by a UTF-8 JSON object.
+"""
+import glob
+import json
+import queue
+import socket
+import struct
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+from prompts import template_reference
+from result_cache import cache_params, lookup, submit_through_cache
+
+# Seconds to wait for a reply frame (streams use their own first-token timeout)
+REPLY_TIMEOUT = 300.0
+STREAM_TIMEOUT = 60.0
+# Seconds to wait for a free worker connection when every one is busy (or its worker dead)
+CHECKOUT_TIMEOUT = REPLY_TIMEOUT
+# Seconds to wait for every worker to answer at startup; loading a large model can take minutes
+STARTUP_TIMEOUT = 600.0
+
+_HEADER = struct.Struct(">I")
+
+
+# --- Framing ---
+def send_frame(sock, message):
+    payload = json.dumps(message).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("Model server closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_frame(sock):
+    (size,) = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return json.loads(_recv_exactly(sock, size).decode("utf-8"))
+
+
+def worker_socket_paths(socket_path):
+    """Worker sockets are named <socket_path>.<index>; other <socket_path>.* files are ignored"""
+    paths = [p for p in glob.glob(glob.escape(socket_path) + ".*") if p.rsplit(".", 1)[1].isdigit()]
+    return sorted(paths, key=lambda p: int(p.rsplit(".", 1)[1]))
+
+
+def _connect(path, timeout=REPLY_TIMEOUT):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    sock.connect(path)
+    return sock
+
+
+def ping(path, timeout=5.0):
+    """Ask one worker for its status; raises OSError if it is not up"""
+    sock = _connect(path, timeout)
+    try:
+        send_frame(sock, {"op": "ping"})
+        return recv_frame(sock)
+    finally:
+        sock.close()
+
+
+def wait_for_model_server(socket_path, progress=None, poll_interval=1.0, timeout=STARTUP_TIMEOUT):
+    """Block until every worker behind `socket_path` answers a ping
+
+    Shaped like backends.load_backend for ModelLoader: returns
+    (None, None, info) with the backend report of the first worker. Raises
+    TimeoutError if the workers are not all up within `timeout` seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        paths = worker_socket_paths(socket_path)
+        replies = []
+        for path in paths:
+            try:
+                replies.append(ping(path))
+            except (OSError, ValueError):
+                pass
+        if paths and len(replies) == len(paths):
+            info = dict(replies[0]["backend"])
+            info["runtime"] = f"{info['runtime']} × {len(replies)} workers"
+            info["workers"] = len(replies)
+            return None, None, info
+        if progress is not None:
+            fraction = 0.05 + 0.9 * len(replies) / len(paths) if paths else 0.0
+            progress(fraction, f"Waiting for model workers ({len(replies)}/{len(paths)} up)")
+        if time.monotonic() + poll_interval > deadline:
+            raise TimeoutError(
+                f"Model workers at {socket_path}.* not up within {timeout:g}s ({len(replies)}/{len(paths)} answered)"
+            )
+        time.sleep(poll_interval)
+
+
+class _Slot:
+    """One pooled connection to one worker"""
+
+    __slots__ = ("path", "sock")
+
+    def __init__(self, path):
+        self.path = path
+        self.sock = None
+
+    def request(self, message):
+        if self.sock is None:
+            self.sock = _connect(self.path)
+        send_frame(self.sock, message)
+        return recv_frame(self.sock)
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            finally:
+                self.sock = None
+
+
+class RemoteScheduler:
+    """InferenceScheduler look-alike backed by the model worker pool"""
+
+    def __init__(self, socket_path, connections_per_worker=2, telemetry=None, breaker=None, result_cache=None):
+        self.socket_path = socket_path
+        self.telemetry = telemetry
+        self.breaker = breaker
+        # Kept in this process, so every worker's results are shared by all sessions
+        self.result_cache = result_cache
+        paths = worker_socket_paths(socket_path)
+        if not paths:
+            raise ConnectionError(f"No model workers found at {socket_path}.*")
+
+        # Interleave slots so consecutive checkouts land on different workers
+        self._idle = queue.LifoQueue()
+        self.pool_size = len(paths) * max(1, int(connections_per_worker))
+        for _ in range(max(1, int(connections_per_worker))):
+            for path in paths:
+                self._idle.put(_Slot(path))
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="model-client")
+
+        self._stats_lock = threading.Lock()
+        self._waiting = 0
+        # Background requests take turns on a single connection, leaving the rest to live sessions
+        self._background_turn = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "max_queue_depth": 0,
+            "total_wait": 0.0,
+            "total_batch_time": 0.0,
+            "batch_sizes": Counter(),
+        }
+
+    # --- Public API (mirrors InferenceScheduler) ---
+    def submit(self, prompt, max_len=150, temperature=0.7, kind=None, background=False, **generate_kwargs):
+        return self.submit_many([prompt], max_len, temperature, kind, background, **generate_kwargs)[0]
+
+    def submit_many(self, prompts, max_len=150, temperature=0.7, kind=None, background=False, **generate_kwargs):
+        """Send the prompts to one worker in a single request so they share a batch there
+
+        `background` requests hold at most one worker connection at a time, run
+        in the worker's background lane, and are left out of queue_depth() and
+        the breaker's latencies.
+        """
+        if self.result_cache is not None and self.result_cache.caches(kind):
+            generate_kwargs = dict(generate_kwargs, do_sample=False)
+            return submit_through_cache(
+                self.result_cache, kind, prompts, cache_params(max_len, generate_kwargs),
+                lambda misses: self._submit(misses, max_len, temperature, kind, generate_kwargs, background),
+                self.telemetry,
+            )
+        return self._submit(prompts, max_len, temperature, kind, generate_kwargs, background)
+
+    def _submit(self, prompts, max_len, temperature, kind, generate_kwargs, background=False):
+        futures = [Future() for _ in prompts]
+        enqueued_at = time.monotonic()
+        if not background:
+            with self._stats_lock:
+                self._waiting += len(prompts)
+                self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._waiting)
+        self._executor.submit(
+            self._run_generate, list(prompts), futures, max_len, temperature, kind, generate_kwargs, enqueued_at,
+            background,
+        )
+        return futures
+
+    def generate(self, prompt, max_len=150, temperature=0.7, timeout=None, kind=None, **generate_kwargs):
+        return self.submit(prompt, max_len, temperature, kind, **generate_kwargs).result(timeout)
+
+    def generate_many(self, prompts, max_len=150, temperature=0.7, timeout=None, kind=None, **generate_kwargs):
+        futures = self.submit_many(prompts, max_len, temperature, kind, **generate_kwargs)
+        return [future.result(timeout) for future in futures]
+
+    def stream(self, prompt, max_len=150, temperature=0.7, kind=None, first_token_timeout=None, **generate_kwargs):
+        """Yield text chunks streamed back by a worker"""
+        cached = self.result_cache is not None and self.result_cache.caches(kind)
+        if cached:
+            generate_kwargs = dict(generate_kwargs, do_sample=False)
+            key_params = cache_params(max_len, generate_kwargs)
+            text = lookup(self.result_cache, kind, prompt, key_params, self.telemetry)
+            if text is not None:
+                yield text
+                return
+        chunks = []
+        started = time.monotonic()
+        first_token_timeout = first_token_timeout or STREAM_TIMEOUT
+        try:
+            # Waiting for a free connection counts against the first-token deadline
+            slot = self._checkout(first_token_timeout)
+        except TimeoutError:
+            if self.breaker is not None:
+                self.breaker.record_latency(1000.0 * (time.monotonic() - started))
+            raise TimeoutError("No worker connection free within the streaming deadline") from None
+        checked_out = time.monotonic()
+        first_token_ms = None
+        rejected = False
+        try:
+            if slot.sock is None:
+                slot.sock = _connect(slot.path)
+            slot.sock.settimeout(max(0.001, first_token_timeout - (checked_out - started)))
+            send_frame(slot.sock, {
+                "op": "stream", "prompt": prompt, "template": template_reference(prompt), "max_len": max_len,
+                "temperature": temperature, "kind": kind, "params": generate_kwargs,
+            })
+            while True:
+                try:
+                    frame = recv_frame(slot.sock)
+                except socket.timeout:
+                    # Dropping the connection makes the worker stop generating
+                    slot.close()
+                    if self.breaker is not None:
+                        self.breaker.record_latency(1000.0 * (time.monotonic() - started))
+                    raise TimeoutError("No tokens within the streaming deadline")
+                if "error" in frame:
+                    raise RuntimeError(frame["error"])
+                if frame.get("done"):
+                    rejected = bool(frame.get("rejected"))
+                    break
+                if first_token_ms is None:
+                    first_token_ms = 1000.0 * (time.monotonic() - started)
+                    slot.sock.settimeout(STREAM_TIMEOUT)
+                chunks.append(frame["chunk"])
+                yield frame["chunk"]
+        except GeneratorExit:
+            slot.close()
+            raise
+        except (OSError, ConnectionError):
+            slot.close()
+            raise
+        finally:
+            if slot.sock is not None:
+                slot.sock.settimeout(REPLY_TIMEOUT)
+            self._idle.put(slot)
+
+        # Like InferenceScheduler.stream, a text the worker's stop criteria rejected is not cached
+        if cached and not rejected:
+            self.result_cache.put(kind, prompt, key_params, "".join(chunks))
+        finished = time.monotonic()
+        if self.breaker is not None:
+            self.breaker.record_latency(1000.0 * (finished - started))
+        if self.telemetry is not None:
+            self.telemetry.record(
+                kind,
+                queue_ms=1000.0 * (checked_out - started),
+                generate_ms=1000.0 * (finished - checked_out),
+                total_ms=1000.0 * (finished - started),
+                first_token_ms=first_token_ms,
+                batch_size=1,
+                streamed=True,
+                rejected=rejected,
+                remote=True,
+            )
+
+    def embed(self, texts, batch_size=32):
+        """Mean-pooled encoder embeddings computed by one of the workers"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        slot = self._checkout()
+        try:
+            reply = slot.request({"op": "embed", "texts": list(texts), "batch_size": batch_size})
+        except Exception:
+            slot.close()
+            raise
+        finally:
+            self._idle.put(slot)
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return np.asarray(reply["vectors"], dtype=np.float32)
+
+    def queue_depth(self):
+        with self._stats_lock:
+            return self._waiting
+
+    def metrics(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+            batch_sizes = dict(stats.pop("batch_sizes"))
+            depth = self._waiting
+        requests = stats["requests"]
+        batches = stats["batches"]
+        return {
+            "queue_depth": depth,
+            "max_queue_depth": stats["max_queue_depth"],
+            "requests": requests,
+            "batches": batches,
+            "avg_batch_size": requests / batches if batches else 0.0,
+            "avg_wait_ms": 1000.0 * stats["total_wait"] / requests if requests else 0.0,
+            "avg_batch_ms": 1000.0 * stats["total_batch_time"] / batches if batches else 0.0,
+            "batch_sizes": batch_sizes,
+            "max_wait_ms": 0.0,
+            # Prompts are encoded, and cached, in the workers
+            "prompt_cache": None,
+            "speculative": None,
+        }
+
+    # --- Internals ---
+    def _checkout(self, timeout=CHECKOUT_TIMEOUT):
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No model worker connection became free within {timeout:g}s") from None
+
+    def _run_generate(self, prompts, futures, max_len, temperature, kind, generate_kwargs, enqueued_at,
+                      background=False):
+        if background:
+            with self._background_turn:
+                self._generate_on_worker(
+                    prompts, futures, max_len, temperature, kind, generate_kwargs, enqueued_at, background
+                )
+            return
+        with self._stats_lock:
+            self._waiting -= len(prompts)
+        self._generate_on_worker(prompts, futures, max_len, temperature, kind, generate_kwargs, enqueued_at)
+
+    def _generate_on_worker(self, prompts, futures, max_len, temperature, kind, generate_kwargs, enqueued_at,
+                            background=False):
+        live = [(p, f) for p, f in zip(prompts, futures) if f.set_running_or_notify_cancel()]
+        if not live:
+            return
+
+        try:
+            slot = self._checkout()
+        except TimeoutError as e:
+            for _, future in live:
+                future.set_exception(e)
+            return
+        started = time.monotonic()
+        try:
+            reply = slot.request({
+                "op": "generate", "prompts": [p for p, _ in live],
+                "templates": [template_reference(p) for p, _ in live], "max_len": max_len,
+                "temperature": temperature, "kind": kind, "params": generate_kwargs, "background": background,
+            })
+        except Exception as e:
+            slot.close()
+            reply = {"error": f"{type(e).__name__}: {e}"}
+        finally:
+            self._idle.put(slot)
+        finished = time.monotonic()
+
+        with self._stats_lock:
+            self._stats["requests"] += len(live)
+            self._stats["batches"] += 1
+            self._stats["batch_sizes"][len(live)] += 1
+            self._stats["total_wait"] += len(live) * (started - enqueued_at)
+            self._stats["total_batch_time"] += finished - started
+
+        if "error" in reply:
+            for _, future in live:
+                future.set_exception(RuntimeError(reply["error"]))
+            return
+        for (_, future), text in zip(live, reply["texts"]):
+            future.set_result(text)
+
+        if self.breaker is not None and not background:
+            for _ in live:
+                self.breaker.record_latency(1000.0 * (finished - enqueued_at))
+        if self.telemetry is not None:
+            for stats in reply.get("stats", []):
+                self.telemetry.record(
+                    kind,
+                    prompt_tokens=stats.get("prompt_tokens"),
+                    generated_tokens=stats.get("generated_tokens"),
+                    # Worker-side time covers its own batching window, tokenize, generate and decode
+                    queue_ms=1000.0 * (started - enqueued_at),
+                    generate_ms=stats.get("server_ms"),
+                    total_ms=1000.0 * (finished - enqueued_at),
+                    batch_size=len(live),
+                    remote=True,
+                )
@@ -0,0 +1,225 @@
+"""Out-of-process model service for the interview simulator.
+
+Runs the model in a pool of worker processes instead of inside the Streamlit
+server, so generation scales with core count and a long ``generate`` cannot
+stall UI reruns:
+
+    python model_server.py --socket /tmp/interview-model.sock --workers 4 --size large
+
+The parent loads the tokenizer and weights once and then forks the workers.
+safetensors checkpoints are memory-mapped and inference never writes to the
+weights, so every worker shares the same physical pages read-only. Each worker
+is pinned to its own slice of the available cores, sizes its intra-op thread
+pool to that slice, and serves ``<socket>.<index>`` with a local
+``InferenceScheduler`` that micro-batches the requests it receives.
+
+Point the app at the service with ``model_server_socket`` in secrets.toml; see
+model_client.py for the client side and the wire format.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+import torch
+
+from backends import PRECISIONS, RUNTIMES, describe_backend, load_backend, load_draft_model, warm_up
+from inference import InferenceScheduler
+from model_client import recv_frame, send_frame
+from prompts import from_template_reference
+
+# Seconds between checks for crashed workers
+SUPERVISE_INTERVAL = 2.0
+
+
+def core_slices(workers, cores=None):
+    """Split the usable cores into `workers` contiguous, non-overlapping slices"""
+    cores = sorted(cores if cores is not None else os.sched_getaffinity(0))
+    workers = max(1, min(int(workers), len(cores)))
+    size, extra = divmod(len(cores), workers)
+    slices, start = [], 0
+    for index in range(workers):
+        end = start + size + (1 if index < extra else 0)
+        slices.append(cores[start:end])
+        start = end
+    return slices
+
+
+# --- Worker process ---
+def _serve_connection(conn, scheduler, tokenizer, hello):
+    """Answer framed requests on one client connection until it closes"""
+    with conn:
+        while True:
+            try:
+                request = recv_frame(conn)
+            except (ConnectionError, OSError, ValueError):
+                return
+            op = request.get("op")
+            try:
+                if op == "ping":
+                    send_frame(conn, hello)
+                elif op == "metrics":
+                    send_frame(conn, scheduler.metrics())
+                elif op == "generate":
+                    started = time.monotonic()
+                    # Templated prompts keep their template, so the worker reuses its cached segments
+                    references = request.get("templates") or [None] * len(request["prompts"])
+                    prompts = [from_template_reference(p, r) for p, r in zip(request["prompts"], references)]
+                    futures = scheduler.submit_many(
+                        prompts, request["max_len"], request["temperature"],
+                        kind=request.get("kind"), background=request.get("background", False),
+                        **request.get("params", {}),
+                    )
+                    texts = [future.result() for future in futures]
+                    server_ms = 1000.0 * (time.monotonic() - started)
+                    text_ids = tokenizer(texts)["input_ids"]
+                    stats = [
+                        {
+                            "prompt_tokens": getattr(future, "prompt_tokens", None),
+                            "generated_tokens": len(t),
+                            "server_ms": server_ms,
+                        }
+                        for future, t in zip(futures, text_ids)
+                    ]
+                    send_frame(conn, {"texts": texts, "stats": stats})
+                elif op == "embed":
+                    vectors = scheduler.embed(request["texts"], request.get("batch_size", 32))
+                    send_frame(conn, {"vectors": vectors.tolist()})
+                elif op == "stream":
+                    chunks = scheduler.stream(
+                        from_template_reference(request["prompt"], request.get("template")),
+                        request["max_len"], request["temperature"],
+                        kind=request.get("kind"), **request.get("params", {}),
+                    )
+                    try:
+                        while True:
+                            try:
+                                chunk = next(chunks)
+                            except StopIteration as stop:
+                                # The stream returns whether the kind's validation rejected the text
+                                rejected = bool(stop.value)
+                                break
+                            send_frame(conn, {"chunk": chunk})
+                    finally:
+                        # Stops the generate if the client hung up mid-stream
+                        chunks.close()
+                    send_frame(conn, {"done": True, "rejected": rejected})
+                else:
+                    send_frame(conn, {"error": f"Unknown op {op!r}"})
+            except (ConnectionError, OSError):
+                return
+            except Exception as e:
+                try:
+                    send_frame(conn, {"error": f"{type(e).__name__}: {e}"})
+                except OSError:
+                    return
+
+
+def worker_main(index, socket_path, cores, tokenizer, model, info, max_batch_size, max_wait_ms,
+                draft_model=None, speculative_kinds=()):
+    """Entry point of one forked worker"""
+    # Ignore Ctrl+C here; the parent terminates workers on shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    os.sched_setaffinity(0, cores)
+    torch.set_num_threads(len(cores))
+
+    warmup_seconds = warm_up(tokenizer, model)
+    scheduler = InferenceScheduler(
+        tokenizer, model, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms,
+        draft_model=draft_model, speculative_kinds=speculative_kinds,
+    )
+    hello = {
+        "worker": index,
+        "pid": os.getpid(),
+        "cores": cores,
+        "backend": dict(info, warmup_seconds=warmup_seconds),
+    }
+
+    path = f"{socket_path}.{index}"
+    if os.path.exists(path):
+        os.remove(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+    while True:
+        conn, _ = listener.accept()
+        threading.Thread(
+            target=_serve_connection, args=(conn, scheduler, tokenizer, hello),
+            name=f"model-worker-{index}-conn", daemon=True,
+        ).start()
+
+
+# --- Parent process ---
+def serve(args):
+    # Keep the parent out of OpenMP before forking; workers size their own pools
+    torch.set_num_threads(1)
+    slices = core_slices(args.workers)
+    print(f"Loading {args.size} ({args.precision}, {args.runtime}) for {len(slices)} workers", flush=True)
+    tokenizer, model, info = load_backend(
+        size=args.size, precision=args.precision, runtime=args.runtime, compile=args.compile,
+        device="cpu", token=os.environ.get("HF_TOKEN"), warm=False,
+    )
+    print(f"Loaded {describe_backend(info)} in {info['load_seconds']:.1f}s", flush=True)
+    draft_model = None
+    if args.draft and args.speculative_kinds:
+        # Forked with the main model, so its pages are shared by every worker too
+        draft_model, info["draft"] = load_draft_model(args.draft, args.precision, "cpu", os.environ.get("HF_TOKEN"))
+        print(f"Loaded draft {info['draft']['model_name']} for {', '.join(args.speculative_kinds)}", flush=True)
+
+    context = multiprocessing.get_context("fork")
+
+    def spawn(index):
+        process = context.Process(
+            target=worker_main,
+            args=(index, args.socket, slices[index], tokenizer, model, info, args.max_batch_size, args.max_wait_ms,
+                  draft_model, args.speculative_kinds),
+            name=f"model-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        print(f"Worker {index} (pid {process.pid}) on cores {slices[index]} -> {args.socket}.{index}", flush=True)
+        return process
+
+    workers = [spawn(index) for index in range(len(slices))]
+    try:
+        while True:
+            time.sleep(SUPERVISE_INTERVAL)
+            for index, process in enumerate(workers):
+                if not process.is_alive():
+                    print(f"Worker {index} exited with {process.exitcode}; restarting", flush=True)
+                    workers[index] = spawn(index)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for index, process in enumerate(workers):
+            process.terminate()
+            process.join(5)
+            if os.path.exists(f"{args.socket}.{index}"):
+                os.remove(f"{args.socket}.{index}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default="/tmp/interview-model.sock", help="socket path prefix")
+    parser.add_argument("--workers", type=int, default=max(1, len(os.sched_getaffinity(0)) // 4),
+                        help="worker processes; cores are split evenly between them")
+    parser.add_argument("--size", default="large", help="small, base, large or a hub model id")
+    parser.add_argument("--precision", choices=PRECISIONS, default="fp32")
+    parser.add_argument("--runtime", choices=RUNTIMES, default="torch")
+    parser.add_argument("--compile", action="store_true")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=15)
+    parser.add_argument("--draft", default="small", help="draft model size for speculative decoding")
+    parser.add_argument("--speculative-kinds", nargs="*", default=[],
+                        choices=["question", "expected_answer", "feedback"],
+                        help="prompt kinds decoded speculatively with the draft model")
+    serve(parser.parse_args(argv))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""Template-aware prompt tokenization with cached static segments.
+
+The coach, question and expected-answer prompts are mostly fixed instructions
+around a few short slots. ``PromptEncoder`` tokenizes the static text of each
+``prompts.PromptTemplate`` once, and for every prompt it only tokenizes the
+slot values before concatenating the cached ids. Text glued to a slot without
+whitespace (a quote, a colon) is tokenized together with that slot, so every
+cached segment starts and ends on a word boundary and the concatenated ids
+match tokenizing the whole prompt.
+
+Prompts over the input limit lose tokens from their longest slots instead of
+the end of the instructions. An LRU of recent full encodings sits on top, so
+repeated prompts (the same question for several candidates, retries) skip
+tokenization entirely. Plain strings are still encoded, with ordinary
+truncation, and they go through the same LRU.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+from prompts import TemplatedPrompt
+
+_TRAILING_WORD = re.compile(r"\S*$")
+_LEADING_WORD = re.compile(r"^\S*")
+
+
+def _trim_lengths(lengths, budget):
+    """Shrink the longest slots first until the lengths fit in `budget`"""
+    lengths = list(lengths)
+    overflow = sum(lengths) - budget
+    while overflow > 0:
+        longest = max(range(len(lengths)), key=lengths.__getitem__)
+        runner_up = max((length for i, length in enumerate(lengths) if i != longest), default=0)
+        cut = min(overflow, max(1, lengths[longest] - runner_up))
+        lengths[longest] -= cut
+        overflow -= cut
+    return lengths
+
+
+class _TemplatePlan:
+    """A template's static segments, tokenized once, and the text glued to each slot"""
+
+    def __init__(self, tokenizer, template):
+        statics = list(template.literals)
+        self.slots = []
+        for i, field in enumerate(template.fields):
+            head = _TRAILING_WORD.search(statics[i])
+            tail = _LEADING_WORD.match(statics[i + 1])
+            statics[i] = statics[i][:head.start()]
+            statics[i + 1] = statics[i + 1][tail.end():]
+            self.slots.append((head.group(), field, tail.group()))
+        self.static_ids = [
+            tokenizer(text, add_special_tokens=False)["input_ids"] if text.strip() else [] for text in statics
+        ]
+        self.static_tokens = sum(len(ids) for ids in self.static_ids)
+        # Tokens of glued text after each slot; kept when the slot itself is trimmed
+        self.tail_tokens = [
+            len(tokenizer(tail, add_special_tokens=False)["input_ids"]) if tail else 0 for _, _, tail in self.slots
+        ]
+
+
+class PromptEncoder:
+    """Thread-safe prompt -> input ids encoder shared by a scheduler's callers"""
+
+    def __init__(self, tokenizer, max_tokens=512, cache_size=1024):
+        self.tokenizer = tokenizer
+        self.max_tokens = int(max_tokens)
+        self.cache_size = max(0, int(cache_size))
+        # Special tokens the tokenizer appends to every sequence (T5: </s>)
+        self.special_ids = tokenizer("")["input_ids"]
+        self._plans = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "trimmed": 0}
+
+    def encode(self, prompt):
+        return self.encode_many([prompt])[0]
+
+    def encode_many(self, prompts):
+        """Input ids for every prompt, in order"""
+        results = [None] * len(prompts)
+        misses = []
+        with self._lock:
+            for i, prompt in enumerate(prompts):
+                ids = self._cache.get(self._key(prompt))
+                if ids is None:
+                    misses.append(i)
+                else:
+                    self._cache.move_to_end(self._key(prompt))
+                    results[i] = ids
+            self._stats["hits"] += len(prompts) - len(misses)
+            self._stats["misses"] += len(misses)
+
+        plain = [i for i in misses if not isinstance(prompts[i], TemplatedPrompt)]
+        if plain:
+            encoded = self.tokenizer(
+                [str(prompts[i]) for i in plain], max_length=self.max_tokens, truncation=True
+            )["input_ids"]
+            for i, ids in zip(plain, encoded):
+                results[i] = ids
+        for i in misses:
+            if results[i] is None:
+                results[i] = self._encode_templated(prompts[i])
+
+        if misses and self.cache_size:
+            with self._lock:
+                for i in misses:
+                    self._cache[self._key(prompts[i])] = results[i]
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return results
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached"] = len(self._cache)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _key(self, prompt):
+        return prompt.cache_key if isinstance(prompt, TemplatedPrompt) else str(prompt)
+
+    def _plan(self, template):
+        plan = self._plans.get(template.name)
+        if plan is None:
+            plan = self._plans[template.name] = _TemplatePlan(self.tokenizer, template)
+        return plan
+
+    def _encode_templated(self, prompt):
+        plan = self._plan(prompt.template)
+        budget = self.max_tokens - len(self.special_ids) - plan.static_tokens
+        if budget < len(plan.slots):
+            # The instructions alone do not fit; nothing sensible to keep but a plain truncation
+            return self.tokenizer(str(prompt), max_length=self.max_tokens, truncation=True)["input_ids"]
+
+        slot_texts = [f"{head}{prompt.values[field]}{tail}" for head, field, tail in plan.slots]
+        slot_ids = [
+            ids if text.strip() else []
+            for text, ids in zip(slot_texts, self.tokenizer(slot_texts, add_special_tokens=False)["input_ids"])
+        ]
+        lengths = [len(ids) for ids in slot_ids]
+        if sum(lengths) > budget:
+            with self._lock:
+                self._stats["trimmed"] += 1
+            for i, length in enumerate(_trim_lengths(lengths, budget)):
+                if length < lengths[i]:
+                    # Cut the slot value, but keep glued text such as a closing quote
+                    tail = min(plan.tail_tokens[i], length)
+                    slot_ids[i] = slot_ids[i][:length - tail] + (slot_ids[i][-tail:] if tail else [])
+
+        input_ids = list(plan.static_ids[0])
+        for ids, static_ids in zip(slot_ids, plan.static_ids[1:]):
+            input_ids.extend(ids)
+            input_ids.extend(static_ids)
+        input_ids.extend(self.special_ids)
+        return input_ids
@@ -0,0 +1,248 @@
+"""Prompt templates shared by the Streamlit app and the headless tools.
+
+Kept free of Streamlit so benchmarks and batch jobs build exactly the prompts
+the interview uses.
+
+The builders render ``PromptTemplate`` objects. The resulting strings remember
+their template and slot values, so ``prompt_encoding.PromptEncoder`` can reuse
+the pre-tokenized static parts and only tokenize the slots.
+"""
+import string
+
+# Specific examples based on track and difficulty
+TRACK_EXAMPLES = {
+    "Artificial Intelligence": {
+        "Easy": "real-world ML project, data preprocessing challenge, basic algorithm selection",
+        "Medium": "production ML system, model optimization, handling bias or drift",
+        "Hard": "distributed AI architecture, advanced deep learning, ethical AI implementation"
+    },
+    "Software Development": {
+        "Easy": "debugging issue, code refactoring, API design",
+        "Medium": "system architecture, performance optimization, integration challenges", 
+        "Hard": "scalable distributed system, complex algorithm implementation, advanced design patterns"
+    },
+    "Web Development": {
+        "Easy": "responsive design problem, basic functionality implementation, user experience issue",
+        "Medium": "full-stack application design, performance optimization, security implementation",
+        "Hard": "large-scale web architecture, advanced frontend/backend integration, complex state management"
+    }
+}
+
+# Extra angles used to vary prompts when the whole question set is planned at once
+GENERAL_FOCUS_AREAS = [
+    "practical project challenge",
+    "problem-solving approach",
+    "tools and best practices",
+    "collaboration and communication",
+    "learning from a past mistake",
+    "trade-offs in a real decision",
+    "explaining a concept to a non-expert",
+    "measuring success and quality"
+]
+
+# Keyword -> topic used to steer away from topics already asked about; first match wins
+TOPIC_KEYWORDS = (
+    ("system", "system design"),
+    ("data", "data handling"),
+    ("performance", "optimization")
+)
+
+# Built-in content served when the model is unavailable, slow or produces unusable text
+FALLBACK_FEEDBACK = (
+    "Good start! Try to be more specific and provide concrete examples in your answer.",
+    "Your answer shows understanding. Consider elaborating with real-world applications.",
+    "Well thought out response. Adding technical details would strengthen your answer.",
+    "Nice explanation! Try to structure your answer with clear points next time."
+)
+
+FALLBACK_QUESTIONS = {
+    "Artificial Intelligence": {
+        "Easy": (
+            "What is the difference between supervised and unsupervised learning?",
+            "Can you explain what a neural network is in simple terms?",
+            "What are some common applications of machine learning you encounter daily?"
+        ),
+        "Medium": (
+            "How would you handle overfitting in a machine learning model?",
+            "Explain the bias-variance tradeoff in machine learning.",
+            "What evaluation metrics would you use for a classification problem?"
+        ),
+        "Hard": (
+            "How would you implement a transformer model for natural language processing?",
+            "Explain how gradient descent optimization algorithms work.",
+            "Discuss the ethical considerations in AI development and deployment."
+        )
+    },
+    "Software Development": {
+        "Easy": (
+            "What is version control and why is it important?",
+            "Explain the concept of object-oriented programming.",
+            "What are some key principles of writing clean code?"
+        ),
+        "Medium": (
+            "How would you optimize a slow database query?",
+            "Explain the Model-View-Controller architecture pattern.",
+            "What testing methodologies do you follow in your development process?"
+        ),
+        "Hard": (
+            "How would you design a scalable microservices architecture?",
+            "Explain the CAP theorem and its implications for distributed systems.",
+            "Describe your approach to securing a web application against common vulnerabilities."
+        )
+    }
+}
+
+DEFAULT_FALLBACK_QUESTION = "Can you explain your approach to problem-solving in technical projects?"
+
+
+def question_topic(question):
+    """The topic a question covers per TOPIC_KEYWORDS, or None"""
+    lowered = question.lower()
+    for keyword, topic in TOPIC_KEYWORDS:
+        if keyword in lowered:
+            return topic
+    return None
+
+
+class TemplatedPrompt(str):
+    """A rendered prompt that still knows its template and slot values"""
+
+    def __new__(cls, text, template, values):
+        prompt = super().__new__(cls, text)
+        prompt.template = template
+        prompt.values = values
+        return prompt
+
+    @property
+    def cache_key(self):
+        return (self.template.name,) + tuple(self.values[field] for field in self.template.fields)
+
+
+class PromptTemplate:
+    """A str.format template split into static text and named slots
+
+    `literals` has one more entry than `fields`: literals[0], fields[0], literals[1], ...
+    """
+
+    def __init__(self, name, text):
+        self.name = name
+        self.text = text
+        self.literals, self.fields = [""], []
+        for literal, field, _, _ in string.Formatter().parse(text):
+            self.literals[-1] += literal
+            if field is not None:
+                self.fields.append(field)
+                self.literals.append("")
+
+    def render(self, **values):
+        return TemplatedPrompt(self.text.format(**values), self, values)
+
+
+QUESTION_TEMPLATE = PromptTemplate("question", """Create a {difficulty} level interview question for {track} position. 
+                    Make it practical and scenario-based. Examples: {examples}
+                    Avoid topics: {previous_topics}
+                    Question:""")
+
+QUESTION_FOCUS_TEMPLATE = PromptTemplate("question_focus", """Create a {difficulty} level interview question for {track} position. 
+                    Make it practical and scenario-based. Focus on: {focus}
+                    {style}Examples: {examples}
+                    Question:""")
+
+ANSWER_TEMPLATE = PromptTemplate("expected_answer", """As a {track} expert, provide key points for answering: "{question}"
+                    List the main technical concepts and approaches:""")
+
+FEEDBACK_TEMPLATE = PromptTemplate("feedback", """You are an interview coach providing feedback after this exchange:
+
+QUESTION: {question}
+CANDIDATE'S ANSWER: {answer}
+
+Provide specific, actionable feedback focusing on:
+- What they did well in their answer
+- 1-2 specific areas for improvement  
+- One concrete suggestion for how to strengthen their response
+
+Keep it supportive but honest. Feedback:""")
+
+TEMPLATES = {template.name: template for template in (
+    QUESTION_TEMPLATE, QUESTION_FOCUS_TEMPLATE, ANSWER_TEMPLATE, FEEDBACK_TEMPLATE
+)}
+
+
+def template_reference(prompt):
+    """(template name, slot values) for sending a templated prompt across processes, else None"""
+    if isinstance(prompt, TemplatedPrompt):
+        return [prompt.template.name, prompt.values]
+    return None
+
+
+def from_template_reference(text, reference):
+    """Inverse of template_reference; plain text when there is no (known) template"""
+    if reference and reference[0] in TEMPLATES:
+        return TEMPLATES[reference[0]].render(**reference[1])
+    return text
+
+
+def build_question_prompt(track, difficulty, previous_questions, focus=None, style=None, previous_topics=None):
+    """Build the question-generation prompt for the next question
+
+    Callers that track topics as questions are added can pass `previous_topics`
+    instead of having every previous question scanned again.
+    """
+    # Get previous questions to avoid repetition
+    if previous_topics is None:
+        previous_topics = [topic for topic in map(question_topic, previous_questions) if topic]
+    
+    previous_topics_text = ", ".join(previous_topics) if previous_topics else "none"
+    
+    difficulty_level = difficulty.lower()
+    examples = TRACK_EXAMPLES.get(track, {}).get(difficulty, "practical project challenge")
+    
+    if focus:
+        style_text = f"Ask it as a {style.lower()} interviewer would.\n                    " if style else ""
+        return QUESTION_FOCUS_TEMPLATE.render(
+            difficulty=difficulty_level, track=track, focus=focus, style=style_text, examples=examples
+        )
+    
+    return QUESTION_TEMPLATE.render(
+        difficulty=difficulty_level, track=track, examples=examples, previous_topics=previous_topics_text
+    )
+
+
+def build_answer_prompt(track, question):
+    """Build the expected-answer prompt used for scoring"""
+    return ANSWER_TEMPLATE.render(track=track, question=question)
+
+
+def build_feedback_prompt(question, answer):
+    """Build the coach feedback prompt for one question/answer exchange"""
+    return FEEDBACK_TEMPLATE.render(question=question, answer=answer)
+
+
+def strip_prompt_echo(prompt, generated_text):
+    """Drop the prompt if the model repeated it at the start of its output"""
+    if generated_text.startswith(prompt):
+        generated_text = generated_text[len(prompt):]
+    return generated_text.strip()
+
+
+def is_usable_feedback(feedback):
+    """Coach feedback that is too short or just talks about 'feedback' gets replaced"""
+    return len(feedback) >= 20 and "feedback" not in feedback.lower()
+
+
+def is_rejected_partial(kind, partial_text):
+    """Early check on output still being decoded: True if the finished text would be thrown away anyway"""
+    lowered = partial_text.lower()
+    if kind == "feedback":
+        return "feedback" in lowered
+    if kind == "question":
+        return "question:" in lowered or "interview question for" in lowered
+    return False
+
+
+def question_focus_areas(track, difficulty, num_questions):
+    """Pick one distinct focus per question so a batch of prompts yields varied questions"""
+    examples = TRACK_EXAMPLES.get(track, {}).get(difficulty)
+    focus_areas = examples.split(", ") if examples else []
+    focus_areas += [area for area in GENERAL_FOCUS_AREAS if area not in focus_areas]
+    return [focus_areas[i % len(focus_areas)] for i in range(num_questions)]
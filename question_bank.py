@@ -0,0 +1,242 @@
+"""On-disk question bank with LRU eviction and a background warm-pool refiller.
+
+Generated questions and their expected answers are stored per
+(track, difficulty, interviewer_style) key. Interviews draw from the pool for
+their key, so they can start without waiting on the model; the refiller keeps
+each pool topped up in the background.
+"""
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+def bank_key(track, difficulty, interviewer_style):
+    """Stable string key for a (track, difficulty, interviewer_style) pool"""
+    return f"{track}|{difficulty}|{interviewer_style}"
+
+
+def parse_bank_key(key):
+    """Inverse of bank_key: (track, difficulty, interviewer_style)"""
+    return tuple(key.split("|", 2))
+
+
+def normalize_question(question):
+    """Lowercased, punctuation-free form used to spot duplicates"""
+    return " ".join(re.sub(r"[^a-z0-9 ]", " ", question.lower()).split())
+
+
+def is_valid_question(question, expected_answer):
+    """Reject outputs that are too short, too long or just echo the prompt"""
+    words = question.split()
+    if len(words) < 5 or len(words) > 60:
+        return False
+    if "question:" in question.lower() or "interview question for" in question.lower():
+        return False
+    return len(expected_answer.split()) >= 3
+
+
+class QuestionBank:
+    """Size-bounded, least-recently-used store of banked questions"""
+
+    def __init__(self, path, max_entries=2000, pool_target=10):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.pool_target = max(1, int(pool_target))
+        self._lock = threading.Lock()
+        # (key, normalized question) -> entry, ordered from least to most recently used
+        self._entries = OrderedDict()
+        self._load()
+
+    # --- Persistence ---
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        except (OSError, ValueError):
+            return
+        for record in records:
+            self._entries[(record["key"], normalize_question(record["question"]))] = record
+        self._evict()
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".question_bank.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(list(self._entries.values()), f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # --- Public API ---
+    def add_many(self, key, questions, expected_answers, used=False):
+        """Store validated question/answer pairs; returns how many were added
+
+        Pass used=True for questions that are already being served, so they are
+        kept for reuse but do not count towards the fresh warm pool.
+        """
+        added = 0
+        now = time.time()
+        with self._lock:
+            for question, expected_answer in zip(questions, expected_answers):
+                entry_key = (key, normalize_question(question))
+                if entry_key in self._entries or not is_valid_question(question, expected_answer):
+                    continue
+                self._entries[entry_key] = {
+                    "key": key,
+                    "question": question,
+                    "expected_answer": expected_answer,
+                    "created": now,
+                    "last_used": now if used else None,
+                }
+                added += 1
+            if added:
+                self._evict()
+                self._save()
+        return added
+
+    def take(self, key, count, accept=None):
+        """Return up to `count` (question, expected_answer) pairs, never-served ones first
+
+        `accept(pairs)` may narrow each batch of candidates down to the pairs to
+        serve. Only served pairs are marked used, so rejected ones stay fresh
+        for other sessions. It runs without the bank's lock held.
+        """
+        with self._lock:
+            candidates = [entry_key for entry_key in self._entries if entry_key[0] == key]
+            candidates.sort(key=lambda entry_key: self._entries[entry_key]["last_used"] or 0)
+            candidates = [
+                (entry_key, (self._entries[entry_key]["question"], self._entries[entry_key]["expected_answer"]))
+                for entry_key in candidates
+            ]
+        chosen = []
+        while candidates and len(chosen) < count:
+            batch, candidates = candidates[:count - len(chosen)], candidates[count - len(chosen):]
+            if accept is None:
+                chosen.extend(batch)
+                continue
+            accepted = set(accept([pair for _, pair in batch]))
+            chosen.extend((entry_key, pair) for entry_key, pair in batch if pair in accepted)
+
+        now = time.time()
+        pairs = []
+        with self._lock:
+            for entry_key, pair in chosen:
+                entry = self._entries.get(entry_key)
+                if entry is None:
+                    # Evicted meanwhile; still served, just no longer tracked
+                    pairs.append(pair)
+                    continue
+                entry["last_used"] = now
+                self._entries.move_to_end(entry_key)
+                pairs.append(pair)
+            if chosen:
+                self._save()
+        return pairs
+
+    def questions(self, key):
+        """Every banked question for `key`, served or not"""
+        with self._lock:
+            return [entry["question"] for entry_key, entry in self._entries.items() if entry_key[0] == key]
+
+    def pool_size(self, key):
+        """Number of banked questions for `key` that have not been served yet"""
+        with self._lock:
+            return sum(
+                1 for entry_key, entry in self._entries.items()
+                if entry_key[0] == key and entry["last_used"] is None
+            )
+
+    def deficit(self, key):
+        """How many more fresh questions the warm pool for `key` needs"""
+        return max(0, self.pool_target - self.pool_size(key))
+
+    def keys(self):
+        with self._lock:
+            return sorted({entry_key[0] for entry_key in self._entries})
+
+    def stats(self):
+        with self._lock:
+            fresh = {}
+            for (key, _), entry in self._entries.items():
+                fresh.setdefault(key, 0)
+                if entry["last_used"] is None:
+                    fresh[key] += 1
+            entries = len(self._entries)
+        return {"entries": entries, "max_entries": self.max_entries, "fresh": fresh}
+
+
+class QuestionBankRefiller:
+    """Background thread that keeps a warm pool per requested key"""
+
+    def __init__(self, bank, fill, batch_size=4, idle_interval=60.0, max_backoff=3600.0):
+        # fill(key, count) -> (questions, expected_answers); must not touch session state
+        self.bank = bank
+        self.fill = fill
+        self.batch_size = max(1, int(batch_size))
+        self.idle_interval = idle_interval
+        self.max_backoff = max_backoff
+        # Only keys sessions asked for; banked keys nobody uses any more are not topped up
+        self._wanted = OrderedDict()
+        # key -> consecutive rounds that added nothing, and when the key may be tried again
+        self._empty_rounds = {}
+        self._retry_at = {}
+        self._cond = threading.Condition()
+        self.last_error = None
+        self._worker = threading.Thread(target=self._run, name="question-bank-refiller", daemon=True)
+        self._worker.start()
+
+    def request(self, key):
+        """Ask the refiller to top up the pool for `key`"""
+        with self._cond:
+            self._wanted[key] = None
+            self._wanted.move_to_end(key, last=False)
+            self._cond.notify()
+
+    def _next_key(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = self.idle_interval
+                for key in self._wanted:
+                    retry_at = self._retry_at.get(key, 0.0)
+                    if retry_at > now:
+                        wait = min(wait, retry_at - now)
+                        continue
+                    if self.bank.deficit(key) > 0:
+                        return key
+                self._cond.wait(wait)
+
+    def _run(self):
+        while True:
+            key = self._next_key()
+            count = min(self.batch_size, self.bank.deficit(key))
+            try:
+                questions, expected_answers = self.fill(key, count)
+                added = self.bank.add_many(key, questions, expected_answers)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+                added = 0
+            with self._cond:
+                if added:
+                    self._empty_rounds.pop(key, None)
+                    self._retry_at.pop(key, None)
+                    continue
+                # Nothing usable came back (an error, or only invalid or duplicate questions). The
+                # deficit may never close, so back off this key exponentially; other keys go on
+                rounds = self._empty_rounds.get(key, 0) + 1
+                self._empty_rounds[key] = rounds
+                delay = min(self.max_backoff, self.idle_interval / 4 * 2 ** min(rounds - 1, 32))
+                self._retry_at[key] = time.monotonic() + delay
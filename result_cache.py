@@ -0,0 +1,206 @@
+"""Process-wide cache of deterministic generations.
+
+Expected answers depend only on the question, and many candidates give nearly
+the same short answer to the same banked question. For the prompt kinds listed
+in a ``ResultCache``, the schedulers decode greedily, so a prompt always maps
+to the same text. They then serve repeats from memory instead of running
+another seq2seq decode.
+
+* Entries are keyed by a hash of the whitespace- and case-normalized prompt
+  plus the generation parameters.
+* Entries expire after `ttl` seconds, and the least recently used ones are
+  evicted beyond `max_entries`.
+* For templated prompts with a near-duplicate slot (the candidate's answer in
+  the feedback prompt), a miss on the exact key falls back to the entries that
+  share every other slot. An entry is reused when its answer's word and bigram
+  sets overlap the new one by at least `answer_similarity` (Jaccard).
+"""
+import functools
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from prompts import TemplatedPrompt
+
+# Prompt kinds cached by default, and the slot of each that only has to be a near-duplicate
+DEFAULT_CACHED_KINDS = ("expected_answer", "feedback")
+DEFAULT_NEAR_DUPLICATE_SLOTS = {"feedback": "answer"}
+
+# Entries kept per near-duplicate bucket (one question's answers)
+BUCKET_SIZE = 32
+
+
+def normalize_text(text):
+    return " ".join(str(text).lower().split())
+
+
+def prompt_hash(text):
+    return hashlib.sha1(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def shingles(text):
+    """Words and word bigrams of the normalized text"""
+    words = re.findall(r"\w+", str(text).lower())
+    return frozenset(words) | frozenset(zip(words, words[1:]))
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ResultCache:
+    """Thread-safe, TTL-bounded LRU of generated texts shared by every session"""
+
+    def __init__(self, kinds=DEFAULT_CACHED_KINDS, max_entries=4096, ttl=6 * 3600,
+                 near_duplicate_slots=None, answer_similarity=0.85):
+        self.kinds = frozenset(kinds)
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl)
+        self.near_duplicate_slots = dict(
+            DEFAULT_NEAR_DUPLICATE_SLOTS if near_duplicate_slots is None else near_duplicate_slots
+        )
+        self.answer_similarity = answer_similarity
+        self._entries = OrderedDict()
+        # bucket key -> OrderedDict(exact key -> shingles of the near-duplicate slot)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "near_hits": 0, "misses": 0, "evictions": 0}
+
+    def caches(self, kind):
+        return kind in self.kinds
+
+    # --- Keys ---
+    def _key(self, kind, prompt, params):
+        return kind, prompt_hash(prompt), tuple(sorted(params.items()))
+
+    def _bucket(self, kind, prompt, params):
+        """(bucket key, slot text) for prompts matched by near-duplicate, else (None, None)"""
+        slot = self.near_duplicate_slots.get(kind)
+        if slot is None or not isinstance(prompt, TemplatedPrompt) or slot not in prompt.values:
+            return None, None
+        others = tuple(
+            (field, normalize_text(value)) for field, value in sorted(prompt.values.items()) if field != slot
+        )
+        return (kind, prompt.template.name, others, tuple(sorted(params.items()))), prompt.values[slot]
+
+    # --- Lookups ---
+    def get(self, kind, prompt, params):
+        """Cached text for the prompt, or None"""
+        if kind not in self.kinds:
+            return None
+        key = self._key(kind, prompt, params)
+        bucket_key, slot_text = self._bucket(kind, prompt, params)
+        now = time.monotonic()
+        with self._lock:
+            text = self._live(key, now)
+            if text is not None:
+                self._stats["hits"] += 1
+                return text
+            if bucket_key is not None and bucket_key in self._buckets:
+                wanted = shingles(slot_text)
+                best_key, best = None, self.answer_similarity
+                for candidate_key, candidate in self._buckets[bucket_key].items():
+                    similarity = jaccard(wanted, candidate)
+                    if similarity >= best:
+                        best_key, best = candidate_key, similarity
+                if best_key is not None:
+                    text = self._live(best_key, now)
+                    if text is not None:
+                        self._stats["near_hits"] += 1
+                        return text
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, kind, prompt, params, text):
+        if kind not in self.kinds or not text:
+            return
+        key = self._key(kind, prompt, params)
+        bucket_key, slot_text = self._bucket(kind, prompt, params)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, text, bucket_key)
+            self._entries.move_to_end(key)
+            if bucket_key is not None:
+                bucket = self._buckets.setdefault(bucket_key, OrderedDict())
+                bucket[key] = shingles(slot_text)
+                bucket.move_to_end(key)
+                while len(bucket) > BUCKET_SIZE:
+                    bucket.popitem(last=False)
+            while len(self._entries) > self.max_entries:
+                oldest, _ = next(iter(self._entries.items()))
+                self._drop(oldest)
+                self._stats["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["near_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["near_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    # --- Internals (hold the lock) ---
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < now:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _drop(self, key):
+        _, _, bucket_key = self._entries.pop(key)
+        bucket = self._buckets.get(bucket_key)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._buckets[bucket_key]
+
+
+def cache_params(max_len, generate_kwargs):
+    """The generation parameters a cached text depends on"""
+    return dict(generate_kwargs, max_length=max_len)
+
+
+def lookup(cache, kind, prompt, params, telemetry=None):
+    """Cached text for one prompt, counting a hit in telemetry; None on a miss"""
+    text = cache.get(kind, prompt, params)
+    if text is not None and telemetry is not None:
+        telemetry.record_cache_hit(kind)
+    return text
+
+
+def submit_through_cache(cache, kind, prompts, params, submit, telemetry=None):
+    """Futures for `prompts`: cached texts resolve at once, the rest go to `submit(prompts)`
+
+    Misses with the same normalized prompt are submitted once and share one
+    future. Texts generated for the misses are added to the cache when they arrive.
+    """
+    futures = [None] * len(prompts)
+    # prompt hash -> indices of the prompts waiting on that generation
+    misses = {}
+    for i, prompt in enumerate(prompts):
+        text = lookup(cache, kind, prompt, params, telemetry)
+        if text is None:
+            misses.setdefault(prompt_hash(prompt), []).append(i)
+            continue
+        futures[i] = Future()
+        futures[i].set_result(text)
+
+    def remember(done, prompt):
+        if not done.cancelled() and done.exception() is None:
+            cache.put(kind, prompt, params, done.result())
+
+    if misses:
+        groups = list(misses.values())
+        for indices, future in zip(groups, submit([prompts[indices[0]] for indices in groups])):
+            future.add_done_callback(functools.partial(remember, prompt=prompts[indices[0]]))
+            for i in indices:
+                futures[i] = future
+    return futures
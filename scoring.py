@@ -0,0 +1,121 @@
+"""Answer scoring against the generated expected answers.
+
+Each expected answer is split into key points and each candidate answer into
+sentences. Whole answers, whole expected answers, sentences and key points for
+every question go through the encoder together in a single ``embed`` call.
+NumPy then computes, per question:
+
+* similarity: cosine between the answer and its expected answer
+* coverage:   share of key points that some sentence of the answer matches
+
+Kept free of Streamlit so the interview page and offline grading score answers
+the same way.
+"""
+import re
+
+import numpy as np
+
+# Mean-pooled T5 states of unrelated texts still sit around this cosine, so it maps to 0
+SIMILARITY_FLOOR = 0.5
+# A key point counts as covered once an answer sentence is at least this similar to it
+POINT_COVERED_THRESHOLD = 0.8
+# Questions whose coverage falls below this are reported as growth areas
+WEAK_COVERAGE = 0.5
+
+_POINT_SPLIT = re.compile(r"[\n;•]+|(?<=[.!?])\s+|,\s+|\s+-\s+")
+_SENTENCE_SPLIT = re.compile(r"[\n]+|(?<=[.!?])\s+")
+
+
+def split_key_points(expected_answer):
+    """Short phrases listed in an expected answer"""
+    points = (point.strip(" .-*:") for point in _POINT_SPLIT.split(expected_answer or ""))
+    return [point for point in points if len(point) >= 3]
+
+
+def split_sentences(answer):
+    sentences = (sentence.strip() for sentence in _SENTENCE_SPLIT.split(answer or ""))
+    return [sentence for sentence in sentences if sentence]
+
+
+def score_answers(embed, answers, expected_answers):
+    """Score every answer against its expected answer with one `embed(texts)` call
+
+    Returns one dict per question with similarity (cosine), coverage (0-1),
+    score (0-100) and the key points the answer missed. Questions without a
+    usable expected answer get None.
+    """
+    texts = []
+    answer_rows, expected_rows, scored = [], [], []
+    sentence_rows, sentence_owner = [], []
+    point_rows, point_owner, points = [], [], []
+
+    def add(text):
+        texts.append(text)
+        return len(texts) - 1
+
+    for question_index, (answer, expected_answer) in enumerate(zip(answers, expected_answers)):
+        key_points = split_key_points(expected_answer)
+        if not answer.strip() or not key_points:
+            continue
+        owner = len(scored)
+        scored.append(question_index)
+        answer_rows.append(add(answer))
+        expected_rows.append(add(expected_answer))
+        # The whole answer also counts as a sentence, for points it covers only in aggregate
+        sentence_rows.append(answer_rows[-1])
+        sentence_owner.append(owner)
+        for sentence in split_sentences(answer):
+            sentence_rows.append(add(sentence))
+            sentence_owner.append(owner)
+        for point in key_points:
+            point_rows.append(add(point))
+            point_owner.append(owner)
+            points.append(point)
+
+    results = [None] * len(answers)
+    if not scored:
+        return results
+
+    vectors = embed(texts)
+    similarity = np.einsum("ij,ij->i", vectors[answer_rows], vectors[expected_rows])
+
+    # Every key point against every sentence of the same question, in one matrix product
+    point_owner = np.asarray(point_owner)
+    same_question = point_owner[:, None] == np.asarray(sentence_owner)[None, :]
+    point_similarity = np.where(same_question, vectors[point_rows] @ vectors[sentence_rows].T, -1.0)
+    covered = point_similarity.max(axis=1) >= POINT_COVERED_THRESHOLD
+    coverage = (
+        np.bincount(point_owner, weights=covered.astype(np.float64), minlength=len(scored))
+        / np.bincount(point_owner, minlength=len(scored))
+    )
+
+    scaled_similarity = np.clip((similarity - SIMILARITY_FLOOR) / (1.0 - SIMILARITY_FLOOR), 0.0, 1.0)
+    scores = 100.0 * (0.5 * scaled_similarity + 0.5 * coverage)
+
+    for owner, question_index in enumerate(scored):
+        members = np.flatnonzero(point_owner == owner)
+        results[question_index] = {
+            "similarity": float(similarity[owner]),
+            "coverage": float(coverage[owner]),
+            "score": float(scores[owner]),
+            "key_points": len(members),
+            "covered_points": int(covered[members].sum()),
+            "missed_points": [points[i] for i in members if not covered[i]],
+        }
+    return results
+
+
+def summarize_scores(results):
+    """Interview-level numbers for the performance summary; None when nothing was scored"""
+    scored = [result for result in results if result is not None]
+    if not scored:
+        return None
+    weak = [i for i, result in enumerate(results) if result is not None and result["coverage"] < WEAK_COVERAGE]
+    return {
+        "overall": sum(result["score"] for result in scored) / len(scored),
+        "similarity": sum(result["similarity"] for result in scored) / len(scored),
+        "coverage": sum(result["coverage"] for result in scored) / len(scored),
+        "scored_questions": len(scored),
+        "weak_questions": weak,
+        "growth_areas": len(weak),
+    }
@@ -0,0 +1,218 @@
+"""Per-call inference telemetry for the interview simulator.
+
+Every model call records its prompt and generated token counts plus the time
+spent queueing, tokenizing, generating and decoding. Fallback responses are
+recorded too, so it is visible how often users never saw model output.
+Result-cache hits are only counted; they ran no model, so they stay out of the
+latency percentiles and histograms.
+
+Two views are kept per prompt kind (question, expected_answer, feedback):
+a rolling window for the sidebar percentiles, and lifetime histograms/counters
+that ``TelemetryExporter`` writes as Prometheus text or JSON.
+"""
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+
+# first_token_ms is only recorded by streamed calls; the others leave it None
+TIMING_FIELDS = ("queue_ms", "tokenize_ms", "generate_ms", "decode_ms", "total_ms", "first_token_ms")
+TOKEN_FIELDS = ("prompt_tokens", "generated_tokens")
+# Voice answers: seconds of audio per transcribed segment and transcription time / audio time
+SPEECH_FIELDS = ("audio_ms", "rtf")
+# Speculative decoding: share of draft tokens the large model accepted
+SPECULATIVE_FIELDS = ("acceptance_rate",)
+
+# Upper bounds (ms) of the latency histogram buckets
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)]
+
+
+class InferenceTelemetry:
+    """Thread-safe collector of per-call inference records"""
+
+    def __init__(self, window=500):
+        self.window = max(1, int(window))
+        self._lock = threading.Lock()
+        self._recent = defaultdict(lambda: deque(maxlen=self.window))
+        # Lifetime aggregates for export
+        self._calls = defaultdict(int)
+        self._fallbacks = defaultdict(int)
+        self._cache_hits = defaultdict(int)
+        self._tokens = defaultdict(lambda: dict.fromkeys(TOKEN_FIELDS, 0))
+        self._audio_ms = defaultdict(float)
+        self._histograms = defaultdict(
+            lambda: {field: {"buckets": [0] * len(LATENCY_BUCKETS_MS), "sum": 0.0, "count": 0}
+                     for field in TIMING_FIELDS}
+        )
+
+    def record(self, kind, **fields):
+        """Record one model call; unknown fields are kept in the rolling window only"""
+        kind = kind or "other"
+        fields["fallback"] = False
+        fields["at"] = time.time()
+        with self._lock:
+            self._recent[kind].append(fields)
+            self._calls[kind] += 1
+            for field in TOKEN_FIELDS:
+                self._tokens[kind][field] += int(fields.get(field) or 0)
+            self._audio_ms[kind] += fields.get("audio_ms") or 0.0
+            for field in TIMING_FIELDS:
+                value = fields.get(field)
+                if value is None:
+                    continue
+                histogram = self._histograms[kind][field]
+                for i, bound in enumerate(LATENCY_BUCKETS_MS):
+                    if value <= bound:
+                        histogram["buckets"][i] += 1
+                histogram["sum"] += value
+                histogram["count"] += 1
+
+    def record_fallback(self, kind, reason=""):
+        """Record a response served from fallback content instead of the model"""
+        kind = kind or "other"
+        with self._lock:
+            self._recent[kind].append({"fallback": True, "reason": reason, "at": time.time()})
+            self._fallbacks[kind] += 1
+
+    def record_cache_hit(self, kind):
+        """Count a response served from the result cache without a model call"""
+        with self._lock:
+            self._cache_hits[kind or "other"] += 1
+
+    def snapshot(self):
+        """Rolling-window summary per kind: counts, fallback share and p50/p95 per field"""
+        with self._lock:
+            recent = {kind: list(records) for kind, records in self._recent.items()}
+            cache_hits = dict(self._cache_hits)
+        summary = {}
+        for kind in sorted(set(recent) | set(cache_hits)):
+            records = recent.get(kind, [])
+            calls = [r for r in records if not r["fallback"]]
+            entry = {
+                "calls": len(calls),
+                "fallbacks": len(records) - len(calls),
+                # Decodes stopped early by validation, and how many of those were resampled
+                "rejected": sum(1 for r in calls if r.get("rejected")),
+                "resampled": sum(1 for r in calls if r.get("resampled")),
+                # Served from the result cache without a decode (since process start)
+                "cached": cache_hits.get(kind, 0),
+            }
+            for field in TIMING_FIELDS + TOKEN_FIELDS + SPEECH_FIELDS + SPECULATIVE_FIELDS:
+                values = [r[field] for r in calls if r.get(field) is not None]
+                if values:
+                    entry[field] = {
+                        "p50": _percentile(values, 50),
+                        "p95": _percentile(values, 95),
+                        "mean": sum(values) / len(values),
+                    }
+            summary[kind] = entry
+        return summary
+
+    def lifetime(self):
+        """Monotonic totals and cumulative histograms since process start"""
+        with self._lock:
+            kinds = sorted(set(self._calls) | set(self._fallbacks) | set(self._cache_hits))
+            return {
+                kind: {
+                    "calls": self._calls[kind],
+                    "fallbacks": self._fallbacks[kind],
+                    "cache_hits": self._cache_hits[kind],
+                    "tokens": dict(self._tokens[kind]),
+                    "audio_seconds": self._audio_ms[kind] / 1000.0,
+                    "histograms": {
+                        field: {
+                            "buckets": list(histogram["buckets"]),
+                            "sum": histogram["sum"],
+                            "count": histogram["count"],
+                        }
+                        for field, histogram in self._histograms[kind].items()
+                    },
+                }
+                for kind in kinds
+            }
+
+    # --- Export formats ---
+    def to_prometheus(self):
+        lines = []
+        lifetime = self.lifetime()
+
+        def metric(name, metric_type, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        metric("interview_inference_calls_total", "counter", "Model calls per prompt kind")
+        for kind, data in lifetime.items():
+            lines.append(f'interview_inference_calls_total{{kind="{kind}"}} {data["calls"]}')
+        metric("interview_inference_fallbacks_total", "counter", "Responses served from fallback content")
+        for kind, data in lifetime.items():
+            lines.append(f'interview_inference_fallbacks_total{{kind="{kind}"}} {data["fallbacks"]}')
+        metric("interview_inference_cache_hits_total", "counter", "Responses served from the result cache")
+        for kind, data in lifetime.items():
+            lines.append(f'interview_inference_cache_hits_total{{kind="{kind}"}} {data["cache_hits"]}')
+        for field in TOKEN_FIELDS:
+            name = f"interview_inference_{field}_total"
+            metric(name, "counter", f"Sum of {field.replace('_', ' ')}")
+            for kind, data in lifetime.items():
+                lines.append(f'{name}{{kind="{kind}"}} {data["tokens"][field]}')
+        # Real-time factor of transcription = rate of total_seconds_sum / rate of this
+        metric("interview_inference_audio_seconds_total", "counter", "Seconds of audio transcribed")
+        for kind, data in lifetime.items():
+            lines.append(f'interview_inference_audio_seconds_total{{kind="{kind}"}} {data["audio_seconds"]:.3f}')
+        for field in TIMING_FIELDS:
+            name = f"interview_inference_{field[:-3]}_seconds"
+            metric(name, "histogram", f"{field[:-3].replace('_', ' ').capitalize()} time per model call")
+            for kind, data in lifetime.items():
+                histogram = data["histograms"][field]
+                for bound, count in zip(LATENCY_BUCKETS_MS, histogram["buckets"]):
+                    lines.append(f'{name}_bucket{{kind="{kind}",le="{bound / 1000:g}"}} {count}')
+                lines.append(f'{name}_bucket{{kind="{kind}",le="+Inf"}} {histogram["count"]}')
+                lines.append(f'{name}_sum{{kind="{kind}"}} {histogram["sum"] / 1000:.6f}')
+                lines.append(f'{name}_count{{kind="{kind}"}} {histogram["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def to_json(self):
+        return json.dumps(
+            {"generated_at": time.time(), "rolling": self.snapshot(), "lifetime": self.lifetime()},
+            indent=2,
+        )
+
+
+class TelemetryExporter:
+    """Periodically writes telemetry to a file; `.json` paths get JSON, anything else Prometheus text"""
+
+    def __init__(self, telemetry, path, interval=15.0):
+        self.telemetry = telemetry
+        self.path = path
+        self.interval = interval
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, name="telemetry-exporter", daemon=True)
+        self._thread.start()
+
+    def write(self):
+        content = self.telemetry.to_json() if self.path.endswith(".json") else self.telemetry.to_prometheus()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".telemetry.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write()
+                self.last_error = None
+            except OSError as e:
+                self.last_error = e
@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+
+import pytest
+
+# The modules live at the repository root, next to app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeClock:
+    """Stands in for time.monotonic; tests move `now` forward by hand"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class _ClockedTime:
+    """The time module as seen by one module under test, with monotonic() replaced"""
+
+    def __init__(self, clock):
+        self.monotonic = clock
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+@pytest.fixture
+def clock(request, monkeypatch):
+    """A FakeClock behind `time` in the test module's CLOCKED_MODULES only
+
+    Patching time.monotonic itself would also stop the clock for background
+    threads (schedulers, refillers) that happen to run during the test.
+    """
+    clock = FakeClock()
+    for module in request.module.CLOCKED_MODULES:
+        monkeypatch.setattr(module, "time", _ClockedTime(clock))
+    return clock
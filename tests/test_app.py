@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+testing = pytest.importorskip("streamlit.testing.v1")
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+ANSWER = "I would put a token bucket per API key in Redis and return 429 with Retry-After once it is empty."
+
+
+@pytest.fixture
+def app(tmp_path):
+    at = testing.AppTest.from_file(APP_PATH, default_timeout=60)
+    # A model that cannot load: the interview runs on the built-in questions and feedback
+    at.secrets["model_size"] = str(tmp_path / "missing-model")
+    at.secrets["question_bank_path"] = str(tmp_path / "question_bank.json")
+    at.secrets["telemetry_export_path"] = ""
+    at.secrets["transcript_db_path"] = ""
+    return at
+
+
+def start_interview(at, questions):
+    at.run()
+    at.sidebar.number_input[0].set_value(questions)
+    next(b for b in at.sidebar.button if b.label == "Start Interview").click().run()
+    assert not at.exception
+
+
+def submit_answer(at, index, answer=ANSWER):
+    at.text_area(key=f"answer_{index}").input(answer)
+    next(b for b in at.button if b.label == "Submit Answer").click().run()
+    assert not at.exception
+
+
+def test_submitting_an_answer_moves_to_the_next_question(app):
+    start_interview(app, questions=2)
+    submit_answer(app, 0)
+
+    session = app.session_state["interview"]
+    assert session.current_q == 1
+    assert not session.finished
+    assert session.answers[0] == ANSWER
+    # The full-run mark is cleared again, so a later fragment rerun is recognized as one
+    assert app.session_state["interview_full_run"] is False
+
+
+def test_answering_every_question_finishes_the_interview(app):
+    start_interview(app, questions=2)
+    submit_answer(app, 0)
+    submit_answer(app, 1)
+
+    assert app.session_state["interview"].finished
@@ -0,0 +1,77 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+import inference  # noqa: E402
+from inference import CircuitBreaker  # noqa: E402
+
+# Modules whose time.monotonic the `clock` fixture replaces
+CLOCKED_MODULES = (inference,)
+
+
+def tripped_breaker(clock):
+    breaker = CircuitBreaker(max_queue_depth=4, max_latency_ms=1000, recovery_latency_ms=200, cooldown=30)
+    assert not breaker.allow(queue_depth=4)
+    assert breaker.state == "open"
+    return breaker
+
+
+def test_trips_on_queue_depth_and_latency(clock):
+    breaker = CircuitBreaker(max_queue_depth=4, max_latency_ms=1000)
+    assert breaker.allow(queue_depth=3)
+    for _ in range(3):
+        breaker.record_latency(5000)
+    assert not breaker.allow(queue_depth=0)
+    assert (breaker.state, breaker.trips) == ("open", 1)
+
+
+def test_stays_open_during_cooldown(clock):
+    breaker = tripped_breaker(clock)
+    clock.now += 29
+    assert not breaker.allow(queue_depth=0)
+    assert breaker.state == "open"
+
+
+def test_half_open_admits_a_single_probe(clock):
+    breaker = tripped_breaker(clock)
+    clock.now += 30
+    assert breaker.allow(queue_depth=0)
+    assert breaker.state == "half_open"
+    assert not breaker.allow(queue_depth=0)
+
+
+def test_recovered_probe_closes(clock):
+    breaker = tripped_breaker(clock)
+    clock.now += 30
+    assert breaker.allow(queue_depth=0)
+    breaker.record_latency(150)
+    assert breaker.state == "closed"
+    assert breaker.allow(queue_depth=0)
+
+
+def test_slow_probe_reopens_even_below_the_trip_latency(clock):
+    breaker = tripped_breaker(clock)
+    clock.now += 30
+    assert breaker.allow(queue_depth=0)
+    # Between recovery_latency_ms and max_latency_ms: not recovered
+    breaker.record_latency(500)
+    assert (breaker.state, breaker.trips) == ("open", 2)
+    assert not breaker.allow(queue_depth=0)
+
+
+def test_lost_probe_is_replaced_after_a_cooldown(clock):
+    breaker = tripped_breaker(clock)
+    clock.now += 30
+    assert breaker.allow(queue_depth=0)
+    clock.now += 29
+    assert not breaker.allow(queue_depth=0)
+    clock.now += 1
+    assert breaker.allow(queue_depth=0)
+
+
+def test_full_queue_does_not_use_up_the_probe(clock):
+    breaker = tripped_breaker(clock)
+    clock.now += 30
+    assert not breaker.allow(queue_depth=4)
+    assert breaker.allow(queue_depth=0)
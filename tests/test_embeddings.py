@@ -0,0 +1,103 @@
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+torch = pytest.importorskip("torch")
+
+from embeddings import EmbeddingIndex, encode_mean_pooled, mmr_select, near_duplicate_mask  # noqa: E402
+
+PAD = 0
+
+
+def unit(*rows):
+    vectors = np.asarray(rows, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class CharTokenizer:
+    """One id per character, right-padded with PAD"""
+
+    def __call__(self, texts, return_tensors="pt", padding=True, truncation=True, max_length=None):
+        width = max(len(text) for text in texts)
+        ids = [[ord(c) for c in text] + [PAD] * (width - len(text)) for text in texts]
+        mask = [[1] * len(text) + [0] * (width - len(text)) for text in texts]
+        return {"input_ids": torch.tensor(ids), "attention_mask": torch.tensor(mask)}
+
+
+class CharEncoder:
+    """Hidden state per position: a one-hot of the character; padding gets a large value that must not leak"""
+
+    device = torch.device("cpu")
+
+    def get_encoder(self):
+        return self
+
+    def __call__(self, input_ids, attention_mask):
+        hidden = torch.nn.functional.one_hot(input_ids % 8, 8).float()
+        hidden[input_ids == PAD] = 100.0
+        return SimpleNamespace(last_hidden_state=hidden)
+
+
+def test_mean_pooling_ignores_padding():
+    tokenizer, model = CharTokenizer(), CharEncoder()
+    alone = encode_mean_pooled(tokenizer, model, ["ab"])
+    # Batched with a longer text, "ab" is padded; the result must not change
+    batched = encode_mean_pooled(tokenizer, model, ["a much longer text", "ab"], batch_size=2)
+    np.testing.assert_allclose(batched[1], alone[0], atol=1e-6)
+    np.testing.assert_allclose(np.linalg.norm(batched, axis=1), 1.0, atol=1e-6)
+
+
+def test_mean_pooling_keeps_the_input_order():
+    tokenizer, model = CharTokenizer(), CharEncoder()
+    texts = ["abcdef", "a", "abc"]
+    together = encode_mean_pooled(tokenizer, model, texts, batch_size=2)
+    one_by_one = np.concatenate([encode_mean_pooled(tokenizer, model, [text]) for text in texts])
+    np.testing.assert_allclose(together, one_by_one, atol=1e-6)
+
+
+def test_near_duplicates_keep_the_first_of_each_pair():
+    vectors = unit([1, 0, 0], [0, 1, 0], [1, 0.01, 0])
+    assert near_duplicate_mask(vectors).tolist() == [False, False, True]
+    # Swapping the pair flags the other one: the mask treats both directions alike
+    assert near_duplicate_mask(vectors[[2, 1, 0]]).tolist() == [False, False, True]
+
+
+def test_near_duplicate_threshold_is_inclusive():
+    vectors = unit([1, 0], [0.6, 0.8])
+    # Their cosine similarity is exactly 0.6
+    assert near_duplicate_mask(vectors, threshold=0.6).tolist() == [False, True]
+    assert near_duplicate_mask(vectors, threshold=0.61).tolist() == [False, False]
+
+
+def test_near_duplicates_of_existing_rows_are_flagged():
+    existing = unit([0, 0, 1])
+    vectors = unit([0, 0.05, 1], [1, 0, 0])
+    assert near_duplicate_mask(vectors, existing=existing).tolist() == [True, False]
+
+
+def test_mmr_picks_relevance_first_then_diversity():
+    vectors = unit([1, 0, 0], [0.99, 0.14, 0], [0, 1, 0])
+    relevance = [1.0, 0.95, 0.5]
+    # Pure relevance takes the near-duplicate second
+    assert mmr_select(vectors, 2, relevance, diversity=0.0) == [0, 1]
+    # With diversity, the orthogonal row beats the near-duplicate
+    assert mmr_select(vectors, 2, relevance, diversity=0.5) == [0, 2]
+
+
+def test_mmr_avoids_rows_close_to_existing_ones():
+    vectors = unit([1, 0], [0, 1])
+    assert mmr_select(vectors, 1, existing=unit([1, 0.05])) == [1]
+    assert mmr_select(vectors, 5) == [0, 1]
+    assert mmr_select(vectors, 0) == []
+
+
+def test_index_grows_and_finds_near_rows():
+    index = EmbeddingIndex(capacity=1)
+    assert index.max_similarity(unit([1, 0])).tolist() == [-1.0]
+    index.add(["x", "y"], unit([1, 0], [0, 1]))
+    index.add(["xy"], unit([1, 1]))
+    assert len(index) == 3
+    assert index.keys == ["x", "y", "xy"]
+    np.testing.assert_allclose(index.max_similarity(unit([1, 0], [-1, 0])), [1.0, 0.0], atol=1e-6)
+    assert index.contains_near(unit([1, 0], [-1, 0])).tolist() == [True, False]
@@ -0,0 +1,127 @@
+import json
+from concurrent.futures import Future
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import grade  # noqa: E402
+
+
+class FakeScheduler:
+    """Answers every prompt at once and remembers how many it was given"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def submit_many(self, prompts, **params):
+        futures = []
+        for prompt in prompts:
+            self.prompts.append(prompt)
+            future = Future()
+            future.set_result("Use a token bucket. Return HTTP 429.")
+            futures.append(future)
+        return futures
+
+    def embed(self, texts):
+        vectors = np.ones((len(texts), 4))
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def metrics(self):
+        return {"batches": 0, "avg_batch_size": 0.0}
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = FakeScheduler()
+    monkeypatch.setattr(grade, "create_scheduler", lambda args: scheduler)
+    return scheduler
+
+
+def write_records(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps({"id": i, "question": f"Question {i}?", "answer": f"Answer {i}",
+                                "expected_answer": "Use a token bucket"}) + "\n")
+
+
+def graded_keys(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["key"] for line in f]
+
+
+def test_limit_and_resume_grade_each_record_once(tmp_path, scheduler, capsys):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_records(source, 5)
+
+    grade.main([str(source), str(output), "--limit", "2", "--window", "1"])
+    assert sorted(graded_keys(output)) == ["0", "1"]
+    capsys.readouterr()
+
+    grade.main([str(source), str(output)])
+    assert sorted(graded_keys(output)) == ["0", "1", "2", "3", "4"]
+    # One feedback prompt per record across both runs; no expected answers were generated
+    assert len(scheduler.prompts) == 5
+    summary = json.loads(capsys.readouterr().out)
+    assert (summary["graded"], summary["skipped_already_graded"]) == (3, 2)
+
+
+def test_partial_last_line_is_dropped_and_regraded(tmp_path, scheduler):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_records(source, 3)
+    grade.main([str(source), str(output), "--limit", "2"])
+    with open(output, "a", encoding="utf-8") as f:
+        f.write('{"key": "2", "feedb')
+
+    assert grade.read_done(str(output)) == {"0", "1"}
+    grade.main([str(source), str(output)])
+    assert sorted(graded_keys(output)) == ["0", "1", "2"]
+
+
+def test_invalid_records_are_skipped_and_keyed_by_line(tmp_path, scheduler):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    source.write_text(
+        "not json\n"
+        '{"question": "Q?"}\n'
+        "\n"
+        '{"question": "Why cache?", "answer": "Latency"}\n',
+        encoding="utf-8",
+    )
+    errors = []
+    assert [line for line, _ in grade.read_records(str(source), set(), errors)] == [4]
+    assert [error["line"] for error in errors] == [1, 2]
+
+    grade.main([str(source), str(output)])
+    (result,) = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert result["key"] == "line:4"
+    assert result["expected_answer_generated"]
+
+
+def test_question_and_answer_must_be_non_empty_strings(tmp_path):
+    source = tmp_path / "in.jsonl"
+    source.write_text(
+        '{"question": "Why cache?", "answer": null}\n'
+        '{"question": 42, "answer": "Latency"}\n'
+        '{"question": "Why cache?", "answer": "   "}\n'
+        '["Why cache?", "Latency"]\n'
+        '{"question": "Why cache?", "answer": "Latency", "expected_answer": 5}\n'
+        '{"question": "Why cache?", "answer": "Latency", "track": 3}\n'
+        '{"question": "Why cache?", "answer": "Latency", "expected_answer": null, "track": "Data Science"}\n',
+        encoding="utf-8",
+    )
+    errors = []
+    assert [line for line, _ in grade.read_records(str(source), set(), errors)] == [7]
+    assert errors == [
+        {"line": 1, "error": "needs non-empty string 'answer'"},
+        {"line": 2, "error": "needs non-empty string 'question'"},
+        {"line": 3, "error": "needs non-empty string 'answer'"},
+        {"line": 4, "error": "not a JSON object"},
+        {"line": 5, "error": "'expected_answer' must be a string"},
+        {"line": 6, "error": "'track' must be a string"},
+    ]
+
+
+def test_output_lines_without_a_key_are_not_done(tmp_path):
+    output = tmp_path / "out.jsonl"
+    output.write_text('{"key": "1", "feedback": "Good"}\n{"note": "added by hand"}\n[1, 2]\n', encoding="utf-8")
+    assert grade.read_done(str(output)) == {"1"}
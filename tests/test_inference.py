@@ -0,0 +1,431 @@
+import threading
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from inference import GenerationRequest, InferenceScheduler  # noqa: E402
+from telemetry import InferenceTelemetry  # noqa: E402
+from result_cache import ResultCache  # noqa: E402
+
+PAD, EOS = 0, 1
+
+
+class WordTokenizer:
+    """Tokenizer stand-in: one id per whitespace-separated word, </s> appended"""
+
+    pad_token_id = PAD
+    eos_token_id = EOS
+
+    def __init__(self):
+        self.vocab = {}
+        self.words = {}
+
+    def _ids(self, text):
+        ids = []
+        for word in text.split():
+            if word not in self.vocab:
+                self.vocab[word] = len(self.vocab) + 2
+                self.words[self.vocab[word]] = word
+            ids.append(self.vocab[word])
+        return ids
+
+    def __call__(self, text, add_special_tokens=True, max_length=None, truncation=False):
+        texts = [text] if isinstance(text, str) else text
+        special = [EOS] if add_special_tokens else []
+        encoded = [self._ids(item) + special for item in texts]
+        return {"input_ids": encoded[0] if isinstance(text, str) else encoded}
+
+    def pad(self, encoded, return_tensors="pt"):
+        rows = encoded["input_ids"]
+        width = max(len(ids) for ids in rows)
+        return {
+            "input_ids": torch.tensor([ids + [PAD] * (width - len(ids)) for ids in rows]),
+            "attention_mask": torch.tensor([[1] * len(ids) + [0] * (width - len(ids)) for ids in rows]),
+        }
+
+    def __len__(self):
+        return len(self.vocab) + 2
+
+    def convert_ids_to_tokens(self, ids):
+        return [self.words.get(i, "") for i in ids]
+
+    def decode(self, ids, skip_special_tokens=True):
+        return " ".join(self.words[int(i)] for i in ids if int(i) not in (PAD, EOS))
+
+    def batch_decode(self, rows, skip_special_tokens=True):
+        return [self.decode(ids) for ids in rows]
+
+
+class EchoModel:
+    """Model stand-in whose generate() answers each prompt with the prompt itself"""
+
+    device = torch.device("cpu")
+
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, input_ids, attention_mask, streamer=None, stopping_criteria=None, pad_token_id=None,
+                 **params):
+        self.calls.append((input_ids.shape[0], params))
+        replies = [
+            [PAD] + [token for token, real in zip(row, mask) if real and token != EOS] + [EOS]
+            for row, mask in zip(input_ids.tolist(), attention_mask.tolist())
+        ]
+        if streamer is not None:
+            # Like generate(): the decoder start token first, then one token per step
+            for token in replies[0][:-1]:
+                streamer.put(torch.tensor([token]))
+            streamer.end()
+        width = max(len(reply) for reply in replies)
+        return torch.tensor([reply + [PAD] * (width - len(reply)) for reply in replies])
+
+
+class StalledModel(EchoModel):
+    """Holds every generate() until `release` is set"""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def generate(self, *args, **kwargs):
+        self.entered.set()
+        self.release.wait(10)
+        return super().generate(*args, **kwargs)
+
+
+class ScriptedModel(EchoModel):
+    """Decodes scripted replies one token per step, consulting the stopping criteria like generate()
+
+    `script` holds one reply per generate() call, either a string for every row
+    or a dict from prompt to reply.
+    """
+
+    def __init__(self, tokenizer, script):
+        super().__init__()
+        self.tokenizer = tokenizer
+        self.script = script
+        # Decode steps run per generate() call
+        self.generated = []
+        # Register every reply word up front, so the scheduler's terminal-token scan sees them
+        for replies in script:
+            for reply in replies.values() if isinstance(replies, dict) else [replies]:
+                tokenizer(reply)
+
+    def generate(self, input_ids, attention_mask, streamer=None, stopping_criteria=None, pad_token_id=None,
+                 **params):
+        replies = self.script[len(self.calls)]
+        self.calls.append((input_ids.shape[0], params))
+        prompts = [self.tokenizer.decode(row) for row in input_ids.tolist()]
+        targets = [
+            self.tokenizer(replies[p] if isinstance(replies, dict) else replies, add_special_tokens=False)["input_ids"]
+            + [EOS]
+            for p in prompts
+        ]
+        rows = [[PAD] for _ in targets]
+        done = [False] * len(rows)
+        if streamer is not None:
+            streamer.put(torch.tensor([PAD]))
+        while not all(done):
+            for i, target in enumerate(targets):
+                token = PAD if done[i] else target[len(rows[i]) - 1]
+                rows[i].append(token)
+                done[i] = done[i] or token == EOS
+            if streamer is not None and rows[0][-1] not in (PAD, EOS):
+                streamer.put(torch.tensor([rows[0][-1]]))
+            for criteria in stopping_criteria or []:
+                stop = criteria(torch.tensor(rows), None)
+                done = [a or bool(b) for a, b in zip(done, stop.tolist())] if torch.is_tensor(stop) else (
+                    [True] * len(rows) if stop else done
+                )
+        if streamer is not None:
+            streamer.end()
+        self.generated.append(len(rows[0]) - 1)
+        return torch.tensor(rows)
+
+
+def new_scheduler(model=None, **kwargs):
+    return InferenceScheduler(WordTokenizer(), model or EchoModel(), **kwargs)
+
+
+def batch_prompts(batches):
+    return [[request.prompt for request, _ in batch] for batch in batches]
+
+
+def test_prompts_submitted_together_share_one_batch():
+    model = EchoModel()
+    scheduler = new_scheduler(model, max_batch_size=8)
+    prompts = ["what is a mutex", "explain consistent hashing", "why use a queue"]
+    assert scheduler.generate_many(prompts, timeout=10) == prompts
+    assert [size for size, _ in model.calls] == [3]
+    assert scheduler.metrics()["batches"] == 1
+
+
+def test_batches_are_split_by_parameters_kind_and_length():
+    scheduler = new_scheduler(length_bucket=4)
+    params = scheduler._generate_params(150, 0.7, None, {})
+    hotter = scheduler._generate_params(150, 0.9, None, {})
+    requests = [
+        GenerationRequest("short one", params),
+        GenerationRequest("a much longer prompt than that", params),
+        GenerationRequest("short two", params, kind="feedback"),
+        GenerationRequest("short three", hotter),
+        GenerationRequest("short four", params),
+    ]
+    assert batch_prompts(scheduler._group(requests)) == [
+        ["short one", "short four"],
+        ["a much longer prompt than that"],
+        ["short two"],
+        ["short three"],
+    ]
+
+
+def test_groups_are_capped_at_the_batch_size():
+    scheduler = new_scheduler(max_batch_size=2)
+    params = scheduler._generate_params(150, 0.7, None, {})
+    requests = [GenerationRequest(f"prompt {i}", params) for i in range(5)]
+    assert [len(batch) for batch in scheduler._group(requests)] == [2, 2, 1]
+
+
+def test_a_failed_batch_fails_every_future_in_it():
+    class BrokenModel(EchoModel):
+        def generate(self, *args, **kwargs):
+            raise RuntimeError("out of memory")
+
+    scheduler = new_scheduler(BrokenModel())
+    futures = scheduler.submit_many(["first prompt", "second prompt"])
+    for future in futures:
+        with pytest.raises(RuntimeError, match="out of memory"):
+            future.result(timeout=10)
+
+
+def test_stream_yields_the_text_in_chunks_outside_the_batches():
+    model = EchoModel()
+    scheduler = new_scheduler(model)
+    chunks = list(scheduler.stream("walk me through a deploy"))
+    assert len(chunks) > 1
+    assert "".join(chunks) == "walk me through a deploy"
+    assert scheduler.metrics()["batches"] == 0
+
+
+def test_stream_without_tokens_times_out():
+    model = StalledModel()
+    scheduler = new_scheduler(model)
+    try:
+        with pytest.raises(TimeoutError, match="No tokens"):
+            list(scheduler.stream("a slow prompt", first_token_timeout=0.1))
+    finally:
+        model.release.set()
+
+
+def test_streams_beyond_the_cap_wait_for_a_slot():
+    model = StalledModel()
+    scheduler = new_scheduler(model, max_concurrent_streams=1)
+    first = scheduler.stream("first stream")
+    chunks = []
+    consumer = threading.Thread(target=lambda: chunks.extend(first), daemon=True)
+    consumer.start()
+    assert model.entered.wait(10)
+    try:
+        with pytest.raises(TimeoutError, match="No stream slot"):
+            list(scheduler.stream("second stream", first_token_timeout=0.1))
+    finally:
+        model.release.set()
+    consumer.join(10)
+    assert "".join(chunks) == "first stream"
+    # The slot is free again once the first stream is done
+    assert "".join(scheduler.stream("third stream")) == "third stream"
+
+
+def test_stream_reraises_generate_errors():
+    class BrokenModel(EchoModel):
+        def generate(self, *args, **kwargs):
+            raise RuntimeError("device lost")
+
+    scheduler = new_scheduler(BrokenModel())
+    with pytest.raises(RuntimeError, match="device lost"):
+        list(scheduler.stream("any prompt"))
+
+
+def test_rejected_greedy_feedback_is_resampled():
+    tokenizer = WordTokenizer()
+    model = ScriptedModel(tokenizer, [
+        "feedback : the candidate said that a queue is a queue",
+        "clear answer , mention backpressure .",
+    ])
+    cache = ResultCache(kinds=("feedback",))
+    scheduler = InferenceScheduler(tokenizer, model, result_cache=cache)
+    assert scheduler.generate("rate my answer", kind="feedback", timeout=10) == "clear answer , mention backpressure ."
+    # The cached kind decodes greedily first; the retry has to sample to get anything new
+    assert [params["do_sample"] for _, params in model.calls] == [False, True]
+    assert cache.get("feedback", "rate my answer", {"do_sample": False, "max_length": 150}) == (
+        "clear answer , mention backpressure ."
+    )
+
+
+def test_feedback_rejected_twice_is_not_cached():
+    tokenizer = WordTokenizer()
+    rejected = "feedback : the candidate said that a queue is a queue"
+    model = ScriptedModel(tokenizer, [rejected, rejected])
+    cache = ResultCache(kinds=("feedback",))
+    scheduler = InferenceScheduler(tokenizer, model, result_cache=cache)
+    assert scheduler.generate("rate my answer", kind="feedback", timeout=10) == ""
+    assert len(model.calls) == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_futures_carry_the_prompt_length_of_the_single_encode():
+    scheduler = new_scheduler()
+    futures = scheduler.submit_many(["what is a mutex", "why use a queue at all"])
+    assert [future.result(timeout=10) for future in futures] == ["what is a mutex", "why use a queue at all"]
+    # The prompt words plus </s>
+    assert [future.prompt_tokens for future in futures] == [5, 7]
+    cache = scheduler.metrics()["prompt_cache"]
+    assert (cache["hits"], cache["misses"]) == (0, 2)
+
+
+def test_a_question_stops_at_its_question_mark():
+    tokenizer = WordTokenizer()
+    model = ScriptedModel(tokenizer, ["what is a mutex used for ? and then it keeps talking about locks"])
+    scheduler = InferenceScheduler(tokenizer, model)
+    assert scheduler.generate("ask about locks", kind="question", timeout=10) == "what is a mutex used for ?"
+    # Decoding ended at the seventh token instead of running to </s>
+    assert model.generated == [7]
+
+
+def test_a_rejected_sampled_question_is_resampled_hotter_once():
+    tokenizer = WordTokenizer()
+    telemetry = InferenceTelemetry()
+    model = ScriptedModel(tokenizer, [
+        "question: write an interview question for a backend role",
+        "what is a mutex used for ?",
+    ])
+    scheduler = InferenceScheduler(tokenizer, model, telemetry=telemetry)
+    assert scheduler.generate("ask about locks", temperature=0.7, kind="question", timeout=10) == (
+        "what is a mutex used for ?"
+    )
+    assert [params["temperature"] for _, params in model.calls] == [0.7, pytest.approx(0.9)]
+    # Validation stopped the first decode after six tokens
+    assert model.generated[0] == 6
+    assert telemetry.snapshot()["question"]["resampled"] == 1
+
+
+def test_a_question_rejected_twice_decodes_to_empty():
+    tokenizer = WordTokenizer()
+    rejected = "question: write an interview question for a backend role"
+    model = ScriptedModel(tokenizer, [rejected, rejected])
+    scheduler = InferenceScheduler(tokenizer, model)
+    assert scheduler.generate("ask about locks", kind="question", timeout=10) == ""
+    assert len(model.calls) == 2
+
+
+def test_a_rejected_stream_is_cut_short_and_not_cached():
+    tokenizer = WordTokenizer()
+    model = ScriptedModel(tokenizer, ["feedback : the candidate said that a queue is a queue and more"])
+    cache = ResultCache(kinds=("feedback",))
+    scheduler = InferenceScheduler(tokenizer, model, result_cache=cache)
+    chunks = scheduler.stream("rate my answer", kind="feedback")
+    text = ""
+    while True:
+        try:
+            text += next(chunks)
+        except StopIteration as stop:
+            assert stop.value is True
+            break
+    assert text.startswith("feedback :")
+    assert model.generated == [8]
+    assert len(model.calls) == 1
+    assert cache.stats()["entries"] == 0
+
+
+class CountingModule(torch.nn.Module):
+    """A module whose forward calls the speculative accounting can count"""
+
+    device = torch.device("cpu")
+
+    def forward(self, x):
+        return x
+
+
+class AssistedEchoModel(CountingModule):
+    """Echoes the prompt; with an assistant, every target pass follows a run of three drafted tokens"""
+
+    DRAFT_RUN = 3
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def generate(self, input_ids, attention_mask, streamer=None, stopping_criteria=None, pad_token_id=None,
+                 assistant_model=None, **params):
+        self.calls.append((input_ids.shape[0], assistant_model is not None))
+        replies = [
+            [PAD] + [token for token, real in zip(row, mask) if real and token != EOS] + [EOS]
+            for row, mask in zip(input_ids.tolist(), attention_mask.tolist())
+        ]
+        remaining = max(len(reply) - 2 for reply in replies)
+        while remaining > 0:
+            if assistant_model is not None:
+                for _ in range(self.DRAFT_RUN):
+                    assistant_model(input_ids)
+                remaining -= self.DRAFT_RUN
+            else:
+                remaining -= 1
+            self(input_ids)
+        width = max(len(reply) for reply in replies)
+        return torch.tensor([reply + [PAD] * (width - len(reply)) for reply in replies])
+
+
+def test_only_speculative_kinds_update_the_draft_accounting():
+    model = AssistedEchoModel()
+    telemetry = InferenceTelemetry()
+    scheduler = InferenceScheduler(
+        WordTokenizer(), model, draft_model=CountingModule(), speculative_kinds=("question",), telemetry=telemetry,
+    )
+    assert scheduler.generate("what is a mutex used for ?", kind="question", timeout=10) == (
+        "what is a mutex used for ?"
+    )
+    speculative = scheduler.metrics()["speculative"]
+    # Seven tokens in three passes: nine drafted, four accepted plus one of the target's own per pass
+    assert (speculative["sequences"], speculative["draft_tokens"], speculative["accepted_tokens"]) == (1, 9, 4)
+    assert speculative["acceptance_rate"] == pytest.approx(4 / 9)
+    assert speculative["tokens_per_target_forward"] == pytest.approx(7 / 3)
+
+    assert scheduler.generate("rate this answer about locks", kind="feedback", timeout=10) == (
+        "rate this answer about locks"
+    )
+    assert scheduler.metrics()["speculative"] == speculative
+    assert [assisted for _, assisted in model.calls] == [True, False]
+    snapshot = telemetry.snapshot()
+    assert snapshot["question"]["acceptance_rate"]["mean"] == pytest.approx(4 / 9)
+    assert "acceptance_rate" not in snapshot["feedback"]
+
+
+def test_background_requests_yield_to_interactive_ones_and_skip_the_breaker():
+    class RecordingBreaker:
+        def __init__(self):
+            self.latencies = []
+
+        def record_latency(self, latency_ms):
+            self.latencies.append(latency_ms)
+
+    model = StalledModel()
+    breaker = RecordingBreaker()
+    scheduler = new_scheduler(model, breaker=breaker, max_batch_size=2)
+    # Occupy the worker, then queue background and live work behind it
+    blocker = scheduler.submit("hold the worker")
+    assert model.entered.wait(10)
+    background = scheduler.submit_many(["top up one", "top up two", "top up three"], background=True)
+    live = scheduler.submit("a live question")
+    assert scheduler.queue_depth() == 1
+    assert scheduler.metrics()["background_queue_depth"] == 3
+    model.release.set()
+
+    assert live.result(timeout=10) == "a live question"
+    assert [future.result(timeout=10) for future in background] == ["top up one", "top up two", "top up three"]
+    assert blocker.result(timeout=10) == "hold the worker"
+    # The blocker, then the live request, then the background lane two at a time
+    assert [size for size, _ in model.calls] == [1, 1, 2, 1]
+    assert len(breaker.latencies) == 2
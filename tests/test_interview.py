@@ -0,0 +1,84 @@
+import pytest
+
+from interview import AWAITING_ANSWER, FINISHED, NEEDS_QUESTION, InterviewSession
+
+QUESTIONS = [
+    "How would you design a rate limiter for a public REST API?",
+    "How do you find a memory leak in a long-running service?",
+]
+
+
+def new_session(num_questions=2):
+    session = InterviewSession("Software Development", "Medium", num_questions)
+    session.add_questions(QUESTIONS[:num_questions], ["Token bucket.", "Heap profiles."][:num_questions])
+    return session
+
+
+def test_starts_with_a_welcome_and_needs_a_question():
+    session = InterviewSession("Software Development", "Medium", 2)
+    assert session.phase == NEEDS_QUESTION
+    assert session.needs_question
+    assert [message["role"] for message in session.conversation] == ["System"]
+    with pytest.raises(RuntimeError):
+        session.ask_next()
+
+
+def test_ask_and_answer_move_through_every_question():
+    session = new_session()
+    assert not session.needs_question
+
+    assert session.ask_next() == QUESTIONS[0]
+    assert session.phase == AWAITING_ANSWER
+    assert session.progress() == (0.0, "Question 1 of 2")
+
+    session.submit_answer("A token bucket per key.", "Good start.")
+    assert (session.phase, session.current_q) == (NEEDS_QUESTION, 1)
+    assert session.current_question == QUESTIONS[1]
+
+    session.ask_next()
+    session.submit_answer("Compare heap dumps over time.", "Nice.")
+    assert session.finished
+    assert session.phase == FINISHED
+    assert session.progress() == (1.0, "Completed 2 of 2 questions")
+    assert session.answers == ["A token bucket per key.", "Compare heap dumps over time."]
+    assert session.final_feedback and "Final Assessment" in session.conversation[-1]["message"]
+
+
+def test_transitions_out_of_order_are_rejected():
+    session = new_session()
+    with pytest.raises(RuntimeError):
+        session.submit_answer("Too early", "n/a")
+    session.ask_next()
+    with pytest.raises(RuntimeError):
+        session.ask_next()
+
+
+def test_messages_are_numbered_and_tagged_with_their_question():
+    session = new_session(num_questions=1)
+    session.ask_next()
+    session.submit_answer("An answer", "Some feedback")
+    messages = list(session.conversation)
+    assert [message["seq"] for message in messages] == list(range(len(messages)))
+    assert [message["role"] for message in messages[1:4]] == ["Interviewer", "Candidate", "Coach"]
+    assert all(message["question_id"] == 0 for message in messages[1:4])
+    assert session.history(before=2) == messages[:2]
+
+
+def test_scores_must_match_the_answers():
+    session = new_session(num_questions=1)
+    session.ask_next()
+    session.submit_answer("An answer", "Some feedback")
+    with pytest.raises(ValueError):
+        session.record_scores([])
+    session.record_scores([None])
+    assert session.scores == [None]
+
+
+def test_answer_statistics():
+    session = new_session()
+    session.ask_next()
+    session.submit_answer("word " * 30, "ok")
+    session.ask_next()
+    session.submit_answer("short", "ok")
+    assert session.average_answer_words() == 15.5
+    assert session.detailed_answers() == 1
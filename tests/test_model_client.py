@@ -0,0 +1,176 @@
+import socket
+import threading
+
+import pytest
+
+from model_client import (RemoteScheduler, recv_frame, send_frame, wait_for_model_server,
+                          worker_socket_paths)
+from result_cache import ResultCache
+
+
+class RecordingBreaker:
+    """CircuitBreaker stand-in that only keeps the latencies it is fed"""
+
+    def __init__(self):
+        self.latencies = []
+
+    def record_latency(self, latency_ms):
+        self.latencies.append(latency_ms)
+
+
+class FakeWorker:
+    """Serves one worker socket, answering every frame with `handler(conn, request)`"""
+
+    def __init__(self, path, handler):
+        self.handler = handler
+        self.release = threading.Event()
+        self.requests = []
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(path)
+        self.listener.listen()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = recv_frame(conn)
+                except (ConnectionError, OSError):
+                    return
+                self.requests.append(request)
+                self.handler(self, conn, request)
+
+    def close(self):
+        self.release.set()
+        self.listener.close()
+
+
+@pytest.fixture
+def worker(tmp_path):
+    workers = []
+
+    def start(handler):
+        workers.append(FakeWorker(str(tmp_path / "model.sock.0"), handler))
+        return str(tmp_path / "model.sock")
+
+    yield start
+    for fake in workers:
+        fake.close()
+
+
+def test_frames_round_trip_over_a_socket():
+    left, right = socket.socketpair()
+    with left, right:
+        message = {"op": "generate", "prompts": ["Ünïcode ✓", "x" * 100000], "max_len": 150}
+        sender = threading.Thread(target=send_frame, args=(left, message))
+        sender.start()
+        assert recv_frame(right) == message
+        sender.join()
+
+
+def test_a_truncated_frame_raises_connection_error():
+    left, right = socket.socketpair()
+    with right:
+        # Header announces 100 bytes, then the peer goes away after 10
+        left.sendall((100).to_bytes(4, "big") + b'{"op": "pi')
+        left.close()
+        with pytest.raises(ConnectionError):
+            recv_frame(right)
+
+
+def test_only_numbered_sockets_are_workers(tmp_path):
+    for name in ("model.sock.10", "model.sock.2", "model.sock.lock"):
+        (tmp_path / name).touch()
+    assert worker_socket_paths(str(tmp_path / "model.sock")) == [
+        str(tmp_path / "model.sock.2"), str(tmp_path / "model.sock.10"),
+    ]
+
+
+def test_waiting_for_workers_that_never_bind_times_out(tmp_path):
+    with pytest.raises(TimeoutError, match="not up within"):
+        wait_for_model_server(str(tmp_path / "model.sock"), poll_interval=0.01, timeout=0.05)
+
+
+def test_waiting_returns_the_first_workers_backend(worker):
+    def handler(fake, conn, request):
+        send_frame(conn, {"backend": {"model_name": "flan-t5-large", "runtime": "torch"}})
+
+    _, _, info = wait_for_model_server(worker(handler), poll_interval=0.01, timeout=5)
+    assert info["runtime"] == "torch × 1 workers"
+    assert info["workers"] == 1
+
+
+def test_generate_feeds_the_breaker_once_per_prompt(worker):
+    def handler(fake, conn, request):
+        send_frame(conn, {
+            "texts": [prompt.upper() for prompt in request["prompts"]],
+            "stats": [{"prompt_tokens": 3, "generated_tokens": 3, "server_ms": 5.0} for _ in request["prompts"]],
+        })
+
+    breaker = RecordingBreaker()
+    scheduler = RemoteScheduler(worker(handler), connections_per_worker=1, breaker=breaker)
+    assert scheduler.generate_many(["one", "two"], timeout=10) == ["ONE", "TWO"]
+    assert len(breaker.latencies) == 2
+    metrics = scheduler.metrics()
+    assert (metrics["requests"], metrics["batches"], metrics["queue_depth"]) == (2, 1, 0)
+
+
+def test_worker_errors_fail_the_futures(worker):
+    def handler(fake, conn, request):
+        send_frame(conn, {"error": "RuntimeError: out of memory"})
+
+    scheduler = RemoteScheduler(worker(handler), connections_per_worker=1)
+    with pytest.raises(RuntimeError, match="out of memory"):
+        scheduler.generate("one", timeout=10)
+
+
+def test_a_stream_without_tokens_times_out_and_frees_its_connection(worker):
+    def handler(fake, conn, request):
+        if request["op"] == "stream" and len(fake.requests) == 1:
+            fake.release.wait(10)
+            return
+        send_frame(conn, {"chunk": "late but fine"})
+        send_frame(conn, {"done": True})
+
+    breaker = RecordingBreaker()
+    scheduler = RemoteScheduler(worker(handler), connections_per_worker=1, breaker=breaker)
+    with pytest.raises(TimeoutError, match="No tokens"):
+        list(scheduler.stream("a slow prompt", first_token_timeout=0.1))
+    assert len(breaker.latencies) == 1
+    # The stalled connection was dropped; the slot reconnects for the next stream
+    assert list(scheduler.stream("next prompt", first_token_timeout=5)) == ["late but fine"]
+    assert len(breaker.latencies) == 2
+
+
+def test_a_stream_the_worker_rejected_is_not_cached(worker):
+    def handler(fake, conn, request):
+        send_frame(conn, {"chunk": "Your feedback:"})
+        send_frame(conn, {"done": True, "rejected": request["prompt"] == "bad answer"})
+
+    cache = ResultCache(kinds=("feedback",))
+    scheduler = RemoteScheduler(worker(handler), connections_per_worker=1, result_cache=cache)
+    assert list(scheduler.stream("bad answer", kind="feedback")) == ["Your feedback:"]
+    assert cache.stats()["entries"] == 0
+    assert list(scheduler.stream("good answer", kind="feedback")) == ["Your feedback:"]
+    assert cache.stats()["entries"] == 1
+
+
+def test_background_generations_skip_the_breaker_and_queue_depth(worker):
+    def handler(fake, conn, request):
+        send_frame(conn, {"texts": list(request["prompts"]), "stats": []})
+
+    breaker = RecordingBreaker()
+    scheduler = RemoteScheduler(worker(handler), connections_per_worker=1, breaker=breaker)
+    futures = scheduler.submit_many(["top up one", "top up two"], background=True)
+    assert scheduler.queue_depth() == 0
+    assert [future.result(timeout=10) for future in futures] == ["top up one", "top up two"]
+    assert breaker.latencies == []
+    assert scheduler.metrics()["max_queue_depth"] == 0
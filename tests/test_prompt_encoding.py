@@ -0,0 +1,104 @@
+import pytest
+
+from prompt_encoding import PromptEncoder, _trim_lengths
+from prompts import (
+    FEEDBACK_TEMPLATE, build_answer_prompt, build_feedback_prompt, build_question_prompt,
+)
+
+SAMPLE_QUESTION = "How would you design a rate limiter for a public REST API?"
+SAMPLE_ANSWER = (
+    "I'd use a token bucket per API key stored in Redis, refill it at a fixed rate, "
+    "and return 429 with a Retry-After header once the bucket is empty."
+)
+
+
+class WhitespaceTokenizer:
+    """Tokenizer stand-in: one id per whitespace-separated word, </s> (id 1) appended"""
+
+    def __init__(self):
+        self.vocab = {}
+
+    def _ids(self, text):
+        return [self.vocab.setdefault(word, len(self.vocab) + 2) for word in text.split()]
+
+    def __call__(self, text, add_special_tokens=True, max_length=None, truncation=False):
+        texts = [text] if isinstance(text, str) else text
+        special = [1] if add_special_tokens else []
+        encoded = []
+        for item in texts:
+            ids = self._ids(item)
+            if truncation and max_length is not None:
+                ids = ids[:max_length - len(special)]
+            encoded.append(ids + special)
+        return {"input_ids": encoded[0] if isinstance(text, str) else encoded}
+
+
+def sample_prompts():
+    return [
+        build_question_prompt("Software Engineering", "Medium", []),
+        build_question_prompt("Software Engineering", "Hard", [SAMPLE_QUESTION], previous_topics=["APIs"]),
+        build_question_prompt("Data Science", "Easy", [], focus="feature engineering"),
+        build_question_prompt("Data Science", "Easy", [], focus="model evaluation", style="Friendly"),
+        build_answer_prompt("Software Engineering", SAMPLE_QUESTION),
+        build_feedback_prompt(SAMPLE_QUESTION, SAMPLE_ANSWER),
+        # Empty slot and quotes inside a slot
+        build_feedback_prompt('What does "idempotent" mean?', ""),
+    ]
+
+
+@pytest.fixture(scope="module")
+def flan_t5_tokenizer():
+    transformers = pytest.importorskip("transformers")
+    pytest.importorskip("sentencepiece")
+    # Only a tokenizer already in the local cache; never wait on the network in a unit test
+    try:
+        return transformers.AutoTokenizer.from_pretrained("google/flan-t5-small", local_files_only=True)
+    except (OSError, ValueError) as e:
+        pytest.skip(f"flan-t5 tokenizer unavailable: {e}")
+
+
+def test_templates_match_whole_prompt_tokenization(flan_t5_tokenizer):
+    encoder = PromptEncoder(flan_t5_tokenizer)
+    for prompt in sample_prompts():
+        assert encoder.encode(prompt) == flan_t5_tokenizer(str(prompt)).input_ids, prompt.template.name
+
+
+def test_plain_strings_are_encoded_and_truncated():
+    tokenizer = WhitespaceTokenizer()
+    encoder = PromptEncoder(tokenizer, max_tokens=8)
+    text = "one two three four five six seven eight nine ten"
+    assert encoder.encode(text) == tokenizer(text, max_length=8, truncation=True)["input_ids"]
+
+
+def test_over_long_answer_is_trimmed_from_its_slot():
+    tokenizer = WhitespaceTokenizer()
+    short = build_feedback_prompt(SAMPLE_QUESTION, "short answer")
+    full = tokenizer(str(short))["input_ids"]
+    encoder = PromptEncoder(tokenizer, max_tokens=len(full) + 20)
+
+    long_answer = " ".join(f"word{i}" for i in range(200))
+    ids = encoder.encode(build_feedback_prompt(SAMPLE_QUESTION, long_answer))
+
+    assert len(ids) == encoder.max_tokens
+    # The instructions after the answer and the question survive; only the answer lost tokens
+    instructions = tokenizer(FEEDBACK_TEMPLATE.literals[-1])["input_ids"]
+    assert ids[-len(instructions):] == instructions
+    assert all(token in ids for token in tokenizer(SAMPLE_QUESTION, add_special_tokens=False)["input_ids"])
+    assert tokenizer("word0", add_special_tokens=False)["input_ids"][0] in ids
+    assert tokenizer("word199", add_special_tokens=False)["input_ids"][0] not in ids
+    assert encoder.stats()["trimmed"] == 1
+
+
+def test_repeated_prompts_hit_the_cache():
+    encoder = PromptEncoder(WhitespaceTokenizer())
+    prompt = build_answer_prompt("Software Engineering", SAMPLE_QUESTION)
+    first = encoder.encode(prompt)
+    assert encoder.encode_many([prompt, prompt]) == [first, first]
+    stats = encoder.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+
+
+def test_trim_lengths_cuts_the_longest_slots_first():
+    assert _trim_lengths([10, 100, 5], 40) == [10, 25, 5]
+    assert _trim_lengths([30, 30], 40) == [20, 20]
+    assert _trim_lengths([3, 4], 10) == [3, 4]
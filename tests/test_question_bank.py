@@ -0,0 +1,107 @@
+import time
+
+from question_bank import QuestionBank, QuestionBankRefiller, bank_key, is_valid_question, parse_bank_key
+
+KEY = bank_key("Software Development", "Medium", "Professional")
+OTHER = bank_key("Data Science", "Easy", "Friendly")
+ANSWER = "Use a token bucket per client."
+
+
+def questions(count, topic="caching"):
+    return [f"How would you approach {topic} problem number {i}?" for i in range(count)]
+
+
+def test_keys_round_trip_and_bad_questions_are_rejected():
+    assert parse_bank_key(KEY) == ("Software Development", "Medium", "Professional")
+    assert is_valid_question(questions(1)[0], ANSWER)
+    assert not is_valid_question("Too short?", ANSWER)
+    assert not is_valid_question("Interview question for a senior engineer role?", ANSWER)
+    assert not is_valid_question(questions(1)[0], "No.")
+
+
+def test_duplicates_are_skipped_and_pools_are_per_key(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.json"), pool_target=5)
+    assert bank.add_many(KEY, questions(3), [ANSWER] * 3) == 3
+    # Same question up to case and punctuation
+    assert bank.add_many(KEY, [questions(1)[0].upper().rstrip("?")], [ANSWER]) == 0
+    assert bank.add_many(OTHER, questions(1), [ANSWER]) == 1
+    assert (bank.pool_size(KEY), bank.deficit(KEY)) == (3, 2)
+    assert bank.keys() == sorted([KEY, OTHER])
+
+
+def test_take_serves_fresh_questions_first_and_marks_them_used(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.json"))
+    bank.add_many(KEY, questions(1, "served"), [ANSWER], used=True)
+    bank.add_many(KEY, questions(2), [ANSWER] * 2)
+    assert bank.pool_size(KEY) == 2
+
+    assert [q for q, _ in bank.take(KEY, 2)] == questions(2)
+    assert bank.pool_size(KEY) == 0
+    # Everything has been served now; the longest unused comes back first
+    assert [q for q, _ in bank.take(KEY, 1)] == questions(1, "served")
+
+
+def test_take_only_marks_accepted_pairs(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.json"))
+    bank.add_many(KEY, questions(4), [ANSWER] * 4)
+    pairs = bank.take(KEY, 2, accept=lambda batch: [pair for pair in batch if pair[0].endswith(("1?", "3?"))])
+    assert [q for q, _ in pairs] == [questions(4)[1], questions(4)[3]]
+    assert bank.pool_size(KEY) == 2
+
+
+def test_bank_is_bounded_and_survives_a_restart(tmp_path):
+    path = str(tmp_path / "bank.json")
+    bank = QuestionBank(path, max_entries=3)
+    bank.add_many(KEY, questions(5), [ANSWER] * 5)
+    assert bank.questions(KEY) == questions(5)[2:]
+
+    reloaded = QuestionBank(path, max_entries=2)
+    assert reloaded.questions(KEY) == questions(5)[3:]
+    assert reloaded.stats() == {"entries": 2, "max_entries": 2, "fresh": {KEY: 2}}
+
+
+def test_refiller_backs_off_a_key_whose_deficit_never_closes(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.json"), pool_target=2)
+    bank.add_many(KEY, questions(1), [ANSWER], used=True)
+    calls = {KEY: 0, OTHER: 0}
+
+    def fill(key, count):
+        calls[key] += 1
+        if key == OTHER:
+            return questions(count, "queues"), [ANSWER] * count
+        # Only the question that is already banked comes back
+        return questions(1), [ANSWER]
+
+    refiller = QuestionBankRefiller(bank, fill, idle_interval=0.08)
+    refiller.request(KEY)
+    time.sleep(0.6)
+    # 20ms, 40ms, 80ms, ... apart instead of every 20ms
+    assert 3 <= calls[KEY] <= 7
+    # A key that does not close its deficit does not hold up the others
+    refiller.request(OTHER)
+    deadline = time.monotonic() + 5
+    while bank.deficit(OTHER) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert bank.deficit(OTHER) == 0
+
+
+def test_refiller_only_tops_up_requested_keys(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.json"), pool_target=2)
+    bank.add_many(KEY, questions(1), [ANSWER], used=True)
+    bank.add_many(OTHER, questions(1), [ANSWER], used=True)
+    filled = []
+
+    def fill(key, count):
+        filled.append(key)
+        return questions(count, key.split("|")[0]), [ANSWER] * count
+
+    refiller = QuestionBankRefiller(bank, fill, idle_interval=0.05)
+    time.sleep(0.2)
+    # Banked keys from earlier runs are not regenerated on start
+    assert filled == []
+    refiller.request(OTHER)
+    deadline = time.monotonic() + 5
+    while bank.deficit(OTHER) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert set(filled) == {OTHER}
+    assert bank.deficit(KEY) == 2
@@ -0,0 +1,127 @@
+from concurrent.futures import Future
+
+import result_cache
+from prompts import build_answer_prompt, build_feedback_prompt
+from result_cache import ResultCache, lookup, submit_through_cache
+from telemetry import InferenceTelemetry
+
+# Modules whose time.monotonic the `clock` fixture replaces
+CLOCKED_MODULES = (result_cache,)
+
+QUESTION = "How would you design a rate limiter for a public REST API?"
+ANSWER = "I would use a token bucket per API key stored in Redis and return 429 when it is empty."
+PARAMS = {"do_sample": False, "max_length": 150}
+
+
+def test_exact_hit_ignores_case_and_whitespace():
+    cache = ResultCache()
+    cache.put("expected_answer", build_answer_prompt("Software Engineering", QUESTION), PARAMS, "Token bucket.")
+    prompt = build_answer_prompt("Software Engineering", "How would you  design a RATE limiter\nfor a public REST API?")
+    assert cache.get("expected_answer", prompt, PARAMS) == "Token bucket."
+    assert cache.stats()["hits"] == 1
+
+
+def test_generation_parameters_are_part_of_the_key():
+    cache = ResultCache()
+    prompt = build_answer_prompt("Software Engineering", QUESTION)
+    cache.put("expected_answer", prompt, PARAMS, "Token bucket.")
+    assert cache.get("expected_answer", prompt, dict(PARAMS, max_length=100)) is None
+
+
+def test_near_duplicate_answer_reuses_feedback():
+    cache = ResultCache()
+    cache.put("feedback", build_feedback_prompt(QUESTION, ANSWER), PARAMS, "Good use of a token bucket.")
+    similar = build_feedback_prompt(QUESTION, ANSWER.replace("empty.", "empty!"))
+    different = build_feedback_prompt(QUESTION, "I have never built one, but I would probably add a cache.")
+    other_question = build_feedback_prompt("What is a database index?", ANSWER)
+
+    assert cache.get("feedback", similar, PARAMS) == "Good use of a token bucket."
+    assert cache.get("feedback", different, PARAMS) is None
+    assert cache.get("feedback", other_question, PARAMS) is None
+    stats = cache.stats()
+    assert (stats["near_hits"], stats["misses"]) == (1, 2)
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResultCache(ttl=60)
+    prompt = build_answer_prompt("Software Engineering", QUESTION)
+    cache.put("expected_answer", prompt, PARAMS, "Token bucket.")
+    clock.now += 59
+    assert cache.get("expected_answer", prompt, PARAMS) == "Token bucket."
+    clock.now += 2
+    assert cache.get("expected_answer", prompt, PARAMS) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResultCache(max_entries=2)
+    prompts = [build_answer_prompt("Software Engineering", f"Question number {i}?") for i in range(3)]
+    cache.put("expected_answer", prompts[0], PARAMS, "zero")
+    cache.put("expected_answer", prompts[1], PARAMS, "one")
+    assert cache.get("expected_answer", prompts[0], PARAMS) == "zero"
+    cache.put("expected_answer", prompts[2], PARAMS, "two")
+
+    assert cache.get("expected_answer", prompts[1], PARAMS) is None
+    assert cache.get("expected_answer", prompts[0], PARAMS) == "zero"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_uncached_kinds_and_empty_texts_are_not_stored():
+    cache = ResultCache(kinds=("expected_answer",))
+    cache.put("question", "Ask something", PARAMS, "What is a mutex?")
+    cache.put("expected_answer", "Answer something", PARAMS, "")
+    assert cache.get("question", "Ask something", PARAMS) is None
+    assert cache.get("expected_answer", "Answer something", PARAMS) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_hits_are_counted_but_not_timed():
+    cache = ResultCache()
+    telemetry = InferenceTelemetry()
+    prompt = build_answer_prompt("Software Engineering", QUESTION)
+    assert lookup(cache, "expected_answer", prompt, PARAMS, telemetry) is None
+    cache.put("expected_answer", prompt, PARAMS, "Token bucket.")
+    assert lookup(cache, "expected_answer", prompt, PARAMS, telemetry) == "Token bucket."
+
+    snapshot = telemetry.snapshot()["expected_answer"]
+    assert (snapshot["calls"], snapshot["cached"]) == (0, 1)
+    assert "total_ms" not in snapshot
+    assert telemetry.lifetime()["expected_answer"]["histograms"]["total_ms"]["count"] == 0
+
+
+def test_submit_through_cache_only_submits_misses():
+    cache = ResultCache()
+    prompts = [build_answer_prompt("Software Engineering", f"Question number {i}?") for i in range(3)]
+    cache.put("expected_answer", prompts[1], PARAMS, "cached")
+    submitted = []
+
+    def submit(misses):
+        submitted.extend(misses)
+        futures = [Future() for _ in misses]
+        for future, prompt in zip(futures, misses):
+            future.set_result(f"generated for {prompt.values['question']}")
+        return futures
+
+    futures = submit_through_cache(cache, "expected_answer", prompts, PARAMS, submit)
+    assert submitted == [prompts[0], prompts[2]]
+    assert futures[1].result() == "cached"
+    # Generated texts are cached as they arrive
+    assert cache.get("expected_answer", prompts[2], PARAMS) == "generated for Question number 2?"
+
+
+def test_duplicate_misses_are_generated_once():
+    cache = ResultCache()
+    prompt = build_answer_prompt("Software Engineering", QUESTION)
+    same = build_answer_prompt("Software Engineering", QUESTION.upper())
+    submitted = []
+
+    def submit(misses):
+        submitted.extend(misses)
+        futures = [Future() for _ in misses]
+        for future in futures:
+            future.set_result("Token bucket.")
+        return futures
+
+    futures = submit_through_cache(cache, "expected_answer", [prompt, same, prompt], PARAMS, submit)
+    assert submitted == [prompt]
+    assert [future.result() for future in futures] == ["Token bucket."] * 3
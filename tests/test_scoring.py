@@ -0,0 +1,77 @@
+import re
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from scoring import score_answers, split_key_points, split_sentences, summarize_scores  # noqa: E402
+
+
+def bag_of_words_embed(texts):
+    """Unit-length word-count vectors: a cheap stand-in for the encoder"""
+    tokenized = [re.findall(r"\w+", text.lower()) for text in texts]
+    vocab = {word: i for i, word in enumerate(sorted({word for words in tokenized for word in words}))}
+    vectors = np.zeros((len(texts), max(1, len(vocab))))
+    for row, words in enumerate(tokenized):
+        for word in words:
+            vectors[row, vocab[word]] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+EXPECTED = "Use a token bucket; store counters in Redis; return HTTP 429 with Retry-After"
+# The same key points as sentences, so each one matches a sentence of the answer
+MATCHING = "Use a token bucket. Store counters in Redis. Return HTTP 429 with Retry-After."
+
+
+def test_key_points_and_sentences_are_split():
+    assert split_key_points(EXPECTED) == [
+        "Use a token bucket", "store counters in Redis", "return HTTP 429 with Retry-After",
+    ]
+    assert split_key_points("") == []
+    assert split_sentences("First point. Second point!\nThird") == ["First point.", "Second point!", "Third"]
+
+
+def test_matching_answer_scores_full_marks():
+    [result] = score_answers(bag_of_words_embed, [MATCHING], [EXPECTED])
+    assert result["similarity"] == pytest.approx(1.0)
+    assert result["coverage"] == 1.0
+    assert result["score"] == pytest.approx(100.0)
+    assert result["missed_points"] == []
+
+
+def test_partial_answer_misses_uncovered_points():
+    answer = "I would use a token bucket. I would store counters in Redis."
+    [result] = score_answers(bag_of_words_embed, [answer], [EXPECTED])
+    assert result["key_points"] == 3
+    assert result["covered_points"] == 2
+    assert result["missed_points"] == ["return HTTP 429 with Retry-After"]
+    assert 0.0 < result["score"] < 100.0
+
+
+def test_questions_without_answer_or_expected_answer_are_not_scored():
+    results = score_answers(bag_of_words_embed, ["", "Use a token bucket", "Anything"], [EXPECTED, EXPECTED, ""])
+    assert results[0] is None and results[2] is None
+    assert results[1] is not None
+
+
+def test_embed_is_called_once_for_every_question():
+    calls = []
+
+    def embed(texts):
+        calls.append(len(texts))
+        return bag_of_words_embed(texts)
+
+    score_answers(embed, ["Use a token bucket", "Store counters in Redis"], [EXPECTED, EXPECTED])
+    assert len(calls) == 1
+
+
+def test_summary_reports_weak_questions():
+    results = score_answers(
+        bag_of_words_embed, [MATCHING, "No idea, sorry", ""], [EXPECTED, EXPECTED, EXPECTED]
+    )
+    summary = summarize_scores(results)
+    assert summary["scored_questions"] == 2
+    assert summary["weak_questions"] == [1]
+    assert summary["growth_areas"] == 1
+    assert summarize_scores([None, None]) is None
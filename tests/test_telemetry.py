@@ -0,0 +1,76 @@
+import json
+
+from telemetry import InferenceTelemetry, TelemetryExporter
+
+
+def record(telemetry, kind, total_ms, **fields):
+    telemetry.record(kind, prompt_tokens=10, generated_tokens=5, queue_ms=1.0, tokenize_ms=1.0,
+                     generate_ms=total_ms - 2.0, decode_ms=0.0, total_ms=total_ms, **fields)
+
+
+def test_snapshot_separates_calls_fallbacks_and_cache_hits():
+    telemetry = InferenceTelemetry()
+    for total_ms in (100.0, 200.0, 300.0, 400.0):
+        record(telemetry, "feedback", total_ms)
+    record(telemetry, "feedback", 500.0, rejected=True, resampled=True)
+    telemetry.record_fallback("feedback", "timeout")
+    telemetry.record_cache_hit("feedback")
+    telemetry.record_cache_hit("question")
+
+    snapshot = telemetry.snapshot()
+    feedback = snapshot["feedback"]
+    assert (feedback["calls"], feedback["fallbacks"], feedback["cached"]) == (5, 1, 1)
+    assert (feedback["rejected"], feedback["resampled"]) == (1, 1)
+    assert feedback["total_ms"] == {"p50": 300.0, "p95": 500.0, "mean": 300.0}
+    # A kind served only from the cache has no latency figures
+    assert snapshot["question"] == {"calls": 0, "fallbacks": 0, "rejected": 0, "resampled": 0, "cached": 1}
+
+
+def test_rolling_window_drops_old_records_but_lifetime_keeps_them():
+    telemetry = InferenceTelemetry(window=2)
+    for total_ms in (10.0, 2000.0, 3000.0):
+        record(telemetry, None, total_ms)
+    assert telemetry.snapshot()["other"]["calls"] == 2
+
+    lifetime = telemetry.lifetime()["other"]
+    assert lifetime["calls"] == 3
+    assert lifetime["tokens"] == {"prompt_tokens": 30, "generated_tokens": 15}
+    histogram = lifetime["histograms"]["total_ms"]
+    assert (histogram["count"], histogram["sum"]) == (3, 5010.0)
+    # Cumulative buckets: 10ms falls in every one, the others from 2.5s and 5s up
+    assert histogram["buckets"][:7] == [1, 1, 1, 1, 1, 1, 2]
+    assert histogram["buckets"][-1] == 3
+
+
+def test_exports_prometheus_text_and_json(tmp_path):
+    telemetry = InferenceTelemetry()
+    record(telemetry, "question", 120.0)
+    telemetry.record_fallback("question")
+
+    text = telemetry.to_prometheus()
+    assert 'interview_inference_calls_total{kind="question"} 1' in text
+    assert 'interview_inference_fallbacks_total{kind="question"} 1' in text
+    assert 'interview_inference_total_seconds_bucket{kind="question",le="0.25"} 1' in text
+    assert 'interview_inference_total_seconds_bucket{kind="question",le="0.1"} 0' in text
+
+    path = tmp_path / "telemetry.json"
+    TelemetryExporter(telemetry, str(path), interval=3600).write()
+    exported = json.loads(path.read_text(encoding="utf-8"))
+    assert exported["lifetime"]["question"]["calls"] == 1
+    assert exported["rolling"]["question"]["fallbacks"] == 1
+
+
+def test_first_token_latency_only_counts_streamed_calls():
+    telemetry = InferenceTelemetry()
+    record(telemetry, "feedback", 900.0, first_token_ms=150.0, streamed=True)
+    record(telemetry, "feedback", 1100.0, first_token_ms=250.0, streamed=True)
+    record(telemetry, "feedback", 700.0, first_token_ms=None)
+
+    assert telemetry.snapshot()["feedback"]["first_token_ms"] == {"p50": 150.0, "p95": 250.0, "mean": 200.0}
+    histogram = telemetry.lifetime()["feedback"]["histograms"]["first_token_ms"]
+    assert (histogram["count"], histogram["sum"]) == (2, 400.0)
+
+    text = telemetry.to_prometheus()
+    assert "# HELP interview_inference_first_token_seconds First token time per model call" in text
+    assert 'interview_inference_first_token_seconds_bucket{kind="feedback",le="0.25"} 2' in text
+    assert 'interview_inference_first_token_seconds_count{kind="feedback"} 2' in text
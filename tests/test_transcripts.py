@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+from interview import AWAITING_ANSWER, InterviewSession
+from transcripts import TranscriptStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TranscriptStore(str(tmp_path / "transcripts.sqlite3"))
+
+
+def message(seq, role="Candidate", **extra):
+    entry = {"seq": seq, "role": role, "message": f"message {seq}", "agent": role, "timestamp": 1.0 + seq}
+    return dict(entry, **extra)
+
+
+def test_pages_older_messages_oldest_first(store):
+    for seq in range(10):
+        store.append_message("a", message(seq))
+    store.append_message("b", message(0))
+
+    assert [m["seq"] for m in store.page("a", before=None, limit=3)] == [7, 8, 9]
+    assert [m["seq"] for m in store.page("a", before=7, limit=3)] == [4, 5, 6]
+    assert [m["seq"] for m in store.page("a", before=2, limit=5)] == [0, 1]
+    assert store.page("missing") == []
+
+
+def test_question_id_round_trips_only_when_set(store):
+    store.append_message("a", message(0, role="System"))
+    store.append_message("a", message(1, question_id=3))
+    first, second = store.page("a")
+    assert "question_id" not in first
+    assert second["question_id"] == 3
+    assert second == message(1, question_id=3)
+
+
+def test_state_is_replaced_on_save(store):
+    assert store.load_state("a") is None
+    store.save_state("a", {"current_q": 0})
+    store.save_state("a", {"current_q": 1})
+    assert store.load_state("a") == {"current_q": 1}
+
+
+def test_delete_older_than_drops_stale_interviews(store, monkeypatch):
+    store.save_state("old", {})
+    store.append_message("old", message(0))
+    monkeypatch.setattr(time, "time", lambda: 10.0 ** 10)
+    store.save_state("new", {})
+
+    assert store.delete_older_than(3600) == 1
+    assert store.load_state("old") is None and store.page("old") == []
+    assert store.load_state("new") == {}
+
+
+def test_session_keeps_a_window_and_restores_from_the_store(store):
+    session = InterviewSession("Software Development", "Medium", 3, store=store, window=4)
+    session.add_questions(["Q1 about caching layers?", "Q2 about queues?", "Q3 about retries?"], ["a", "b", "c"])
+    session.ask_next()
+    session.submit_answer("First answer", "First feedback")
+    session.ask_next()
+
+    # welcome + 2 per asked/answered question + the second question
+    assert session.message_count == 5
+    assert len(session.conversation) == 4
+    assert [m["seq"] for m in session.history(before=session.earliest_loaded_seq)] == [0]
+
+    restored = InterviewSession.restore(store, session.interview_id, window=4)
+    assert restored.to_state() == session.to_state()
+    assert restored.phase == AWAITING_ANSWER
+    assert [m["seq"] for m in restored.conversation] == [1, 2, 3, 4]
+    assert InterviewSession.restore(store, "unknown") is None
@@ -0,0 +1,122 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import voice  # noqa: E402
+from voice import IncrementalTranscriber  # noqa: E402
+
+WORDS = ["token", "bucket", "per", "key", "in", "redis", "with", "ttl", "slow"]
+QUIET = None
+
+
+class FakeStream:
+    """Microphone stream playing a script of one-sample chunks: a word is loud, QUIET is silence
+
+    Once the script is played it reports `drained` and blocks until recording stops.
+    """
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.drained = threading.Event()
+        self.transcriber = None
+
+    def read(self, chunk):
+        if self.script:
+            word = self.script.pop(0)
+            sample = 0 if word is QUIET else 1000 + WORDS.index(word)
+            return np.array([sample], dtype=np.int16).tobytes()
+        self.drained.set()
+        while self.transcriber.recording:
+            time.sleep(0.005)
+        return b""
+
+
+class FakeMicrophone:
+    SAMPLE_WIDTH = 2
+    SAMPLE_RATE = 10
+    CHUNK = 1
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeRecognizer:
+    energy_threshold = 100
+
+    def adjust_for_ambient_noise(self, source, duration=1):
+        pass
+
+
+@pytest.fixture
+def transcribe(monkeypatch):
+    """Fake engine: the words in a segment, in order; segments with "slow" wait for `gate`"""
+    calls = []
+    gate = threading.Event()
+
+    def fake_transcribe_segment(recognizer, audio, engine="sphinx", language="en-US"):
+        samples = np.frombuffer(audio.frame_data, dtype=np.int16)
+        text = " ".join(WORDS[sample - 1000] for sample in samples if sample >= 1000)
+        calls.append(text)
+        if "slow" in text:
+            gate.wait(10)
+        return text
+
+    monkeypatch.setattr(voice, "transcribe_segment", fake_transcribe_segment)
+    yield SimpleNamespace(calls=calls, gate=gate)
+    gate.set()
+
+
+def start_transcriber(monkeypatch, script):
+    # Chunks are 0.1 s of audio: two quiet chunks are a pause, five chunks the longest segment
+    stream = FakeStream(script)
+    monkeypatch.setattr(voice, "_import_speech_recognition", lambda: SimpleNamespace(
+        Recognizer=FakeRecognizer,
+        Microphone=lambda: FakeMicrophone(stream),
+        AudioData=lambda frame_data, rate, width: SimpleNamespace(frame_data=frame_data),
+    ))
+    transcriber = IncrementalTranscriber(pause_seconds=0.15, max_segment_seconds=0.45)
+    stream.transcriber = transcriber
+    transcriber.start()
+    assert stream.drained.wait(5)
+    return transcriber
+
+
+def test_segments_are_cut_at_pauses_at_the_length_limit_and_on_stop(monkeypatch, transcribe):
+    transcriber = start_transcriber(monkeypatch, [
+        "token", "bucket", QUIET, QUIET,  # cut at the pause
+        "per", "key", "in", "redis", "with",  # cut at the length limit while still talking
+        QUIET, QUIET, QUIET, QUIET, QUIET,  # silence only: never sent to the engine
+        "ttl",  # still being said when recording stops
+    ])
+    assert transcriber.finish(timeout=5) == "token bucket per key in redis with ttl"
+    assert transcribe.calls == ["token bucket", "per key in redis with", "ttl"]
+    assert transcriber.error is None
+
+
+def test_finish_waits_for_segments_still_being_transcribed(monkeypatch, transcribe):
+    transcriber = start_transcriber(monkeypatch, ["token", "bucket", QUIET, QUIET, "slow", QUIET, QUIET])
+    deadline = time.monotonic() + 5
+    while transcriber.partial_text() != "token bucket" and time.monotonic() < deadline:
+        time.sleep(0.005)
+    # The slow segment is not done yet, so it is not in the partial text
+    assert transcriber.partial_text() == "token bucket"
+    threading.Timer(0.1, transcribe.gate.set).start()
+    assert transcriber.finish(timeout=5) == "token bucket slow"
+
+
+def test_finish_drops_segments_still_pending_at_the_timeout(monkeypatch, transcribe):
+    transcriber = start_transcriber(monkeypatch, ["token", "bucket", QUIET, QUIET, "slow", QUIET, QUIET])
+    deadline = time.monotonic() + 5
+    while transcriber.partial_text() != "token bucket" and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert transcriber.finish(timeout=0.05) == "token bucket"
@@ -0,0 +1,97 @@
+"""Durable, append-only transcript store for interviews.
+
+Messages are appended to a local SQLite database as they happen, and a small
+JSON snapshot of each interview's state is kept next to them. Sessions keep
+only a short window of recent messages in memory and page older history from
+here on demand, so server memory no longer grows with every live transcript.
+An interview can be restored after a process restart.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS interviews (
+    id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    interview_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    message TEXT NOT NULL,
+    agent TEXT,
+    question_id INTEGER,
+    timestamp REAL NOT NULL,
+    PRIMARY KEY (interview_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+def _row_to_message(row):
+    seq, role, message, agent, question_id, timestamp = row
+    entry = {"seq": seq, "role": role, "message": message, "agent": agent, "timestamp": timestamp}
+    if question_id is not None:
+        entry["question_id"] = question_id
+    return entry
+
+
+class TranscriptStore:
+    """Thread-safe SQLite store shared by every session in the process"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL keeps appends cheap and lets readers page history while others write
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    # --- Writes ---
+    def append_message(self, interview_id, entry):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (interview_id, entry["seq"], entry["role"], entry["message"], entry.get("agent"),
+                 entry.get("question_id"), entry["timestamp"])
+            )
+
+    def save_state(self, interview_id, state):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO interviews VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET updated = excluded.updated, state = excluded.state",
+                (interview_id, now, now, json.dumps(state, ensure_ascii=False))
+            )
+
+    def delete_older_than(self, seconds):
+        """Drop interviews (and their messages) not updated for `seconds`; returns how many"""
+        cutoff = time.time() - seconds
+        with self._lock:
+            ids = [row[0] for row in self._db.execute("SELECT id FROM interviews WHERE updated < ?", (cutoff,))]
+            for interview_id in ids:
+                self._db.execute("DELETE FROM messages WHERE interview_id = ?", (interview_id,))
+                self._db.execute("DELETE FROM interviews WHERE id = ?", (interview_id,))
+        return len(ids)
+
+    # --- Reads ---
+    def load_state(self, interview_id):
+        """The last saved state for `interview_id`, or None"""
+        with self._lock:
+            row = self._db.execute("SELECT state FROM interviews WHERE id = ?", (interview_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def page(self, interview_id, before=None, limit=20):
+        """Up to `limit` messages with seq < `before` (all when None), oldest first"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, role, message, agent, question_id, timestamp FROM messages "
+                "WHERE interview_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+                (interview_id, before if before is not None else 2 ** 62, limit)
+            ).fetchall()
+        return [_row_to_message(row) for row in reversed(rows)]
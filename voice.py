@@ -0,0 +1,172 @@
+"""Incremental offline transcription of spoken answers.
+
+``IncrementalTranscriber`` reads the microphone in small chunks on a background
+thread. It cuts the audio into segments at pauses, or after
+`max_segment_seconds` of continuous speech, and each segment is transcribed as
+soon as it is cut, while the candidate keeps talking. When recording stops,
+only the last short segment is still waiting, so the answer is ready almost at
+once and coach feedback can start without a full-recording pass.
+
+Each segment's transcription time, audio length and real-time factor
+(transcription time / audio time) are recorded in telemetry under the
+"transcription" kind. The wait between stopping and having the whole text is
+recorded as the total time of a "transcription_finalize" call.
+
+Needs `speechrecognition`, PyAudio for the microphone, and the engine's own
+package: pocketsphinx for "sphinx", vosk for "vosk", openai-whisper for
+"whisper". The microphone is the one on the machine running the app, so voice
+answers are meant for local use.
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+
+ENGINES = ("sphinx", "vosk", "whisper")
+
+_SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+
+def _import_speech_recognition():
+    try:
+        import speech_recognition
+    except ImportError as e:
+        raise ImportError(
+            "Voice answers need `speechrecognition`, plus PyAudio for the microphone"
+        ) from e
+    return speech_recognition
+
+
+def transcribe_segment(recognizer, audio, engine="sphinx", language="en-US"):
+    """Text of one audio segment with an offline engine; "" when nothing was recognized"""
+    sr = _import_speech_recognition()
+    try:
+        if engine == "sphinx":
+            return recognizer.recognize_sphinx(audio, language=language)
+        if engine == "vosk":
+            # Returns vosk's JSON result rather than plain text
+            return json.loads(recognizer.recognize_vosk(audio)).get("text", "")
+        if engine == "whisper":
+            return recognizer.recognize_whisper(audio).strip()
+    except sr.UnknownValueError:
+        return ""
+    raise ValueError(f"Unknown speech engine {engine!r}; expected one of {', '.join(ENGINES)}")
+
+
+class IncrementalTranscriber:
+    """Records one spoken answer and transcribes it segment by segment while it is recorded"""
+
+    def __init__(self, engine="sphinx", language="en-US", pause_seconds=0.6, max_segment_seconds=5.0,
+                 telemetry=None):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown speech engine {engine!r}; expected one of {', '.join(ENGINES)}")
+        self._sr = _import_speech_recognition()
+        self.engine = engine
+        self.language = language
+        self.pause_seconds = pause_seconds
+        self.max_segment_seconds = max_segment_seconds
+        self.telemetry = telemetry
+        self.recognizer = self._sr.Recognizer()
+        # Fails here, not on the capture thread, when PyAudio or a microphone is missing
+        self.microphone = self._sr.Microphone()
+        # Error that ended recording early or lost a segment, if any
+        self.error = None
+
+        # One worker keeps segments in order and leaves the other cores to the model
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="transcriber")
+        self._futures = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._capture, name="transcriber-capture", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    @property
+    def recording(self):
+        return self._thread.is_alive() and not self._stop.is_set()
+
+    def partial_text(self):
+        """Text of the segments transcribed so far, in order"""
+        texts = []
+        for future in list(self._futures):
+            if not future.done():
+                break
+            texts.append(future.result())
+        return " ".join(text for text in texts if text)
+
+    def finish(self, timeout=30.0):
+        """Stop recording and return the answer transcribed within `timeout` seconds
+
+        Segments still pending after the timeout are dropped, so `timeout=0`
+        discards the recording without waiting.
+        """
+        stopped = time.monotonic()
+        self._stop.set()
+        self._thread.join(timeout)
+        futures = list(self._futures)
+        wait(futures, timeout=max(0.0, timeout - (time.monotonic() - stopped)))
+        texts = []
+        for future in futures:
+            if future.done():
+                texts.append(future.result())
+            else:
+                future.cancel()
+        self._executor.shutdown(wait=False)
+        if timeout and self.telemetry is not None:
+            # What the candidate waits for between stopping and feedback starting
+            self.telemetry.record("transcription_finalize", total_ms=1000.0 * (time.monotonic() - stopped))
+        return " ".join(text for text in texts if text).strip()
+
+    # --- Background work ---
+    def _capture(self):
+        try:
+            with self.microphone as source:
+                self.recognizer.adjust_for_ambient_noise(source, duration=0.3)
+                threshold = self.recognizer.energy_threshold
+                dtype = _SAMPLE_DTYPES[source.SAMPLE_WIDTH]
+                chunk_seconds = source.CHUNK / source.SAMPLE_RATE
+                frames, voiced, quiet = [], False, 0.0
+                while not self._stop.is_set():
+                    buffer = source.stream.read(source.CHUNK)
+                    frames.append(buffer)
+                    samples = np.frombuffer(buffer, dtype=dtype).astype(np.float32)
+                    loud = samples.size > 0 and float(np.sqrt(np.mean(samples * samples))) > threshold
+                    voiced = voiced or loud
+                    quiet = 0.0 if loud else quiet + chunk_seconds
+                    if (voiced and quiet >= self.pause_seconds) or len(frames) * chunk_seconds >= self.max_segment_seconds:
+                        self._cut(frames, voiced, source)
+                        frames, voiced, quiet = [], False, 0.0
+                # The tail spoken right before stopping
+                self._cut(frames, voiced, source)
+        except Exception as e:
+            self.error = e
+
+    def _cut(self, frames, voiced, source):
+        # Pure silence is not worth an engine call
+        if not frames or not voiced:
+            return
+        audio = self._sr.AudioData(b"".join(frames), source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+        seconds = len(frames) * source.CHUNK / source.SAMPLE_RATE
+        self._futures.append(self._executor.submit(self._transcribe, audio, seconds))
+
+    def _transcribe(self, audio, seconds):
+        started = time.monotonic()
+        try:
+            text = transcribe_segment(self.recognizer, audio, self.engine, self.language)
+        except Exception as e:
+            # A failed segment (engine error, malformed vosk output) leaves a gap, not a lost answer
+            self.error = e
+            return ""
+        elapsed = time.monotonic() - started
+        if self.telemetry is not None:
+            self.telemetry.record(
+                "transcription",
+                total_ms=1000.0 * elapsed,
+                audio_ms=1000.0 * seconds,
+                rtf=elapsed / seconds,
+                batch_size=1,
+            )
+        return text